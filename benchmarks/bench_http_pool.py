@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+HTTP连接池性能基准测试
+在本地启动一个HTTPS桩服务器，对比每次请求新建连接（模块级 requests.get）与
+请求执行器复用keep-alive连接的单次请求延迟，安装了httpx时同时对比异步请求，
+安装了h2时再启动一个只支持HTTP/2的桩服务器，测试启用HTTP/2的异步请求
+
+用法:
+    python benchmarks/bench_http_pool.py [请求数量] [模拟网络往返延迟毫秒]
+
+桩服务器在每次TCP连接建立时等待一个往返延迟，模拟到 api.vultr.com / ipinfo.io 的网络距离；
+自签名证书通过 openssl 命令生成，并通过 SSL_CERT_FILE / REQUESTS_CA_BUNDLE 环境变量信任，
+因此请求执行器使用与生产环境相同的客户端配置（请求头、连接池、HTTP/2）创建连接。
+每个响应都检查状态码，客户端配置导致请求失败时基准测试直接报错。
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.aio import HTTPX_AVAILABLE, httpx
+from utils.http import H2_AVAILABLE, RequestExecutor
+
+if H2_AVAILABLE:
+    import h2.config
+    import h2.connection
+    import h2.events
+    import h2.exceptions
+
+RESPONSE_BODY = json.dumps({'instances': [], 'meta': {'total': 0, 'links': {'next': ''}}}).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """返回固定JSON的处理器，使用HTTP/1.1以支持keep-alive"""
+
+    protocol_version = 'HTTP/1.1'
+    # 响应头和响应体分开写出，关闭Nagle算法避免与延迟确认叠加产生约40毫秒的等待
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(RESPONSE_BODY)))
+        self.end_headers()
+        self.wfile.write(RESPONSE_BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    """HTTPS桩服务器，新连接先等待一个往返延迟再进行TLS握手"""
+
+    daemon_threads = True
+
+    def __init__(self, certfile: str, keyfile: str, connect_delay: float):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.connect_delay = connect_delay
+        self.connections = 0
+        self.context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        self.context.load_cert_chain(certfile, keyfile)
+
+    def finish_request(self, request: socket.socket, client_address):
+        self.connections += 1
+        time.sleep(self.connect_delay)
+        try:
+            tls = self.context.wrap_socket(request, server_side=True)
+        except (ssl.SSLError, OSError):
+            return
+        super().finish_request(tls, client_address)
+
+
+class H2StubProtocol(asyncio.Protocol):
+    """
+    只支持HTTP/2的桩服务器连接，按HTTP/2规范校验请求头（例如拒绝 Connection 头），
+    新连接在一个往返延迟后才开始处理数据
+    """
+
+    def __init__(self, server: 'H2StubServer'):
+        self.server = server
+        self.conn = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=False))
+        self.transport = None
+        self.pending = []
+        self.ready = False
+
+    def connection_made(self, transport):
+        self.server.connections += 1
+        self.transport = transport
+        asyncio.get_running_loop().call_later(self.server.connect_delay, self._start)
+
+    def data_received(self, data: bytes):
+        if not self.ready:
+            self.pending.append(data)
+            return
+        try:
+            events = self.conn.receive_data(data)
+        except h2.exceptions.ProtocolError:
+            self.server.protocol_errors += 1
+            self.transport.write(self.conn.data_to_send())
+            self.transport.close()
+            return
+        for event in events:
+            if isinstance(event, h2.events.RequestReceived):
+                self.conn.send_headers(event.stream_id, [
+                    (':status', '200'),
+                    ('content-type', 'application/json'),
+                    ('content-length', str(len(RESPONSE_BODY)))
+                ])
+                self.conn.send_data(event.stream_id, RESPONSE_BODY, end_stream=True)
+        self.transport.write(self.conn.data_to_send())
+
+    def _start(self):
+        self.ready = True
+        self.conn.initiate_connection()
+        self.transport.write(self.conn.data_to_send())
+        for data in self.pending:
+            self.data_received(data)
+        self.pending.clear()
+
+
+class H2StubServer:
+    """在独立线程的事件循环中运行的HTTP/2桩服务器（ALPN只提供h2）"""
+
+    def __init__(self, certfile: str, keyfile: str, connect_delay: float):
+        self.connect_delay = connect_delay
+        self.connections = 0
+        self.protocol_errors = 0
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(certfile, keyfile)
+        context.set_alpn_protocols(['h2'])
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(
+            self.loop.create_server(lambda: H2StubProtocol(self), '127.0.0.1', 0, ssl=context)
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    def shutdown(self):
+        self.loop.call_soon_threadsafe(self.server.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def generate_certificate(directory: str):
+    """生成 127.0.0.1 的自签名证书"""
+    if not shutil.which('openssl'):
+        sys.exit('需要 openssl 命令生成测试证书')
+    certfile = os.path.join(directory, 'cert.pem')
+    keyfile = os.path.join(directory, 'key.pem')
+    subprocess.run(
+        [
+            'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+            '-keyout', keyfile, '-out', certfile, '-subj', '/CN=127.0.0.1',
+            '-addext', 'subjectAltName=IP:127.0.0.1'
+        ],
+        check=True,
+        capture_output=True
+    )
+    return certfile, keyfile
+
+
+def report(name: str, count: int, elapsed: float, connections: int) -> float:
+    per_call = elapsed / count * 1000
+    print(f'{name:<32} {count:>6} 次请求  {elapsed:>8.3f} 秒  {per_call:>8.2f} 毫秒/次  {connections:>6} 个连接')
+    return per_call
+
+
+def measure(server, name: str, count: int, fn) -> float:
+    fn().raise_for_status()
+    before = server.connections
+    start = time.perf_counter()
+    for _ in range(count):
+        fn().raise_for_status()
+    return report(name, count, time.perf_counter() - start, server.connections - before)
+
+
+async def measure_async(server, name: str, count: int, fn) -> float:
+    (await fn()).raise_for_status()
+    before = server.connections
+    start = time.perf_counter()
+    for _ in range(count):
+        (await fn()).raise_for_status()
+    return report(name, count, time.perf_counter() - start, server.connections - before)
+
+
+async def run_async(server: StubServer, url: str, count: int) -> None:
+    """对比每次新建httpx客户端与异步执行器的共享客户端（HTTP/1.1）"""
+    async def unpooled_call():
+        async with httpx.AsyncClient() as client:
+            return await client.get(url)
+
+    executor = RequestExecutor('bench-async', hedging=False)
+    executor.http2 = False
+    unpooled = await measure_async(server, 'httpx（每次新建客户端）', count, unpooled_call)
+    pooled = await measure_async(
+        server, 'RequestExecutor（异步连接池）', count, lambda: executor.request_async('GET', url)
+    )
+    print(f'每次请求节省: {unpooled - pooled:.2f} 毫秒 ({unpooled / pooled:.1f}x)')
+
+
+async def run_http2(server: H2StubServer, url: str, count: int) -> None:
+    """对比每次新建HTTP/2客户端与启用HTTP/2的异步执行器，并测试单个连接上的并发请求"""
+    async def unpooled_call():
+        async with httpx.AsyncClient(http2=True) as client:
+            return await client.get(url)
+
+    executor = RequestExecutor('bench-h2', hedging=False)
+    executor.http2 = True
+    unpooled = await measure_async(server, 'httpx HTTP/2（每次新建客户端）', count, unpooled_call)
+    pooled = await measure_async(
+        server, 'RequestExecutor（HTTP/2）', count, lambda: executor.request_async('GET', url)
+    )
+    print(f'每次请求节省: {unpooled - pooled:.2f} 毫秒 ({unpooled / pooled:.1f}x)')
+
+    response = await executor.request_async('GET', url)
+    assert response.http_version == 'HTTP/2', f'未使用HTTP/2: {response.http_version}'
+
+    before = server.connections
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(executor.request_async('GET', url) for _ in range(count)))
+    for response in responses:
+        response.raise_for_status()
+    report('RequestExecutor（HTTP/2 并发）', count, time.perf_counter() - start, server.connections - before)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rtt = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.02
+
+    with tempfile.TemporaryDirectory() as directory:
+        certfile, keyfile = generate_certificate(directory)
+        os.environ['SSL_CERT_FILE'] = certfile
+        os.environ['REQUESTS_CA_BUNDLE'] = certfile
+
+        server = StubServer(certfile, keyfile, rtt)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f'https://127.0.0.1:{server.server_address[1]}/v2/instances'
+        print(f'HTTPS桩服务器: {url}  模拟往返延迟 {rtt * 1000:g} 毫秒')
+
+        unpooled = measure(server, 'requests.get（每次新建连接）', count, lambda: requests.get(url))
+        executor = RequestExecutor('bench', hedging=False)
+        pooled = measure(server, 'RequestExecutor（连接池）', count, lambda: executor.request('GET', url))
+        print(f'每次请求节省: {unpooled - pooled:.2f} 毫秒 ({unpooled / pooled:.1f}x)')
+
+        if HTTPX_AVAILABLE:
+            asyncio.run(run_async(server, url, count))
+        server.shutdown()
+
+        if HTTPX_AVAILABLE and H2_AVAILABLE:
+            h2_server = H2StubServer(certfile, keyfile, rtt)
+            h2_url = f'https://127.0.0.1:{h2_server.port}/v2/instances'
+            print(f'HTTP/2桩服务器: {h2_url}')
+            try:
+                asyncio.run(run_http2(h2_server, h2_url, count))
+            finally:
+                h2_server.shutdown()
+            if h2_server.protocol_errors:
+                sys.exit(f'HTTP/2桩服务器拒绝了 {h2_server.protocol_errors} 个请求（协议错误）')
+        else:
+            print('未安装httpx或h2，跳过HTTP/2测试（pip install httpx[http2]）')
+
+
+if __name__ == '__main__':
+    main()
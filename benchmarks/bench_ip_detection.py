@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+IP检测性能基准测试
+对比逐个调用 detect_cloud_provider 与 numpy 向量化批量匹配的吞吐量（地址/秒）
+
+用法:
+    python benchmarks/bench_ip_detection.py [地址数量]
+
+配置了 CLOUD_IP_RANGES_DIR 时使用真实的IP段文件，否则生成随机网段。
+测试地址全部落在已索引的网段内，因此 detect_cloud_provider 不会发起网络请求。
+"""
+
+import os
+import random
+import socket
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import ip_ranges
+from utils.ip_detection import detect_cloud_provider, detect_cloud_providers_bulk
+from utils.ip_ranges import KNOWN_PROVIDERS, IPRangeIndex, get_ip_range_index
+
+# 逐个检测的采样数量，吞吐量按采样结果计算
+LOOP_SAMPLE_SIZE = 20000
+
+
+def build_synthetic_index(prefix_count: int = 5000) -> IPRangeIndex:
+    """生成随机网段构建索引"""
+    rng = random.Random(42)
+    index = IPRangeIndex()
+    for _ in range(prefix_count):
+        prefix_len = rng.randint(12, 24)
+        network = rng.getrandbits(32) & (0xFFFFFFFF << (32 - prefix_len)) & 0xFFFFFFFF
+        cidr = f'{socket.inet_ntoa(struct.pack(">I", network))}/{prefix_len}'
+        index.add_prefix(cidr, rng.choice(KNOWN_PROVIDERS))
+    return index
+
+
+def generate_addresses(index: IPRangeIndex, count: int) -> list:
+    """在已索引的IPv4网段内随机生成地址"""
+    rng = random.Random(7)
+    intervals = index._ipv4_intervals
+    addresses = []
+    for _ in range(count):
+        start, end, _ = intervals[rng.randrange(len(intervals))]
+        addresses.append(socket.inet_ntoa(struct.pack('>I', rng.randint(start, end))))
+    return addresses
+
+
+def report(name: str, count: int, elapsed: float) -> float:
+    rate = count / elapsed if elapsed > 0 else float('inf')
+    print(f'{name:<36} {count:>10} 个地址  {elapsed:>8.3f} 秒  {rate:>14,.0f} 地址/秒')
+    return rate
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+    index = get_ip_range_index()
+    if not index._ipv4_intervals:
+        index = build_synthetic_index()
+        ip_ranges._index = index
+    print(f'IP段索引: {index.total_prefixes} 个网段')
+
+    addresses = generate_addresses(index, count)
+    sample = addresses[:LOOP_SAMPLE_SIZE]
+
+    # 预先构建区间数组，不计入批量匹配耗时
+    index.get_ipv4_arrays()
+
+    start = time.perf_counter()
+    loop_results = [detect_cloud_provider(ip_address) for ip_address in sample]
+    loop_rate = report('detect_cloud_provider 循环', len(sample), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    bulk_results = detect_cloud_providers_bulk(addresses)
+    bulk_rate = report('detect_cloud_providers_bulk', len(addresses), time.perf_counter() - start)
+
+    assert bulk_results[:len(sample)] == loop_results, '批量匹配结果与逐个检测结果不一致'
+    print(f'加速比: {bulk_rate / loop_rate:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
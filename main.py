@@ -4,23 +4,40 @@
 支持多云平台：AWS、DigitalOcean、Vultr、阿里云
 """
 
+import asyncio
+import ipaddress
 import os
 from mcp import server
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 # 导入各个云服务提供商
 from providers.aws_provider import aws_provider
 from providers.digitalocean_provider import digitalocean_provider
 from providers.vultr_provider import vultr_provider
 from providers.alibaba_provider import alibaba_provider
+from providers.async_provider import AsyncProvider
 
 # 导入工具模块
-from utils.ip_detection import detect_cloud_provider, get_cloud_provider_info
+from utils.ip_detection import (
+    detect_cloud_provider_async, detect_cloud_providers, get_cloud_provider_info, isp_cache,
+    learn_ip_providers_async, forget_ip_provider_async, learned_providers
+)
+from utils.ip_ranges import get_ip_range_index
+from utils.asn_db import get_asn_database_stats
+from utils.inventory import (
+    InventoryCache, INVENTORY_CACHE_ENABLED, INVENTORY_REFRESH_INTERVAL,
+    INVENTORY_WAIT_TIMEOUT, INVENTORY_WARMUP
+)
+from utils.aio import create_provider_executors, run_blocking
+from utils.http import get_request_executor_stats
 from utils.security import SecurityConfirmation, require_triple_confirmation
 
 # 环境变量
 IPINFO_API_TOKEN = os.getenv("IPINFO_API_TOKEN")
 
+# 未指定提供商时，是否默认同时进行IP检测和所有提供商查询（竞速模式）
+IP_LOOKUP_RACE_MODE = os.getenv("IP_LOOKUP_RACE_MODE", "false").lower() == "true"
+
 # MCP服务器说明
 INSTRUCTIONS = """
 多云服务器管理系统 - 基于MCP的智能云服务器管理工具
@@ -47,18 +64,218 @@ PROVIDERS = {
     'alibaba': alibaba_provider
 }
 
+# 每个提供商独立的有界线程池，一个提供商的大量调用不会占满其他提供商的线程
+PROVIDER_EXECUTORS = create_provider_executors(PROVIDERS)
+
+def _stale_inventory_fallback(provider_name: str):
+    """
+    提供商熔断期间的备用查询：按IP/ID查询时使用清单缓存中的记录（允许已过期的清单）
+    
+    Args:
+        provider_name (str): 提供商名称
+    """
+    def fallback(method: str, args: tuple, kwargs: dict) -> Optional[Dict]:
+        key = args[0] if args else None
+        if key is None:
+            return None
+        if method in ('get_instance_by_ip', 'get_droplet_by_ip'):
+            record = inventory.lookup_ip(key, provider_name, allow_stale=True)
+        elif method in ('get_instance_by_id', 'get_droplet_by_id'):
+            record = inventory.lookup_id(key, provider_name, allow_stale=True)
+        else:
+            return None
+        if record is None:
+            return None
+        result = inventory.to_lookup_result(record)
+        result['circuit_open'] = True
+        result['message'] = f'{provider_name} API暂时不可用，返回清单缓存中的数据（可能不是最新状态）'
+        return result
+    return fallback
+
+# 提供商的异步接口：Vultr使用原生异步请求，其余阻塞的SDK调用在对应提供商的线程池中执行，不阻塞事件循环；
+# 提供商API熔断期间，按IP/ID查询返回清单缓存中的数据
+ASYNC_PROVIDERS = {
+    name: AsyncProvider(provider, PROVIDER_EXECUTORS[name], fallback=_stale_inventory_fallback(name))
+    for name, provider in PROVIDERS.items()
+}
+
+# 跨提供商的实例清单内存缓存
+inventory = InventoryCache(
+    PROVIDERS,
+    refresh_interval=INVENTORY_REFRESH_INTERVAL,
+    enabled=INVENTORY_CACHE_ENABLED or INVENTORY_WARMUP,
+    wait_timeout=INVENTORY_WAIT_TIMEOUT,
+    executors=PROVIDER_EXECUTORS
+)
+
+def _is_global_ip(ip_address: str) -> bool:
+    """
+    是否为全局唯一的公网地址
+    
+    私网地址（RFC1918等）在不同VPC和提供商中重复使用，不能据此确认IP归属
+    """
+    try:
+        return ipaddress.ip_address(ip_address).is_global
+    except ValueError:
+        return False
+
+def _public_ips_of(instance_info: Dict) -> List[str]:
+    """提取实例信息中的公网IP（兼容各提供商的字段名），只保留全局唯一的地址"""
+    ips = []
+    for key in ('public_ip', 'public_ipv4', 'public_ipv6', 'main_ip', 'v6_main_ip', 'public_ips'):
+        value = instance_info.get(key)
+        if isinstance(value, list):
+            ips.extend(value)
+        elif value:
+            ips.append(value)
+    return [ip for ip in ips if isinstance(ip, str) and _is_global_ip(ip)]
+
+async def _record_lookup_result(provider_name: str, result: Dict, ip_address: Optional[str] = None) -> None:
+    """
+    根据提供商查询结果更新已确认的IP归属
+    
+    查询成功时记录实例的公网IP（查询的目标IP为私网地址时不记录）；按IP查询未找到时，删除该IP归属于此提供商的记录。
+    部分区域查询失败（failed_regions）时未找到不能说明实例不存在，保留已有记录
+    
+    Args:
+        provider_name (str): 提供商名称
+        result (dict): 提供商查询结果
+        ip_address (str, optional): 按IP查询时的目标IP
+    """
+    if result.get('found') is True:
+        instance_info = result.get('instance_info') or result.get('droplet_info') or {}
+        ips = _public_ips_of(instance_info) + ([ip_address] if ip_address and _is_global_ip(ip_address) else [])
+        await learn_ip_providers_async({ip: provider_name for ip in ips})
+    elif result.get('found') is False and ip_address and not result.get('failed_regions'):
+        await forget_ip_provider_async(ip_address, provider_name)
+
+async def _lookup_instance_by_ip(provider_name: str, ip_address: str) -> Dict:
+    """调用对应提供商的按IP查询方法"""
+    provider_obj = ASYNC_PROVIDERS[provider_name]
+    if provider_name == 'digitalocean':
+        return await provider_obj.get_droplet_by_ip(ip_address)
+    return await provider_obj.get_instance_by_ip(ip_address)
+
+async def _lookup_instances_by_ips(provider_name: str, ip_addresses: List[str]) -> Dict:
+    """调用对应提供商的批量按IP查询方法"""
+    provider_obj = ASYNC_PROVIDERS[provider_name]
+    if provider_name == 'digitalocean':
+        return await provider_obj.get_droplets_by_ips(ip_addresses)
+    return await provider_obj.get_instances_by_ips(ip_addresses)
+
+async def _inventory_lookup_ip(ip_address: str, provider_name: Optional[str] = None) -> Optional[Dict]:
+    """在线程池中按IP查找清单（清单拉取进行中时查找会等待其完成，不能阻塞事件循环）"""
+    return await run_blocking(inventory.lookup_ip, ip_address, provider_name)
+
+async def _race_instance_lookup(ip_address: str) -> Dict:
+    """
+    竞速查询：同时启动IP检测和所有可用提供商的按IP查询
+    
+    第一个找到实例的提供商结果立即返回，其余查询任务被取消
+    （已在线程池中执行的阻塞调用会运行结束，但结果将被忽略）。即使IP检测结果为unknown，
+    只要IP属于任一已配置账号中的实例也能被找到。
+    
+    Args:
+        ip_address (str): 公网IP地址
+        
+    Returns:
+        Dict: 查询结果
+    """
+    available = [name for name, p in PROVIDERS.items() if getattr(p, 'available', False)]
+    if not available:
+        return {
+            'error': '没有可用的云服务提供商',
+            'search_ip': ip_address,
+            'suggestion': '请检查相关环境变量是否正确配置'
+        }
+    
+    tasks = {asyncio.ensure_future(detect_cloud_provider_async(ip_address, IPINFO_API_TOKEN)): None}
+    for name in available:
+        tasks[asyncio.ensure_future(_lookup_instance_by_ip(name, ip_address))] = name
+    
+    detected = None
+    errors = {}
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                provider_name = tasks[task]
+                if provider_name is None:
+                    try:
+                        detected = task.result()
+                    except Exception:
+                        detected = 'unknown'
+                    continue
+                
+                try:
+                    result = task.result()
+                except Exception as e:
+                    result = {'error': str(e), 'provider': provider_name}
+                
+                await _record_lookup_result(provider_name, result, ip_address)
+                if result.get('found'):
+                    provider_info = get_cloud_provider_info(provider_name)
+                    print(f"✅ {provider_info['name']} 最先找到实例")
+                    result['detected_provider'] = provider_name
+                    result['ip_detection_result'] = detected
+                    result['lookup_mode'] = 'race'
+                    result['provider_info'] = provider_info
+                    result['search_ip'] = ip_address
+                    return result
+                if result.get('error'):
+                    errors[provider_name] = result['error']
+    finally:
+        for task in pending:
+            task.cancel()
+    
+    return {
+        'found': False,
+        'message': f'所有可用的云服务提供商中均未找到使用IP地址 {ip_address} 的实例',
+        'search_ip': ip_address,
+        'detected_provider': detected or 'unknown',
+        'lookup_mode': 'race',
+        'providers_checked': available,
+        'provider_errors': errors
+    }
+
+async def _record_listing_result(provider_name: str, result: Dict) -> None:
+    """根据实例列表记录各实例公网IP的归属（在一个事务中写入）"""
+    await learn_ip_providers_async({
+        ip: provider_name
+        for instance_info in result.get('instances') or result.get('droplets') or []
+        for ip in _public_ips_of(instance_info)
+    })
+
 @mcp.tool()
-def get_instance_info(ip_address: str, provider: Optional[str] = None) -> Dict:
+async def get_instance_info(ip_address: str, provider: Optional[str] = None, race: Optional[bool] = None) -> Dict:
     """
     根据IP地址自动检测云服务提供商并获取实例信息
     
     Args:
         ip_address (str): 公网IP地址
         provider (str, optional): 明确指定的云服务提供商 ('aws', 'digitalocean', 'vultr', 'alibaba')
+        race (bool, optional): 未指定提供商时，是否同时进行IP检测和所有提供商查询，
+            取最先找到实例的结果（默认由 IP_LOOKUP_RACE_MODE 环境变量决定）
         
     Returns:
         Dict: 实例信息，包含提供商信息和实例详情
     """
+    # 优先从内存清单缓存中查找
+    if inventory.enabled:
+        record = await _inventory_lookup_ip(ip_address, provider.lower() if provider else None)
+        if record:
+            provider_name = record['provider']
+            result = inventory.to_lookup_result(record)
+            result['detected_provider'] = provider_name if not provider else f'{provider_name} (用户指定)'
+            result['provider_info'] = get_cloud_provider_info(provider_name)
+            result['search_ip'] = ip_address
+            return result
+    
+    if not provider and (race if race is not None else IP_LOOKUP_RACE_MODE):
+        print("🏁 竞速模式: 同时检测IP归属并查询所有可用的云服务提供商...")
+        return await _race_instance_lookup(ip_address)
+    
     # 如果用户明确指定了云服务提供商，直接使用
     if provider:
         provider_name = provider.lower()
@@ -78,7 +295,7 @@ def get_instance_info(ip_address: str, provider: Optional[str] = None) -> Dict:
     else:
         # 检测云服务提供商
         print("🔍 正在检测IP地址对应的云服务提供商...")
-        provider_name = detect_cloud_provider(ip_address, IPINFO_API_TOKEN)
+        provider_name = await detect_cloud_provider_async(ip_address, IPINFO_API_TOKEN)
         provider_info = get_cloud_provider_info(provider_name)
         
         if provider_name == 'unknown':
@@ -116,19 +333,9 @@ def get_instance_info(ip_address: str, provider: Optional[str] = None) -> Dict:
     print(f"🔍 正在查询 {provider_info['name']} 实例信息...")
     
     try:
-        if provider_name == 'aws':
-            result = provider_obj.get_instance_by_ip(ip_address)
-        elif provider_name == 'digitalocean':
-            result = provider_obj.get_droplet_by_ip(ip_address)
-        elif provider_name == 'vultr':
-            result = provider_obj.get_instance_by_ip(ip_address)
-        elif provider_name == 'alibaba':
-            result = provider_obj.get_instance_by_ip(ip_address)
-        else:
-            return {
-                'error': f'提供商 {provider_name} 的查询方法未实现',
-                'detected_provider': provider_name
-            }
+        result = await _lookup_instance_by_ip(provider_name, ip_address)
+        
+        await _record_lookup_result(provider_name, result, ip_address)
         
         # 添加检测信息到结果中
         result['detected_provider'] = provider_name if not provider else f'{provider_name} (用户指定)'
@@ -146,7 +353,123 @@ def get_instance_info(ip_address: str, provider: Optional[str] = None) -> Dict:
         }
 
 @mcp.tool()
-def get_instance_by_provider(provider: str, identifier: str) -> Dict:
+async def batch_detect_cloud_providers(ip_addresses: List[str]) -> Dict:
+    """
+    批量检测IP地址对应的云服务提供商
+    
+    Args:
+        ip_addresses (List[str]): IP地址列表（重复的IP会自动去重）
+        
+    Returns:
+        Dict: 每个IP对应的云服务提供商，以及按提供商分组的汇总
+    """
+    print(f"🔍 正在批量检测 {len(ip_addresses)} 个IP地址对应的云服务提供商...")
+    results = await run_blocking(detect_cloud_providers, ip_addresses, IPINFO_API_TOKEN)
+    
+    grouped = {}
+    for ip_address, provider_name in results.items():
+        grouped.setdefault(provider_name, []).append(ip_address)
+    
+    return {
+        'total_input': len(ip_addresses),
+        'unique_ips': len(results),
+        'results': results,
+        'grouped_by_provider': grouped,
+        'summary': {provider_name: len(ips) for provider_name, ips in grouped.items()}
+    }
+
+@mcp.tool()
+async def get_instances_info(ip_addresses: List[str]) -> Dict:
+    """
+    批量根据IP地址获取实例信息
+    
+    先从内存清单缓存中查找，其余IP批量检测云服务提供商后按提供商分组，
+    每个提供商只发起一次批量查询（各提供商之间并发进行）
+    
+    Args:
+        ip_addresses (List[str]): 公网IP地址列表（重复的IP会自动去重）
+        
+    Returns:
+        Dict: 以IP为键的实例信息，格式与 get_instance_info 一致
+    """
+    ips = list(dict.fromkeys(ip.strip() for ip in ip_addresses if ip and ip.strip()))
+    results = {}
+    
+    # 优先从内存清单缓存中查找
+    if inventory.enabled:
+        records = await run_blocking(lambda: [inventory.lookup_ip(ip_address) for ip_address in ips])
+        for ip_address, record in zip(ips, records):
+            if record:
+                result = inventory.to_lookup_result(record)
+                result['detected_provider'] = record['provider']
+                result['provider_info'] = get_cloud_provider_info(record['provider'])
+                result['search_ip'] = ip_address
+                results[ip_address] = result
+    
+    remaining = [ip_address for ip_address in ips if ip_address not in results]
+    print(f"🔍 正在批量检测 {len(remaining)} 个IP地址对应的云服务提供商...")
+    detected = await run_blocking(detect_cloud_providers, remaining, IPINFO_API_TOKEN) if remaining else {}
+    
+    grouped = {}
+    for ip_address in remaining:
+        provider_name = detected.get(ip_address, 'unknown')
+        provider_obj = PROVIDERS.get(provider_name)
+        if provider_obj is None:
+            results[ip_address] = {
+                'error': '无法识别IP地址对应的云服务提供商',
+                'ip_address': ip_address,
+                'detected_provider': provider_name,
+                'suggestion': '请使用 get_instance_info 并指定 provider 参数查询'
+            }
+        elif not getattr(provider_obj, 'available', False):
+            provider_info = get_cloud_provider_info(provider_name)
+            results[ip_address] = {
+                'error': f'{provider_info["name"]} 提供商不可用: {getattr(provider_obj, "error", "提供商不可用")}',
+                'provider': provider_name,
+                'provider_info': provider_info,
+                'search_ip': ip_address
+            }
+        else:
+            grouped.setdefault(provider_name, []).append(ip_address)
+    
+    if grouped:
+        print(f"🔍 正在批量查询: {', '.join(f'{name}({len(group)})' for name, group in grouped.items())}")
+        responses = await asyncio.gather(
+            *(_lookup_instances_by_ips(provider_name, group) for provider_name, group in grouped.items()),
+            return_exceptions=True
+        )
+        for provider_name, response in zip(grouped, responses):
+            provider_info = get_cloud_provider_info(provider_name)
+            if isinstance(response, Exception):
+                response = {'error': str(response), 'provider': provider_name}
+            
+            for ip_address in grouped[provider_name]:
+                if response.get('error'):
+                    result = {
+                        'error': f'查询 {provider_info["name"]} 实例时发生错误: {response["error"]}',
+                        'provider': provider_name
+                    }
+                else:
+                    result = response['results'][ip_address]
+                    # 有区域查询失败时，未找到的结果不能确认IP不属于该提供商
+                    if response.get('failed_regions'):
+                        result['failed_regions'] = response['failed_regions']
+                    await _record_lookup_result(provider_name, result, ip_address)
+                result['detected_provider'] = provider_name
+                result['provider_info'] = provider_info
+                result['search_ip'] = ip_address
+                results[ip_address] = result
+    
+    return {
+        'total_input': len(ip_addresses),
+        'unique_ips': len(ips),
+        'found': sum(1 for result in results.values() if result.get('found')),
+        'queried_providers': {provider_name: len(group) for provider_name, group in grouped.items()},
+        'results': {ip_address: results[ip_address] for ip_address in ips}
+    }
+
+@mcp.tool()
+async def get_instance_by_provider(provider: str, identifier: str) -> Dict:
     """
     通过明确指定的云服务提供商查询实例信息
     
@@ -165,7 +488,7 @@ def get_instance_by_provider(provider: str, identifier: str) -> Dict:
             'supported_providers': list(PROVIDERS.keys())
         }
     
-    provider_obj = PROVIDERS[provider_name]
+    provider_obj = ASYNC_PROVIDERS[provider_name]
     provider_info = get_cloud_provider_info(provider_name)
     
     # 检查提供商是否可用
@@ -179,29 +502,47 @@ def get_instance_by_provider(provider: str, identifier: str) -> Dict:
     
     print(f"🎯 直接查询 {provider_info['name']} 实例: {identifier}")
     
+    # 优先从内存清单缓存中查找
+    if inventory.enabled:
+        record = await run_blocking(
+            lambda: inventory.lookup_id(identifier, provider_name) or inventory.lookup_ip(identifier, provider_name)
+        )
+        if record:
+            result = inventory.to_lookup_result(record)
+            result['provider_info'] = provider_info
+            result['search_identifier'] = identifier
+            return result
+    
     try:
         # 根据标识符类型判断查询方式
+        searched_ip = None
         if provider_name == 'aws':
             if identifier.startswith('i-'):
-                result = provider_obj.get_instance_by_id(identifier)
+                result = await provider_obj.get_instance_by_id(identifier)
             else:
-                result = provider_obj.get_instance_by_ip(identifier)
+                searched_ip = identifier
+                result = await provider_obj.get_instance_by_ip(identifier)
         elif provider_name == 'digitalocean':
             if identifier.isdigit():
-                result = provider_obj.get_droplet_by_id(int(identifier))
+                result = await provider_obj.get_droplet_by_id(int(identifier))
             else:
-                result = provider_obj.get_droplet_by_ip(identifier)
+                searched_ip = identifier
+                result = await provider_obj.get_droplet_by_ip(identifier)
         elif provider_name == 'vultr':
             # Vultr实例ID通常是UUID格式
             if len(identifier) > 16 and '-' in identifier:
-                result = provider_obj.get_instance_by_id(identifier)
+                result = await provider_obj.get_instance_by_id(identifier)
             else:
-                result = provider_obj.get_instance_by_ip(identifier)
+                searched_ip = identifier
+                result = await provider_obj.get_instance_by_ip(identifier)
         elif provider_name == 'alibaba':
             if identifier.startswith('i-'):
-                result = provider_obj.get_instance_by_id(identifier)
+                result = await provider_obj.get_instance_by_id(identifier)
             else:
-                result = provider_obj.get_instance_by_ip(identifier)
+                searched_ip = identifier
+                result = await provider_obj.get_instance_by_ip(identifier)
+        
+        await _record_lookup_result(provider_name, result, searched_ip)
         
         # 添加提供商信息
         result['provider'] = provider_name
@@ -218,7 +559,48 @@ def get_instance_by_provider(provider: str, identifier: str) -> Dict:
         }
 
 @mcp.tool()
-def manage_instance_power(
+async def search_inventory(query: str, provider: Optional[str] = None) -> Dict:
+    """
+    在内存实例清单中按IP地址、实例ID或实例名称查找实例（不访问云厂商API）
+    
+    Args:
+        query (str): IP地址（公网或私网）、实例ID或实例名称
+        provider (str, optional): 只在指定的云服务提供商中查找
+        
+    Returns:
+        Dict: 匹配的实例列表
+    """
+    if not inventory.enabled:
+        return {
+            'error': '实例清单缓存未启用',
+            'suggestion': '请设置环境变量 INVENTORY_CACHE_ENABLED=true 后重启服务'
+        }
+    
+    provider_name = provider.lower() if provider else None
+    if provider_name and provider_name not in PROVIDERS:
+        return {
+            'error': f'不支持的云服务提供商: {provider_name}',
+            'supported_providers': list(PROVIDERS.keys())
+        }
+    
+    def lookup() -> List[Dict]:
+        records = inventory.lookup_ip_all(query, provider_name)
+        if records:
+            return records
+        record = inventory.lookup_id(query, provider_name)
+        return [record] if record else inventory.lookup_name(query, provider_name)
+    
+    records = await run_blocking(lookup)
+    
+    return {
+        'query': query,
+        'total_matches': len(records),
+        'matches': [inventory.to_lookup_result(r) for r in records],
+        'inventory_status': inventory.get_stats()['providers']
+    }
+
+@mcp.tool()
+async def manage_instance_power(
     provider: str, 
     instance_id: str, 
     action: str,
@@ -262,7 +644,7 @@ def manage_instance_power(
             'supported_actions': ['power_on', 'power_off', 'reboot', 'shutdown']
         }
     
-    provider_obj = PROVIDERS[provider_name]
+    provider_obj = ASYNC_PROVIDERS[provider_name]
     provider_info = get_cloud_provider_info(provider_name)
     
     # 检查提供商是否可用
@@ -283,35 +665,35 @@ def manage_instance_power(
                 return {'error': 'DigitalOcean Droplet ID必须是数字'}
                 
             if action == 'power_on':
-                return provider_obj.power_on_droplet(droplet_id, ip_confirmation, name_confirmation, operation_confirmation)
+                return await provider_obj.power_on_droplet(droplet_id, ip_confirmation, name_confirmation, operation_confirmation)
             elif action == 'power_off':
-                return provider_obj.power_off_droplet(droplet_id, ip_confirmation, name_confirmation, operation_confirmation)
+                return await provider_obj.power_off_droplet(droplet_id, ip_confirmation, name_confirmation, operation_confirmation)
             elif action == 'reboot':
-                return provider_obj.reboot_droplet(droplet_id, ip_confirmation, name_confirmation, operation_confirmation)
+                return await provider_obj.reboot_droplet(droplet_id, ip_confirmation, name_confirmation, operation_confirmation)
             elif action == 'shutdown':
-                return provider_obj.shutdown_droplet(droplet_id, ip_confirmation, name_confirmation, operation_confirmation)
+                return await provider_obj.shutdown_droplet(droplet_id, ip_confirmation, name_confirmation, operation_confirmation)
                 
         elif provider_name == 'vultr':
             if action == 'power_on':
-                return provider_obj.power_on_instance(instance_id, ip_confirmation, name_confirmation, operation_confirmation)
+                return await provider_obj.power_on_instance(instance_id, ip_confirmation, name_confirmation, operation_confirmation)
             elif action == 'power_off':
-                return provider_obj.power_off_instance(instance_id, ip_confirmation, name_confirmation, operation_confirmation)
+                return await provider_obj.power_off_instance(instance_id, ip_confirmation, name_confirmation, operation_confirmation)
             elif action == 'reboot':
-                return provider_obj.reboot_instance(instance_id, ip_confirmation, name_confirmation, operation_confirmation)
+                return await provider_obj.reboot_instance(instance_id, ip_confirmation, name_confirmation, operation_confirmation)
             elif action == 'shutdown':
                 # Vultr可能不支持优雅关闭，使用强制关闭
-                return provider_obj.power_off_instance(instance_id, ip_confirmation, name_confirmation, operation_confirmation)
+                return await provider_obj.power_off_instance(instance_id, ip_confirmation, name_confirmation, operation_confirmation)
                 
         elif provider_name == 'alibaba':
             if action == 'power_on':
-                return provider_obj.power_on_instance(instance_id, ip_confirmation, name_confirmation, operation_confirmation)
+                return await provider_obj.power_on_instance(instance_id, ip_confirmation, name_confirmation, operation_confirmation)
             elif action == 'power_off':
-                return provider_obj.power_off_instance(instance_id, ip_confirmation, name_confirmation, operation_confirmation)
+                return await provider_obj.power_off_instance(instance_id, ip_confirmation, name_confirmation, operation_confirmation)
             elif action == 'reboot':
-                return provider_obj.reboot_instance(instance_id, ip_confirmation, name_confirmation, operation_confirmation)
+                return await provider_obj.reboot_instance(instance_id, ip_confirmation, name_confirmation, operation_confirmation)
             elif action == 'shutdown':
                 # 阿里云使用power_off作为关闭操作
-                return provider_obj.power_off_instance(instance_id, ip_confirmation, name_confirmation, operation_confirmation)
+                return await provider_obj.power_off_instance(instance_id, ip_confirmation, name_confirmation, operation_confirmation)
         
     except Exception as e:
         return {
@@ -322,7 +704,7 @@ def manage_instance_power(
         }
 
 @mcp.tool()
-def get_aws_instance_info(ip_address_or_id: str) -> Dict:
+async def get_aws_instance_info(ip_address_or_id: str) -> Dict:
     """
     获取AWS EC2实例信息（只读）
     
@@ -334,12 +716,15 @@ def get_aws_instance_info(ip_address_or_id: str) -> Dict:
     """
     # 判断是IP地址还是实例ID
     if ip_address_or_id.startswith('i-'):
-        return aws_provider.get_instance_by_id(ip_address_or_id)
+        result = await ASYNC_PROVIDERS['aws'].get_instance_by_id(ip_address_or_id)
+        await _record_lookup_result('aws', result)
     else:
-        return aws_provider.get_instance_by_ip(ip_address_or_id)
+        result = await ASYNC_PROVIDERS['aws'].get_instance_by_ip(ip_address_or_id)
+        await _record_lookup_result('aws', result, ip_address_or_id)
+    return result
 
 @mcp.tool()
-def get_aws_instance_storage_info(instance_id: str) -> Dict:
+async def get_aws_instance_storage_info(instance_id: str) -> Dict:
     """
     获取AWS EC2实例的存储详细信息
     
@@ -349,10 +734,10 @@ def get_aws_instance_storage_info(instance_id: str) -> Dict:
     Returns:
         Dict: 存储信息，包括磁盘类型、IOPS、吞吐量等
     """
-    return aws_provider.get_instance_storage_info(instance_id)
+    return await ASYNC_PROVIDERS['aws'].get_instance_storage_info(instance_id)
 
 @mcp.tool()
-def get_aws_instance_monitoring(instance_id: str, hours: int = 1) -> Dict:
+async def get_aws_instance_monitoring(instance_id: str, hours: int = 1) -> Dict:
     """
     获取AWS EC2实例的监控数据
     
@@ -363,20 +748,34 @@ def get_aws_instance_monitoring(instance_id: str, hours: int = 1) -> Dict:
     Returns:
         Dict: 监控数据
     """
-    return aws_provider.get_instance_monitoring_data(instance_id, hours)
+    return await ASYNC_PROVIDERS['aws'].get_instance_monitoring_data(instance_id, hours)
 
 @mcp.tool()
-def list_aws_instances() -> Dict:
+async def list_aws_instances(
+    cursor: Optional[str] = None,
+    page_size: Optional[int] = None,
+    name: Optional[str] = None,
+    tag: Optional[str] = None
+) -> Dict:
     """
-    列出所有AWS EC2实例
+    列出AWS EC2实例
     
+    Args:
+        cursor (str, optional): 分页游标，传入上一页返回的 next_cursor
+        page_size (int, optional): 每页数量（5-1000），指定 cursor 或 page_size 时只返回一页，
+            多区域时逐个区域翻页
+        name (str, optional): 按Name标签过滤，支持 * 通配符
+        tag (str, optional): 按标签过滤，格式为 "键" 或 "键=值"
+        
     Returns:
-        Dict: AWS实例列表
+        Dict: AWS实例列表，分页时包含 next_cursor 和本页所在区域 region
     """
-    return aws_provider.list_instances()
+    result = await ASYNC_PROVIDERS['aws'].list_instances(cursor, page_size, name, tag)
+    await _record_listing_result('aws', result)
+    return result
 
 @mcp.tool()
-def get_digitalocean_droplet_info(ip_address_or_id: str) -> Dict:
+async def get_digitalocean_droplet_info(ip_address_or_id: str) -> Dict:
     """
     获取DigitalOcean Droplet信息
     
@@ -388,12 +787,15 @@ def get_digitalocean_droplet_info(ip_address_or_id: str) -> Dict:
     """
     # 判断是IP地址还是Droplet ID
     if ip_address_or_id.isdigit():
-        return digitalocean_provider.get_droplet_by_id(int(ip_address_or_id))
+        result = await ASYNC_PROVIDERS['digitalocean'].get_droplet_by_id(int(ip_address_or_id))
+        await _record_lookup_result('digitalocean', result)
     else:
-        return digitalocean_provider.get_droplet_by_ip(ip_address_or_id)
+        result = await ASYNC_PROVIDERS['digitalocean'].get_droplet_by_ip(ip_address_or_id)
+        await _record_lookup_result('digitalocean', result, ip_address_or_id)
+    return result
 
 @mcp.tool()
-def power_on_digitalocean_droplet(
+async def power_on_digitalocean_droplet(
     droplet_id: int, 
     ip_confirmation: str = "", 
     name_confirmation: str = "", 
@@ -411,12 +813,12 @@ def power_on_digitalocean_droplet(
     Returns:
         Dict: 操作结果或确认要求
     """
-    return digitalocean_provider.power_on_droplet(
+    return await ASYNC_PROVIDERS['digitalocean'].power_on_droplet(
         droplet_id, ip_confirmation, name_confirmation, operation_confirmation
     )
 
 @mcp.tool()
-def power_off_digitalocean_droplet(
+async def power_off_digitalocean_droplet(
     droplet_id: int, 
     ip_confirmation: str = "", 
     name_confirmation: str = "", 
@@ -425,12 +827,12 @@ def power_off_digitalocean_droplet(
     """
     强制关闭DigitalOcean Droplet（需要三次确认）
     """
-    return digitalocean_provider.power_off_droplet(
+    return await ASYNC_PROVIDERS['digitalocean'].power_off_droplet(
         droplet_id, ip_confirmation, name_confirmation, operation_confirmation
     )
 
 @mcp.tool()
-def shutdown_digitalocean_droplet(
+async def shutdown_digitalocean_droplet(
     droplet_id: int, 
     ip_confirmation: str = "", 
     name_confirmation: str = "", 
@@ -439,12 +841,12 @@ def shutdown_digitalocean_droplet(
     """
     优雅关闭DigitalOcean Droplet（需要三次确认）
     """
-    return digitalocean_provider.shutdown_droplet(
+    return await ASYNC_PROVIDERS['digitalocean'].shutdown_droplet(
         droplet_id, ip_confirmation, name_confirmation, operation_confirmation
     )
 
 @mcp.tool()
-def reboot_digitalocean_droplet(
+async def reboot_digitalocean_droplet(
     droplet_id: int, 
     ip_confirmation: str = "", 
     name_confirmation: str = "", 
@@ -453,33 +855,39 @@ def reboot_digitalocean_droplet(
     """
     重启DigitalOcean Droplet（需要三次确认）
     """
-    return digitalocean_provider.reboot_droplet(
+    return await ASYNC_PROVIDERS['digitalocean'].reboot_droplet(
         droplet_id, ip_confirmation, name_confirmation, operation_confirmation
     )
 
 @mcp.tool()
-def list_digitalocean_droplets() -> Dict:
+async def list_digitalocean_droplets(name: Optional[str] = None, tag: Optional[str] = None) -> Dict:
     """
-    列出所有DigitalOcean Droplets
+    列出DigitalOcean Droplets
+    
+    Args:
+        name (str, optional): 按Droplet名称过滤
+        tag (str, optional): 按标签过滤
     """
-    return digitalocean_provider.list_droplets()
+    result = await ASYNC_PROVIDERS['digitalocean'].list_droplets(name, tag)
+    await _record_listing_result('digitalocean', result)
+    return result
 
 @mcp.tool()
-def get_digitalocean_droplet_monitoring(droplet_id: int) -> Dict:
+async def get_digitalocean_droplet_monitoring(droplet_id: int) -> Dict:
     """
     获取DigitalOcean Droplet监控信息
     """
-    return digitalocean_provider.get_droplet_monitoring(droplet_id)
+    return await ASYNC_PROVIDERS['digitalocean'].get_droplet_monitoring(droplet_id)
 
 @mcp.tool()
-def get_digitalocean_droplet_actions(droplet_id: int) -> Dict:
+async def get_digitalocean_droplet_actions(droplet_id: int) -> Dict:
     """
     获取DigitalOcean Droplet操作历史
     """
-    return digitalocean_provider.get_droplet_actions(droplet_id)
+    return await ASYNC_PROVIDERS['digitalocean'].get_droplet_actions(droplet_id)
 
 @mcp.tool()
-def get_vultr_instance_info(ip_address_or_id: str) -> Dict:
+async def get_vultr_instance_info(ip_address_or_id: str) -> Dict:
     """
     获取Vultr实例信息
     
@@ -491,12 +899,15 @@ def get_vultr_instance_info(ip_address_or_id: str) -> Dict:
     """
     # Vultr实例ID通常是UUID格式
     if '-' in ip_address_or_id and len(ip_address_or_id) > 20:
-        return vultr_provider.get_instance_by_id(ip_address_or_id)
+        result = await ASYNC_PROVIDERS['vultr'].get_instance_by_id(ip_address_or_id)
+        await _record_lookup_result('vultr', result)
     else:
-        return vultr_provider.get_instance_by_ip(ip_address_or_id)
+        result = await ASYNC_PROVIDERS['vultr'].get_instance_by_ip(ip_address_or_id)
+        await _record_lookup_result('vultr', result, ip_address_or_id)
+    return result
 
 @mcp.tool()
-def power_on_vultr_instance(
+async def power_on_vultr_instance(
     instance_id: str, 
     ip_confirmation: str = "", 
     name_confirmation: str = "", 
@@ -505,12 +916,12 @@ def power_on_vultr_instance(
     """
     开启Vultr实例（需要三次确认）
     """
-    return vultr_provider.power_on_instance(
+    return await ASYNC_PROVIDERS['vultr'].power_on_instance(
         instance_id, ip_confirmation, name_confirmation, operation_confirmation
     )
 
 @mcp.tool()
-def power_off_vultr_instance(
+async def power_off_vultr_instance(
     instance_id: str, 
     ip_confirmation: str = "", 
     name_confirmation: str = "", 
@@ -519,12 +930,12 @@ def power_off_vultr_instance(
     """
     强制关闭Vultr实例（需要三次确认）
     """
-    return vultr_provider.power_off_instance(
+    return await ASYNC_PROVIDERS['vultr'].power_off_instance(
         instance_id, ip_confirmation, name_confirmation, operation_confirmation
     )
 
 @mcp.tool()
-def reboot_vultr_instance(
+async def reboot_vultr_instance(
     instance_id: str, 
     ip_confirmation: str = "", 
     name_confirmation: str = "", 
@@ -533,26 +944,39 @@ def reboot_vultr_instance(
     """
     重启Vultr实例（需要三次确认）
     """
-    return vultr_provider.reboot_instance(
+    return await ASYNC_PROVIDERS['vultr'].reboot_instance(
         instance_id, ip_confirmation, name_confirmation, operation_confirmation
     )
 
 @mcp.tool()
-def list_vultr_instances() -> Dict:
+async def list_vultr_instances(
+    cursor: Optional[str] = None,
+    page_size: Optional[int] = None,
+    name: Optional[str] = None,
+    tag: Optional[str] = None
+) -> Dict:
     """
-    列出所有Vultr实例
+    列出Vultr实例
+    
+    Args:
+        cursor (str, optional): 分页游标，传入上一页返回的 next_cursor
+        page_size (int, optional): 每页数量（1-500），指定 cursor 或 page_size 时只返回一页
+        name (str, optional): 按实例标签名（label）过滤
+        tag (str, optional): 按标签过滤
     """
-    return vultr_provider.list_instances()
+    result = await ASYNC_PROVIDERS['vultr'].list_instances(cursor, page_size, name, tag)
+    await _record_listing_result('vultr', result)
+    return result
 
 @mcp.tool()
-def get_vultr_instance_bandwidth(instance_id: str) -> Dict:
+async def get_vultr_instance_bandwidth(instance_id: str) -> Dict:
     """
     获取Vultr实例带宽使用情况
     """
-    return vultr_provider.get_instance_bandwidth(instance_id)
+    return await ASYNC_PROVIDERS['vultr'].get_instance_bandwidth(instance_id)
 
 @mcp.tool()
-def get_alibaba_instance_info(ip_address_or_id: str) -> Dict:
+async def get_alibaba_instance_info(ip_address_or_id: str) -> Dict:
     """
     获取阿里云ECS实例信息
     
@@ -564,12 +988,15 @@ def get_alibaba_instance_info(ip_address_or_id: str) -> Dict:
     """
     # 阿里云实例ID通常以i-开头
     if ip_address_or_id.startswith('i-'):
-        return alibaba_provider.get_instance_by_id(ip_address_or_id)
+        result = await ASYNC_PROVIDERS['alibaba'].get_instance_by_id(ip_address_or_id)
+        await _record_lookup_result('alibaba', result)
     else:
-        return alibaba_provider.get_instance_by_ip(ip_address_or_id)
+        result = await ASYNC_PROVIDERS['alibaba'].get_instance_by_ip(ip_address_or_id)
+        await _record_lookup_result('alibaba', result, ip_address_or_id)
+    return result
 
 @mcp.tool()
-def power_on_alibaba_instance(
+async def power_on_alibaba_instance(
     instance_id: str, 
     ip_confirmation: str = "", 
     name_confirmation: str = "", 
@@ -578,12 +1005,12 @@ def power_on_alibaba_instance(
     """
     启动阿里云ECS实例（需要三次确认）
     """
-    return alibaba_provider.power_on_instance(
+    return await ASYNC_PROVIDERS['alibaba'].power_on_instance(
         instance_id, ip_confirmation, name_confirmation, operation_confirmation
     )
 
 @mcp.tool()
-def power_off_alibaba_instance(
+async def power_off_alibaba_instance(
     instance_id: str, 
     ip_confirmation: str = "", 
     name_confirmation: str = "", 
@@ -592,12 +1019,12 @@ def power_off_alibaba_instance(
     """
     强制停止阿里云ECS实例（需要三次确认）
     """
-    return alibaba_provider.power_off_instance(
+    return await ASYNC_PROVIDERS['alibaba'].power_off_instance(
         instance_id, ip_confirmation, name_confirmation, operation_confirmation
     )
 
 @mcp.tool()
-def reboot_alibaba_instance(
+async def reboot_alibaba_instance(
     instance_id: str, 
     ip_confirmation: str = "", 
     name_confirmation: str = "", 
@@ -606,26 +1033,32 @@ def reboot_alibaba_instance(
     """
     重启阿里云ECS实例（需要三次确认）
     """
-    return alibaba_provider.reboot_instance(
+    return await ASYNC_PROVIDERS['alibaba'].reboot_instance(
         instance_id, ip_confirmation, name_confirmation, operation_confirmation
     )
 
 @mcp.tool()
-def list_alibaba_instances() -> Dict:
+async def list_alibaba_instances(name: Optional[str] = None, tag: Optional[str] = None) -> Dict:
     """
-    列出所有阿里云ECS实例
+    列出阿里云ECS实例
+    
+    Args:
+        name (str, optional): 按实例名称过滤，支持 * 通配符
+        tag (str, optional): 按标签过滤，格式为 "键" 或 "键=值"
     """
-    return alibaba_provider.list_instances()
+    result = await ASYNC_PROVIDERS['alibaba'].list_instances(name, tag)
+    await _record_listing_result('alibaba', result)
+    return result
 
 @mcp.tool()
-def get_alibaba_instance_monitoring(instance_id: str) -> Dict:
+async def get_alibaba_instance_monitoring(instance_id: str) -> Dict:
     """
     获取阿里云ECS实例监控信息
     """
-    return alibaba_provider.get_instance_monitoring(instance_id)
+    return await ASYNC_PROVIDERS['alibaba'].get_instance_monitoring(instance_id)
 
 @mcp.tool()
-def get_supported_providers() -> Dict:
+async def get_supported_providers() -> Dict:
     """
     获取支持的云服务提供商列表
     
@@ -658,7 +1091,7 @@ def get_supported_providers() -> Dict:
     }
 
 @mcp.tool()
-def check_provider_availability(provider_name: str) -> Dict:
+async def check_provider_availability(provider_name: str) -> Dict:
     """
     检查特定云服务提供商的可用性
     
@@ -695,12 +1128,13 @@ def check_provider_availability(provider_name: str) -> Dict:
         'provider_info': provider_info,
         'available': getattr(provider, 'available', False),
         'error': getattr(provider, 'error', None),
+        'circuit_breaker': ASYNC_PROVIDERS[provider_name].get_circuit_breaker_stats(),
         'environment_variables': env_status,
         'all_env_vars_set': all(env_status.values()) if env_status else False
     }
 
 @mcp.tool()
-def get_system_status() -> Dict:
+async def get_system_status() -> Dict:
     """
     获取整个系统的状态概览
     
@@ -714,7 +1148,12 @@ def get_system_status() -> Dict:
         is_available = getattr(provider, 'available', False)
         provider_status[provider_name] = {
             'available': is_available,
-            'error': getattr(provider, 'error', None) if not is_available else None
+            'error': getattr(provider, 'error', None) if not is_available else None,
+            'executor': PROVIDER_EXECUTORS[provider_name].get_stats(),
+            'fanout_executor': provider.fanout_executor.get_stats() if getattr(provider, 'fanout_executor', None) else None,
+            'coalescing': ASYNC_PROVIDERS[provider_name].get_coalescing_stats(),
+            'rate_limit': provider.rate_limiter.get_stats() if getattr(provider, 'rate_limiter', None) else None,
+            'circuit_breaker': ASYNC_PROVIDERS[provider_name].get_circuit_breaker_stats()
         }
         if is_available:
             available_count += 1
@@ -725,6 +1164,12 @@ def get_system_status() -> Dict:
         'available_providers': available_count,
         'provider_status': provider_status,
         'ip_detection_enabled': bool(IPINFO_API_TOKEN),
+        'ip_range_index': get_ip_range_index().get_stats(),
+        'asn_database': get_asn_database_stats(),
+        'ip_detection_cache': isp_cache.get_stats(),
+        'learned_ip_providers': learned_providers.get_stats(),
+        'inventory': inventory.get_stats(),
+        'http_clients': get_request_executor_stats(),
         'security_features_enabled': True,
         'version': '2.0.0',
         'capabilities': {
@@ -749,6 +1194,10 @@ def main():
         print(f"{name.upper():>12}: {provider_status[name]}")
     
     print(f"{'IP检测':>12}: {'✅ 可用' if IPINFO_API_TOKEN else '❌ 未配置'}")
+    range_index = get_ip_range_index()
+    print(f"{'IP段索引':>12}: {f'✅ {range_index.total_prefixes} 个网段' if range_index.total_prefixes else '❌ 未配置'}")
+    print(f"{'实例清单缓存':>12}: {f'✅ 每 {inventory.refresh_interval:g} 秒刷新' if inventory.enabled else '❌ 未启用'}")
+    print(f"{'启动预热':>12}: {'✅ 后台进行' if INVENTORY_WARMUP else '❌ 未启用'}")
     print("=" * 60)
     
     available_count = sum(1 for provider in PROVIDERS.values() if getattr(provider, 'available', False))
@@ -772,6 +1221,14 @@ def main():
     print("\n✅ 多云服务器管理系统已就绪！")
     print("🌐 MCP服务器正在启动...")
     
+    # 启动预热：在后台并发拉取清单，服务同时开始接受请求，预热完成前的查询等待进行中的拉取
+    if INVENTORY_WARMUP:
+        inventory.warm_up()
+
+    # 启动实例清单后台刷新（已预热时下一次刷新在一个刷新间隔后进行）
+    if inventory.enabled:
+        inventory.start(run_immediately=not INVENTORY_WARMUP)
+    
     # 启动MCP服务器
     mcp.run()
 
@@ -6,7 +6,16 @@
 
 import os
 import json
-from typing import Dict, Optional
+import ipaddress
+import math
+import threading
+from collections import deque
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from utils.aio import get_fanout_executor
+from utils.circuit_breaker import get_circuit_breaker
+from utils.rate_limit import get_rate_limiter, limited
+from utils.regions import fan_out, first_hit
 from utils.security import SecurityConfirmation, require_triple_confirmation
 
 # 阿里云SDK导入
@@ -23,6 +32,17 @@ except ImportError:
     ecs_models = None
     UtilClient = None
 
+# DescribeInstances 单页允许的最大数量
+ALIBABA_PAGE_SIZE = 100
+# 已知实例总数后并发获取的页数，为1时按 NextToken 顺序翻页
+ALIBABA_PAGE_CONCURRENCY = int(os.getenv('ALIBABA_PAGE_CONCURRENCY', '1'))
+# 按IP查找实例时查询的区域：留空只查询 ALIBABA_CLOUD_REGION_ID，"all" 通过 DescribeRegions 自动发现，或逗号分隔的区域列表
+ALIBABA_CLOUD_REGIONS = os.getenv('ALIBABA_CLOUD_REGIONS', '').strip()
+# 多区域查询时每个区域的超时时间（秒）
+ALIBABA_REGION_TIMEOUT = float(os.getenv('ALIBABA_REGION_TIMEOUT', '15'))
+# IP过滤条件（PublicIpAddresses等）一次最多允许的IP数量
+ALIBABA_FILTER_MAX_VALUES = 100
+
 class AlibabaProvider:
     """阿里云ECS 提供商类"""
     
@@ -40,6 +60,10 @@ class AlibabaProvider:
                     endpoint=f'ecs.{self.region_id}.aliyuncs.com'
                 )
                 self.client = EcsClient(config)
+                # 每个区域一个ECS客户端，首次使用时创建
+                self._clients = {self.region_id: self.client}
+                self._clients_lock = threading.Lock()
+                self._regions: Optional[List[str]] = None
                 self.available = True
             except Exception as e:
                 self.available = False
@@ -47,6 +71,13 @@ class AlibabaProvider:
         else:
             self.available = False
             self.error = "阿里云SDK未安装或凭证未配置"
+        
+        # 同一AccessKey共享限流器（未启用限流时为None）
+        self.rate_limiter = get_rate_limiter('alibaba', self.access_key_id)
+        # API连续失败后快速失败（未启用熔断时为None）
+        self.circuit_breaker = get_circuit_breaker('alibaba')
+        # 多区域查询和并发翻页在共享的固定大小线程池中执行
+        self.fanout_executor = get_fanout_executor('alibaba')
     
     def get_instance_by_ip(self, ip_address: str) -> Dict:
         """
@@ -65,47 +96,103 @@ class AlibabaProvider:
             }
         
         try:
-            # 查询所有ECS实例
-            request = ecs_models.DescribeInstancesRequest(
-                region_id=self.region_id,
-                page_size=100
-            )
-            
-            response = self.client.describe_instances(request)
+            if not self.is_multi_region():
+                instance = self._find_instance_by_ip(ip_address, self.region_id)
+                failed_regions = {}
+            else:
+                # 所有区域并发查询，任一区域找到即返回，不等待其他区域
+                _, instance, failed_regions = first_hit(
+                    self.get_regions(),
+                    lambda region_id: self._find_instance_by_ip(ip_address, region_id),
+                    ALIBABA_REGION_TIMEOUT,
+                    self.fanout_executor
+                )
+                # 没有任何区域给出结果时不能判断IP不属于阿里云，按查询失败处理
+                if len(failed_regions) == len(self.get_regions()):
+                    raise RuntimeError(f'所有区域查询失败: {failed_regions}')
             
-            if not response.body.instances:
+            if instance is not None:
+                instance_info = self._format_instance_info(instance)
                 return {
                     'provider': 'alibaba',
-                    'found': False,
-                    'message': f'未找到使用IP地址 {ip_address} 的ECS实例',
-                    'searched_region': self.region_id
+                    'found': True,
+                    'instance_info': instance_info
                 }
             
-            # 查找匹配的IP地址
-            for instance in response.body.instances.instance:
-                # 检查公网IP
-                public_ips = []
-                if hasattr(instance, 'public_ip_address') and instance.public_ip_address:
-                    public_ips.extend(instance.public_ip_address.ip_address)
-                
-                # 检查弹性公网IP
-                if hasattr(instance, 'eip_address') and instance.eip_address.ip_address:
-                    public_ips.append(instance.eip_address.ip_address)
-                
-                if ip_address in public_ips:
-                    instance_info = self._format_instance_info(instance)
-                    return {
-                        'provider': 'alibaba',
-                        'found': True,
-                        'instance_info': instance_info
-                    }
-            
-            return {
+            result = {
                 'provider': 'alibaba',
                 'found': False,
                 'message': f'未找到使用IP地址 {ip_address} 的ECS实例',
-                'total_instances_checked': len(response.body.instances.instance)
+                'searched_region': self.region_id
             }
+            if self.is_multi_region():
+                result['searched_regions'] = self.get_regions()
+                result['failed_regions'] = failed_regions
+            return result
+            
+        except Exception as e:
+            return {
+                'error': f'查询ECS实例时发生错误: {str(e)}',
+                'provider': 'alibaba'
+            }
+    
+    def get_instances_by_ips(self, ip_addresses: List[str]) -> Dict:
+        """
+        批量根据IP地址查找ECS实例
+        
+        每批最多 ALIBABA_FILTER_MAX_VALUES 个IP只需一次 DescribeInstances 调用；
+        配置多区域时各区域并发查询
+        
+        Args:
+            ip_addresses (List[str]): IP地址列表
+            
+        Returns:
+            Dict: 以IP为键的查询结果（格式与 get_instance_by_ip 一致）或错误信息
+        """
+        if not self.available:
+            return {
+                'error': f'阿里云服务不可用: {getattr(self, "error", "未知错误")}',
+                'provider': 'alibaba'
+            }
+        
+        try:
+            ips = list(dict.fromkeys(ip_addresses))
+            failed_regions = {}
+            if self.is_multi_region():
+                region_results, failed_regions = fan_out(
+                    self.get_regions(),
+                    lambda region_id: self._find_instances_by_ips(ips, region_id),
+                    ALIBABA_REGION_TIMEOUT,
+                    self.fanout_executor
+                )
+                if failed_regions and not region_results:
+                    raise RuntimeError(f'所有区域查询失败: {failed_regions}')
+                found = {}
+                for region_found in region_results.values():
+                    for ip_address, instance in region_found.items():
+                        found.setdefault(ip_address, instance)
+            else:
+                found = self._find_instances_by_ips(ips, self.region_id)
+            
+            results = {}
+            for ip_address in ips:
+                if ip_address in found:
+                    results[ip_address] = {
+                        'provider': 'alibaba',
+                        'found': True,
+                        'instance_info': self._format_instance_info(found[ip_address])
+                    }
+                else:
+                    results[ip_address] = {
+                        'provider': 'alibaba',
+                        'found': False,
+                        'message': f'未找到使用IP地址 {ip_address} 的ECS实例'
+                    }
+            
+            response = {'provider': 'alibaba', 'results': results}
+            if failed_regions:
+                response['failed_regions'] = failed_regions
+            return response
             
         except Exception as e:
             return {
@@ -135,7 +222,7 @@ class AlibabaProvider:
                 instance_ids=json.dumps([instance_id])
             )
             
-            response = self.client.describe_instances(request)
+            response = self._call(self.client.describe_instances, request)
             
             if not response.body.instances or not response.body.instances.instance:
                 return {
@@ -159,10 +246,14 @@ class AlibabaProvider:
                 'provider': 'alibaba'
             }
     
-    def list_instances(self) -> Dict:
+    def list_instances(self, name: Optional[str] = None, tag: Optional[str] = None) -> Dict:
         """
-        列出所有ECS实例
+        列出ECS实例，名称和标签条件由API在服务端过滤
         
+        Args:
+            name (str, optional): 实例名称，支持 * 通配符
+            tag (str, optional): 标签，格式为 "键" 或 "键=值"
+            
         Returns:
             Dict: 实例列表或错误信息
         """
@@ -173,18 +264,19 @@ class AlibabaProvider:
             }
         
         try:
-            request = ecs_models.DescribeInstancesRequest(
-                region_id=self.region_id,
-                page_size=100
-            )
-            
-            response = self.client.describe_instances(request)
+            filters = {}
+            if name:
+                filters['instance_name'] = name
+            if tag:
+                key, has_value, value = tag.partition('=')
+                filters['tag'] = [
+                    ecs_models.DescribeInstancesRequestTag(key=key, value=value if has_value else None)
+                ]
             
             instance_list = []
-            if response.body.instances and response.body.instances.instance:
-                for instance in response.body.instances.instance:
-                    instance_info = self._format_instance_summary(instance)
-                    instance_list.append(instance_info)
+            for instance in self.iter_instances(**filters):
+                instance_info = self._format_instance_summary(instance)
+                instance_list.append(instance_info)
             
             return {
                 'provider': 'alibaba',
@@ -199,6 +291,271 @@ class AlibabaProvider:
                 'provider': 'alibaba'
             }
     
+    def list_inventory_records(self) -> List[Dict]:
+        """
+        获取用于内存清单缓存的标准化实例记录
+        
+        Returns:
+            List[Dict]: 实例记录列表
+            
+        Raises:
+            Exception: 服务不可用或API调用失败
+        """
+        if not self.available:
+            raise RuntimeError(f'阿里云服务不可用: {getattr(self, "error", "未知错误")}')
+        
+        return [self._format_inventory_record(instance) for instance in self.iter_instances()]
+    
+    def iter_instances(
+        self,
+        page_size: int = ALIBABA_PAGE_SIZE,
+        concurrency: Optional[int] = None,
+        region_id: Optional[str] = None,
+        **filters
+    ) -> Iterator:
+        """
+        逐个返回一个区域的所有ECS实例，自动翻页
+        
+        默认按 NextToken 顺序翻页；concurrency 大于1时先获取第一页得到实例总数，
+        再按页码并发获取其余页面，仍按页码顺序返回（在 fanout_executor 的工作线程中调用时始终顺序翻页）。
+        调用方提前结束遍历时不会继续请求后续页面
+        
+        Args:
+            page_size (int): 每页数量
+            concurrency (int, optional): 并发获取的页数，默认为 ALIBABA_PAGE_CONCURRENCY
+            region_id (str, optional): 区域，默认为 ALIBABA_CLOUD_REGION_ID
+            **filters: DescribeInstancesRequest 的服务端过滤条件，
+                例如 public_ip_addresses、eip_addresses、inner_ip_addresses、instance_name、tag
+            
+        Yields:
+            ECS实例对象
+            
+        Raises:
+            Exception: API调用失败
+        """
+        concurrency = concurrency or ALIBABA_PAGE_CONCURRENCY
+        region_id = region_id or self.region_id
+        # 多区域查询的区域任务已在 fanout_executor 中执行，再向其提交页面请求并等待可能死锁，改为顺序翻页
+        if concurrency > 1 and not self.fanout_executor.in_worker_thread():
+            yield from self._iter_instances_by_page(page_size, concurrency, region_id, filters)
+            return
+        
+        client = self.get_client(region_id)
+        next_token = None
+        while True:
+            request = ecs_models.DescribeInstancesRequest(
+                region_id=region_id,
+                max_results=page_size,
+                next_token=next_token,
+                **filters
+            )
+            body = self._call(client.describe_instances, request).body
+            yield from self._instances_of(body)
+            
+            next_token = body.next_token
+            if not next_token:
+                break
+    
+    def is_multi_region(self) -> bool:
+        """是否配置了多区域查询"""
+        return bool(ALIBABA_CLOUD_REGIONS)
+    
+    def get_regions(self) -> List[str]:
+        """
+        获取需要查询的区域列表（结果会被缓存）
+        
+        Returns:
+            List[str]: 区域列表
+        """
+        if self._regions is None:
+            if ALIBABA_CLOUD_REGIONS.lower() == 'all':
+                body = self._call(self.client.describe_regions, ecs_models.DescribeRegionsRequest()).body
+                self._regions = sorted(region.region_id for region in body.regions.region)
+            elif ALIBABA_CLOUD_REGIONS:
+                self._regions = [region.strip() for region in ALIBABA_CLOUD_REGIONS.split(',') if region.strip()]
+            else:
+                self._regions = [self.region_id]
+        return self._regions
+    
+    def get_client(self, region_id: Optional[str] = None):
+        """
+        获取指定区域的ECS客户端（每个区域只创建一次）
+        
+        Args:
+            region_id (str, optional): 区域，默认为 ALIBABA_CLOUD_REGION_ID
+            
+        Returns:
+            ECS客户端
+        """
+        region_id = region_id or self.region_id
+        client = self._clients.get(region_id)
+        if client is None:
+            with self._clients_lock:
+                client = self._clients.get(region_id)
+                if client is None:
+                    config = open_api_models.Config(
+                        access_key_id=self.access_key_id,
+                        access_key_secret=self.access_key_secret,
+                        region_id=region_id,
+                        endpoint=f'ecs.{region_id}.aliyuncs.com',
+                        connect_timeout=int(ALIBABA_REGION_TIMEOUT * 1000),
+                        read_timeout=int(ALIBABA_REGION_TIMEOUT * 1000)
+                    )
+                    client = EcsClient(config)
+                    self._clients[region_id] = client
+        return client
+    
+    def _find_instance_by_ip(self, ip_address: str, region_id: str):
+        """在指定区域中查找使用该IP的实例，未找到返回None"""
+        return self._find_instances_by_ips([ip_address], region_id).get(ip_address)
+    
+    def _find_instances_by_ips(self, ip_addresses: List[str], region_id: str) -> Dict:
+        """
+        在指定区域中批量查找使用这些IP的实例
+        
+        依次按公网IP、弹性公网IP（私网地址按内网IP、专有网络IP）在服务端过滤，
+        每批最多 ALIBABA_FILTER_MAX_VALUES 个IP一次查询，已找到的IP不再参与后续查询
+        
+        Returns:
+            Dict: IP地址到实例对象的映射
+        """
+        found = {}
+        public_ips = [ip for ip in ip_addresses if not self._is_private_ip(ip)]
+        private_ips = [ip for ip in ip_addresses if self._is_private_ip(ip)]
+        
+        for ips, ip_filters in ((public_ips, self._PUBLIC_IP_FILTERS), (private_ips, self._PRIVATE_IP_FILTERS)):
+            for field, extra_filters in ip_filters:
+                remaining = [ip for ip in ips if ip not in found]
+                for start in range(0, len(remaining), ALIBABA_FILTER_MAX_VALUES):
+                    batch = remaining[start:start + ALIBABA_FILTER_MAX_VALUES]
+                    request_filters = dict(extra_filters, **{field: json.dumps(batch)})
+                    for instance in self.iter_instances(region_id=region_id, **request_filters):
+                        for ip in self._instance_ips(instance):
+                            if ip in batch and ip not in found:
+                                found[ip] = instance
+        return found
+    
+    def _iter_instances_by_page(
+        self,
+        page_size: int,
+        concurrency: int,
+        region_id: str,
+        filters: Dict
+    ) -> Iterator:
+        """按页码并发翻页，同时最多有 concurrency 个页面请求在进行"""
+        client = self.get_client(region_id)
+        
+        def fetch_page(page_number: int):
+            request = ecs_models.DescribeInstancesRequest(
+                region_id=region_id,
+                page_size=page_size,
+                page_number=page_number,
+                **filters
+            )
+            return self._call(client.describe_instances, request).body
+        
+        first = fetch_page(1)
+        yield from self._instances_of(first)
+        
+        total_pages = math.ceil((first.total_count or 0) / page_size)
+        if total_pages <= 1:
+            return
+        
+        pages = iter(range(2, total_pages + 1))
+        futures = deque(self.fanout_executor.submit(fetch_page, page) for page in islice(pages, concurrency))
+        try:
+            # 按页码顺序取结果，每完成一页再提交下一页
+            while futures:
+                body = futures.popleft().result()
+                next_page = next(pages, None)
+                if next_page is not None:
+                    futures.append(self.fanout_executor.submit(fetch_page, next_page))
+                yield from self._instances_of(body)
+        finally:
+            for future in futures:
+                future.cancel()
+    
+    # 按IP地址查找实例时依次使用的 DescribeInstancesRequest 过滤字段及附加条件
+    _PUBLIC_IP_FILTERS = [('public_ip_addresses', {}), ('eip_addresses', {})]
+    # 经典网络使用 InnerIpAddresses，专有网络使用 PrivateIpAddresses
+    _PRIVATE_IP_FILTERS = [('inner_ip_addresses', {}), ('private_ip_addresses', {'instance_network_type': 'vpc'})]
+    
+    def _call(self, operation: Callable, request: Any) -> Any:
+        """
+        经过熔断器和限流器调用ECS接口，被限流（Throttling错误码）时暂停发放令牌并降低并发数量
+        
+        Args:
+            operation (Callable): ECS客户端方法，例如 client.describe_instances
+            request: 请求对象
+            
+        Returns:
+            Any: 接口响应
+            
+        Raises:
+            CircuitOpenError: 熔断器打开
+        """
+        if self.circuit_breaker:
+            self.circuit_breaker.before_call()
+        with limited(self.rate_limiter):
+            try:
+                response = operation(request)
+            except Exception as e:
+                if self.rate_limiter and str(getattr(e, 'code', '')).startswith('Throttling'):
+                    self.rate_limiter.record_throttled()
+                if self.circuit_breaker:
+                    if self._is_service_failure(e):
+                        self.circuit_breaker.record_failure()
+                    else:
+                        self.circuit_breaker.record_success()
+                raise
+            if self.rate_limiter:
+                self.rate_limiter.record_success()
+        if self.circuit_breaker:
+            self.circuit_breaker.record_success()
+        return response
+    
+    @staticmethod
+    def _is_service_failure(error: Exception) -> bool:
+        """连接失败、超时和5xx计为熔断失败；API返回的业务错误码（参数错误、限流等）说明服务可用"""
+        status_code = getattr(error, 'statusCode', None)
+        if status_code is None and isinstance(getattr(error, 'data', None), dict):
+            status_code = error.data.get('statusCode')
+        if status_code is not None:
+            try:
+                return int(status_code) >= 500
+            except (TypeError, ValueError):
+                pass
+        return not getattr(error, 'code', None)
+    
+    @staticmethod
+    def _is_private_ip(ip_address: str) -> bool:
+        try:
+            return ipaddress.ip_address(ip_address).is_private
+        except ValueError:
+            return False
+    
+    @staticmethod
+    def _instance_ips(instance) -> List[str]:
+        """实例的公网IP、弹性公网IP和内网IP"""
+        ips = []
+        if getattr(instance, 'public_ip_address', None) and instance.public_ip_address.ip_address:
+            ips.extend(instance.public_ip_address.ip_address)
+        if getattr(instance, 'eip_address', None) and instance.eip_address.ip_address:
+            ips.append(instance.eip_address.ip_address)
+        if getattr(instance, 'inner_ip_address', None) and instance.inner_ip_address.ip_address:
+            ips.extend(instance.inner_ip_address.ip_address)
+        vpc = getattr(instance, 'vpc_attributes', None)
+        if vpc and vpc.private_ip_address and vpc.private_ip_address.ip_address:
+            ips.extend(vpc.private_ip_address.ip_address)
+        return ips
+    
+    @staticmethod
+    def _instances_of(body) -> List:
+        """取出 DescribeInstances 响应中的实例列表"""
+        if body.instances and body.instances.instance:
+            return body.instances.instance
+        return []
+    
     def power_on_instance(
         self, 
         instance_id: str, 
@@ -265,7 +622,7 @@ class AlibabaProvider:
                 instance_ids=json.dumps([instance_id])
             )
             
-            response = self.client.describe_instances(request)
+            response = self._call(self.client.describe_instances, request)
             
             if not response.body.instances or not response.body.instances.instance:
                 return {
@@ -321,19 +678,19 @@ class AlibabaProvider:
                 request = ecs_models.StartInstanceRequest(
                     instance_id=instance_id
                 )
-                response = self.client.start_instance(request)
+                response = self._call(self.client.start_instance, request)
             elif operation == 'stop':
                 request = ecs_models.StopInstanceRequest(
                     instance_id=instance_id,
                     force_stop=True
                 )
-                response = self.client.stop_instance(request)
+                response = self._call(self.client.stop_instance, request)
             elif operation == 'reboot':
                 request = ecs_models.RebootInstanceRequest(
                     instance_id=instance_id,
                     force_stop=True
                 )
-                response = self.client.reboot_instance(request)
+                response = self._call(self.client.reboot_instance, request)
             else:
                 return {
                     'error': f'不支持的操作类型: {operation}',
@@ -379,7 +736,7 @@ class AlibabaProvider:
                 instance_ids=json.dumps([instance_id])
             )
             
-            response = self.client.describe_instances(request)
+            response = self._call(self.client.describe_instances, request)
             
             if not response.body.instances or not response.body.instances.instance:
                 return {
@@ -460,6 +817,20 @@ class AlibabaProvider:
             'tags': tags
         }
     
+    def _format_inventory_record(self, instance) -> Dict:
+        """格式化实例清单记录"""
+        instance_info = self._format_instance_info(instance)
+        
+        return {
+            'provider': 'alibaba',
+            'instance_id': instance_info['instance_id'],
+            'name': instance_info['name'],
+            'public_ipv4': instance_info['public_ips'],
+            'public_ipv6': [],
+            'private_ips': instance_info['private_ips'],
+            'instance_info': instance_info
+        }
+    
     def _format_instance_summary(self, instance) -> Dict:
         """格式化实例摘要信息"""
         # 获取主要公网IP
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+异步提供商接口模块
+将同步的提供商对象包装为异步接口：提供商实现了原生异步方法时直接调用，
+否则在线程池中执行阻塞的SDK调用，使并发的工具调用互不阻塞；
+并发的相同查询共享同一个进行中的请求（单飞），避免同时对云厂商API发起重复请求；
+提供商的熔断器打开时优先返回备用数据（例如清单缓存中的记录）
+"""
+
+import asyncio
+import os
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from utils.aio import run_blocking
+
+# 是否合并并发的相同查询
+REQUEST_COALESCING_ENABLED = os.getenv('REQUEST_COALESCING_ENABLED', 'true').lower() == 'true'
+
+# 参与合并的只读查询方法
+COALESCED_METHODS = frozenset({
+    'get_instance_by_ip',
+    'get_instance_by_id',
+    'get_droplet_by_ip',
+    'get_droplet_by_id',
+    'list_instances',
+    'list_droplets',
+})
+
+
+class AsyncProvider:
+    """
+    提供商的异步包装
+
+    调用 await async_provider.get_instance_by_ip(...) 时：
+    - 提供商声明 native_async 且实现了 get_instance_by_ip_async 时，直接调用原生异步方法
+    - 否则在线程池中执行同步的 get_instance_by_ip
+    COALESCED_METHODS 中的方法以 (方法名, 参数) 为键合并：已有相同的请求在进行中时，
+    调用方等待同一个请求并得到其结果的浅拷贝，而不是再发起一次请求；所有调用方都被取消时取消该请求。
+    提供商的熔断器（provider.circuit_breaker）打开时，先调用 fallback(方法名, 位置参数, 关键字参数)，
+    返回值不为None时直接作为结果；调用返回错误且熔断器随之打开时同样尝试 fallback。
+    非方法属性（available、error等）直接返回提供商对象上的值
+    """
+
+    def __init__(
+        self,
+        provider: Any,
+        executor: Optional[Executor] = None,
+        coalesce: Optional[bool] = None,
+        fallback: Optional[Callable[[str, Tuple, Dict], Optional[Any]]] = None
+    ):
+        """
+        Args:
+            provider: 同步的提供商对象
+            executor (Executor, optional): 执行阻塞调用的线程池，默认为全局线程池
+            coalesce (bool, optional): 是否合并并发的相同查询，默认由 REQUEST_COALESCING_ENABLED 决定
+            fallback (Callable, optional): 熔断期间提供备用结果的函数，不能阻塞事件循环
+        """
+        self.provider = provider
+        self.executor = executor
+        self.coalesce = REQUEST_COALESCING_ENABLED if coalesce is None else coalesce
+        self.fallback = fallback
+        self.breaker = getattr(provider, 'circuit_breaker', None)
+        self.fallback_served = 0
+        # (方法名, 位置参数, 关键字参数) -> 进行中的请求
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        # 进行中的请求 -> 等待其结果的调用方数量
+        self._waiters: Dict[asyncio.Future, int] = {}
+        self.requests = 0
+        self.coalesced = 0
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.provider, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        native = getattr(self.provider, f'{name}_async', None)
+        if native is not None and getattr(self.provider, 'native_async', False):
+            call = native
+        else:
+            async def call(*args, **kwargs):
+                return await run_blocking(attr, *args, executor=self.executor, **kwargs)
+            call.__name__ = name
+
+        if self.breaker is not None and self.fallback is not None:
+            call = self._with_fallback(name, call)
+
+        if not self.coalesce or name not in COALESCED_METHODS:
+            return call
+
+        async def coalesced_call(*args, **kwargs):
+            return await self._single_flight(name, call, args, kwargs)
+
+        coalesced_call.__name__ = name
+        return coalesced_call
+
+    def get_coalescing_stats(self) -> Dict:
+        """获取请求合并统计信息"""
+        return {
+            'enabled': self.coalesce,
+            'requests': self.requests,
+            'coalesced': self.coalesced,
+            'inflight': len(self._inflight)
+        }
+
+    def get_circuit_breaker_stats(self) -> Optional[Dict]:
+        """获取熔断器状态，未启用熔断时返回None"""
+        if self.breaker is None:
+            return None
+        return {**self.breaker.get_stats(), 'fallback_served': self.fallback_served}
+
+    def _with_fallback(self, name: str, call):
+        """熔断器打开时优先返回备用结果"""
+        async def guarded_call(*args, **kwargs):
+            if self.breaker.is_open():
+                result = self._call_fallback(name, args, kwargs)
+                if result is not None:
+                    return result
+            result = await call(*args, **kwargs)
+            # 本次调用失败使熔断器打开时，同样尝试返回备用结果
+            if isinstance(result, dict) and result.get('error') and self.breaker.is_open():
+                return self._call_fallback(name, args, kwargs) or result
+            return result
+
+        guarded_call.__name__ = name
+        return guarded_call
+
+    def _call_fallback(self, name: str, args: Tuple, kwargs: Dict) -> Optional[Any]:
+        result = self.fallback(name, args, kwargs)
+        if result is not None:
+            self.fallback_served += 1
+        return result
+
+    async def _single_flight(self, name: str, call, args: Tuple, kwargs: Dict) -> Any:
+        """相同的请求在进行中时等待其结果，否则发起新请求"""
+        key = (name, args, tuple(sorted(kwargs.items())))
+        try:
+            future = self._inflight.get(key)
+        except TypeError:
+            # 参数不可哈希时不合并
+            self.requests += 1
+            return await call(*args, **kwargs)
+
+        if future is None:
+            self.requests += 1
+            future = asyncio.ensure_future(call(*args, **kwargs))
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._clear_inflight(key, f))
+        else:
+            self.coalesced += 1
+
+        # 单个调用方被取消（例如竞速查询已有结果）时不取消共享的请求，所有调用方都已取消时才取消
+        self._waiters[future] = self._waiters.get(future, 0) + 1
+        try:
+            result = await asyncio.shield(future)
+        finally:
+            remaining = self._waiters.pop(future) - 1
+            if remaining:
+                self._waiters[future] = remaining
+            elif not future.done():
+                future.cancel()
+        return dict(result) if isinstance(result, dict) else result
+
+    def _clear_inflight(self, key: Tuple, future: asyncio.Future) -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
@@ -5,20 +5,35 @@ AWS EC2 提供商模块
 """
 
 import os
-from typing import Dict, Optional, List
+import threading
+from typing import Callable, Dict, Iterator, Optional, List, Tuple
 from datetime import datetime, timedelta
+from utils.aio import get_fanout_executor
+from utils.circuit_breaker import get_circuit_breaker
+from utils.regions import fan_out, first_hit
 
 # AWS SDK导入
 try:
     import boto3
+    from botocore.config import Config as BotoConfig
     from botocore.exceptions import ClientError, NoCredentialsError
     AWS_AVAILABLE = True
 except ImportError:
     AWS_AVAILABLE = False
     boto3 = None
+    BotoConfig = None
     ClientError = Exception
     NoCredentialsError = Exception
 
+# describe_instances 每页数量（MaxResults，取值5-1000）
+AWS_PAGE_SIZE = min(max(int(os.getenv('AWS_PAGE_SIZE', '1000')), 5), 1000)
+# 查询的区域：留空只查询 AWS_DEFAULT_REGION，"all" 通过 describe_regions 自动发现，或逗号分隔的区域列表
+AWS_REGIONS = os.getenv('AWS_REGIONS', '').strip()
+# 多区域查询时每个区域的超时时间（秒）
+AWS_REGION_TIMEOUT = float(os.getenv('AWS_REGION_TIMEOUT', '15'))
+# 单个过滤条件允许的最大取值数量
+AWS_FILTER_MAX_VALUES = 200
+
 class AWSProvider:
     """AWS EC2 提供商类"""
     
@@ -27,6 +42,10 @@ class AWSProvider:
         self.access_key = os.getenv('AWS_ACCESS_KEY_ID')
         self.secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
         self.session_token = os.getenv('AWS_SESSION_TOKEN')
+        # API连续失败后快速失败（未启用熔断时为None）
+        self.circuit_breaker = get_circuit_breaker('aws')
+        # 多区域查询在共享的固定大小线程池中执行
+        self.fanout_executor = get_fanout_executor('aws')
         
         if AWS_AVAILABLE and self.access_key and self.secret_key:
             try:
@@ -39,8 +58,12 @@ class AWSProvider:
                     session_kwargs['aws_session_token'] = self.session_token
                 
                 self.session = boto3.Session(**session_kwargs)
-                self.ec2 = self.session.client('ec2')
-                self.cloudwatch = self.session.client('cloudwatch')
+                self.ec2 = self._attach_circuit_breaker(self.session.client('ec2', config=self._client_config()))
+                self.cloudwatch = self._attach_circuit_breaker(self.session.client('cloudwatch'))
+                # 每个区域一个EC2客户端，首次使用时创建
+                self._clients = {self.region: self.ec2}
+                self._clients_lock = threading.Lock()
+                self._regions: Optional[List[str]] = None
                 self.available = True
             except Exception as e:
                 self.available = False
@@ -66,32 +89,33 @@ class AWSProvider:
             }
         
         try:
-            # 查找具有指定公网IP的实例
-            response = self.ec2.describe_instances(
-                Filters=[
-                    {
-                        'Name': 'ip-address',
-                        'Values': [ip_address]
-                    },
-                    {
-                        'Name': 'instance-state-name',
-                        'Values': ['pending', 'running', 'shutting-down', 'terminated', 'stopping', 'stopped']
-                    }
-                ]
-            )
-            
-            instances = []
-            for reservation in response['Reservations']:
-                for instance in reservation['Instances']:
-                    instances.append(instance)
+            if not self.is_multi_region():
+                instances = self._find_instances_by_ip(ip_address, self.region)
+                failed_regions = {}
+            else:
+                # 所有区域并发查询，任一区域找到即返回，不等待其他区域
+                _, instances, failed_regions = first_hit(
+                    self.get_regions(),
+                    lambda region: self._find_instances_by_ip(ip_address, region),
+                    AWS_REGION_TIMEOUT,
+                    self.fanout_executor
+                )
+                # 没有任何区域给出结果时不能判断IP不属于AWS，按查询失败处理
+                if len(failed_regions) == len(self.get_regions()):
+                    raise RuntimeError(f'所有区域查询失败: {failed_regions}')
+                instances = instances or []
             
             if not instances:
-                return {
+                result = {
                     'provider': 'aws',
                     'found': False,
                     'message': f'未找到使用IP地址 {ip_address} 的EC2实例',
                     'searched_region': self.region
                 }
+                if self.is_multi_region():
+                    result['searched_regions'] = self.get_regions()
+                    result['failed_regions'] = failed_regions
+                return result
             
             # 获取第一个匹配的实例的详细信息
             instance = instances[0]
@@ -114,6 +138,75 @@ class AWSProvider:
                 'provider': 'aws'
             }
     
+    def get_instances_by_ips(self, ip_addresses: List[str]) -> Dict:
+        """
+        批量根据公网IP地址查找EC2实例
+        
+        使用多值 ip-address 过滤条件，每批最多 AWS_FILTER_MAX_VALUES 个IP只需一次查询；
+        配置多区域时各区域并发查询
+        
+        Args:
+            ip_addresses (List[str]): 公网IP地址列表
+            
+        Returns:
+            Dict: 以IP为键的查询结果（格式与 get_instance_by_ip 一致）或错误信息
+        """
+        if not self.available:
+            return {
+                'error': f'AWS服务不可用: {getattr(self, "error", "未知错误")}',
+                'provider': 'aws'
+            }
+        
+        try:
+            ips = list(dict.fromkeys(ip_addresses))
+            failed_regions = {}
+            if self.is_multi_region():
+                region_results, failed_regions = self._fan_out(
+                    lambda region: self._find_instances_by_ips(ips, region)
+                )
+                if failed_regions and not region_results:
+                    raise RuntimeError(f'所有区域查询失败: {failed_regions}')
+                instances = [instance for region_instances in region_results.values() for instance in region_instances]
+            else:
+                instances = self._find_instances_by_ips(ips, self.region)
+            
+            found = {}
+            for instance in instances:
+                ip_address = instance.get('PublicIpAddress')
+                if ip_address and ip_address not in found:
+                    found[ip_address] = self._format_instance_info(instance)
+            
+            results = {}
+            for ip_address in ips:
+                if ip_address in found:
+                    results[ip_address] = {
+                        'provider': 'aws',
+                        'found': True,
+                        'instance_info': found[ip_address]
+                    }
+                else:
+                    results[ip_address] = {
+                        'provider': 'aws',
+                        'found': False,
+                        'message': f'未找到使用IP地址 {ip_address} 的EC2实例'
+                    }
+            
+            response = {'provider': 'aws', 'results': results}
+            if failed_regions:
+                response['failed_regions'] = failed_regions
+            return response
+            
+        except ClientError as e:
+            return {
+                'error': f'AWS API调用失败: {str(e)}',
+                'provider': 'aws'
+            }
+        except Exception as e:
+            return {
+                'error': f'查询EC2实例时发生错误: {str(e)}',
+                'provider': 'aws'
+            }
+    
     def get_instance_by_id(self, instance_id: str) -> Dict:
         """
         根据实例ID查找EC2实例
@@ -160,10 +253,27 @@ class AWSProvider:
                 'provider': 'aws'
             }
     
-    def list_instances(self) -> Dict:
+    def list_instances(
+        self,
+        cursor: Optional[str] = None,
+        page_size: Optional[int] = None,
+        name: Optional[str] = None,
+        tag: Optional[str] = None
+    ) -> Dict:
         """
-        列出所有EC2实例
+        列出EC2实例
         
+        未指定 cursor 和 page_size 时返回所有实例；指定任一参数时只返回一页，
+        并在 next_cursor 中返回下一页的游标（没有更多实例时为None）。
+        配置了多区域时按区域顺序逐个区域翻页，游标中记录当前区域，每页只包含一个区域的实例。
+        名称和标签条件由EC2 API在服务端过滤
+        
+        Args:
+            cursor (str, optional): 上一页返回的 next_cursor
+            page_size (int, optional): 每页数量（5-1000），默认为 AWS_PAGE_SIZE
+            name (str, optional): 按Name标签过滤，支持 * 通配符
+            tag (str, optional): 按标签过滤，格式为 "键" 或 "键=值"
+            
         Returns:
             Dict: 实例列表或错误信息
         """
@@ -174,20 +284,32 @@ class AWSProvider:
             }
         
         try:
-            response = self.ec2.describe_instances()
+            filters = self._build_filters(name, tag)
+            if cursor is None and page_size is None and self.is_multi_region():
+                # 多区域并发列出，按区域完成的先后顺序合并
+                results, failed_regions = self._fan_out(
+                    lambda region: list(self.iter_instance_summaries(filters=filters, region=region))
+                )
+                instances = [instance for region_instances in results.values() for instance in region_instances]
+                return {
+                    'provider': 'aws',
+                    'regions': list(results),
+                    'failed_regions': failed_regions,
+                    'partial': bool(failed_regions),
+                    'total_instances': len(instances),
+                    'instances': instances
+                }
             
-            instances = []
-            for reservation in response['Reservations']:
-                for instance in reservation['Instances']:
-                    instance_info = self._format_instance_summary(instance)
-                    instances.append(instance_info)
+            if cursor is None and page_size is None:
+                instances = list(self.iter_instance_summaries(filters=filters))
+                return {
+                    'provider': 'aws',
+                    'region': self.region,
+                    'total_instances': len(instances),
+                    'instances': instances
+                }
             
-            return {
-                'provider': 'aws',
-                'region': self.region,
-                'total_instances': len(instances),
-                'instances': instances
-            }
+            return self._list_instances_page(cursor, page_size, filters)
             
         except ClientError as e:
             return {
@@ -200,6 +322,257 @@ class AWSProvider:
                 'provider': 'aws'
             }
     
+    def _list_instances_page(self, cursor: Optional[str], page_size: Optional[int], filters: List[Dict]) -> Dict:
+        """
+        返回一页实例，游标格式为 "区域:NextToken"（NextToken为空表示从该区域的第一页开始）
+        
+        一个区域的实例列完后游标指向下一个区域；跳过没有实例的区域，避免返回空页
+        """
+        regions = self.get_regions()
+        if cursor:
+            region, _, token = cursor.partition(':')
+            if region not in regions:
+                return {
+                    'error': f'无效的分页游标: {cursor}',
+                    'provider': 'aws'
+                }
+        else:
+            region, token = regions[0], ''
+        
+        request = {'MaxResults': min(max(page_size or AWS_PAGE_SIZE, 5), 1000)}
+        if filters:
+            request['Filters'] = filters
+        
+        while True:
+            if token:
+                request['NextToken'] = token
+            else:
+                request.pop('NextToken', None)
+            response = self.get_client(region).describe_instances(**request)
+            instances = [
+                self._format_instance_summary(instance)
+                for reservation in response['Reservations']
+                for instance in reservation['Instances']
+            ]
+            
+            token = response.get('NextToken')
+            if token:
+                next_cursor = f'{region}:{token}'
+            else:
+                index = regions.index(region) + 1
+                next_cursor = f'{regions[index]}:' if index < len(regions) else None
+            
+            if instances or next_cursor is None:
+                break
+            region, _, token = next_cursor.partition(':')
+        
+        return {
+            'provider': 'aws',
+            'region': region,
+            'regions': regions,
+            'total_instances': len(instances),
+            'instances': instances,
+            'next_cursor': next_cursor
+        }
+    
+    def list_inventory_records(self) -> List[Dict]:
+        """
+        获取用于内存清单缓存的标准化实例记录
+        
+        Returns:
+            List[Dict]: 实例记录列表
+            
+        Raises:
+            Exception: 服务不可用或API调用失败
+        """
+        if not self.available:
+            raise RuntimeError(f'AWS服务不可用: {getattr(self, "error", "未知错误")}')
+        
+        if not self.is_multi_region():
+            return [self._format_inventory_record(instance) for instance in self.iter_instances()]
+        
+        results, failed_regions = self._fan_out(
+            lambda region: [self._format_inventory_record(instance) for instance in self.iter_instances(region=region)]
+        )
+        if failed_regions and not results:
+            raise RuntimeError(f'所有区域查询失败: {failed_regions}')
+        return [record for region_records in results.values() for record in region_records]
+    
+    def is_multi_region(self) -> bool:
+        """是否配置了多区域查询"""
+        return bool(AWS_REGIONS)
+    
+    def get_regions(self) -> List[str]:
+        """
+        获取需要查询的区域列表（结果会被缓存）
+        
+        Returns:
+            List[str]: 区域列表
+        """
+        if self._regions is None:
+            if AWS_REGIONS.lower() == 'all':
+                response = self.ec2.describe_regions(
+                    Filters=[{'Name': 'opt-in-status', 'Values': ['opt-in-not-required', 'opted-in']}]
+                )
+                self._regions = sorted(region['RegionName'] for region in response['Regions'])
+            elif AWS_REGIONS:
+                self._regions = [region.strip() for region in AWS_REGIONS.split(',') if region.strip()]
+            else:
+                self._regions = [self.region]
+        return self._regions
+    
+    def get_client(self, region: Optional[str] = None):
+        """
+        获取指定区域的EC2客户端（每个区域只创建一次）
+        
+        Args:
+            region (str, optional): 区域，默认为 AWS_DEFAULT_REGION
+            
+        Returns:
+            EC2客户端
+        """
+        region = region or self.region
+        client = self._clients.get(region)
+        if client is None:
+            with self._clients_lock:
+                client = self._clients.get(region)
+                if client is None:
+                    client = self.session.client('ec2', region_name=region, config=self._client_config())
+                    self._clients[region] = self._attach_circuit_breaker(client)
+        return client
+    
+    @staticmethod
+    def _client_config():
+        """EC2客户端配置：连接/读取超时与区域超时相同，超时的区域查询不会长时间占用线程"""
+        return BotoConfig(
+            connect_timeout=AWS_REGION_TIMEOUT,
+            read_timeout=AWS_REGION_TIMEOUT,
+            # adaptive 模式在客户端按令牌桶限速，被限流时自动降低请求速率
+            retries={'max_attempts': 2, 'mode': 'adaptive'}
+        )
+    
+    def _attach_circuit_breaker(self, client):
+        """
+        通过botocore事件为客户端的每次API调用（包括分页器的每一页）接入熔断器：
+        调用前熔断器打开则抛出 CircuitOpenError；SDK内部重试结束后，连接失败、超时和5xx计为失败
+        """
+        breaker = self.circuit_breaker
+        if breaker is None:
+            return client
+        
+        def before_call(**kwargs):
+            breaker.before_call()
+        
+        def after_call(http_response=None, **kwargs):
+            # 4xx（例如参数错误、限流）说明API可以正常响应
+            if http_response is not None and http_response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+        
+        def after_call_error(**kwargs):
+            breaker.record_failure()
+        
+        client.meta.events.register('before-call', before_call)
+        client.meta.events.register('after-call', after_call)
+        client.meta.events.register('after-call-error', after_call_error)
+        return client
+    
+    def _fan_out(self, fn: Callable[[str], object]) -> Tuple[Dict[str, object], Dict[str, str]]:
+        """在所有区域上并发执行查询，返回 (各区域结果, 失败区域及原因)"""
+        return fan_out(self.get_regions(), fn, AWS_REGION_TIMEOUT, self.fanout_executor)
+    
+    def _find_instances_by_ip(self, ip_address: str, region: str) -> List[Dict]:
+        """在指定区域中查找使用该公网IP的实例"""
+        response = self.get_client(region).describe_instances(
+            Filters=[
+                {
+                    'Name': 'ip-address',
+                    'Values': [ip_address]
+                },
+                {
+                    'Name': 'instance-state-name',
+                    'Values': ['pending', 'running', 'shutting-down', 'terminated', 'stopping', 'stopped']
+                }
+            ]
+        )
+        return [instance for reservation in response['Reservations'] for instance in reservation['Instances']]
+    
+    def _find_instances_by_ips(self, ip_addresses: List[str], region: str) -> List[Dict]:
+        """在指定区域中查找使用这些公网IP的实例，每批IP一次查询"""
+        instances = []
+        paginator = self.get_client(region).get_paginator('describe_instances')
+        for start in range(0, len(ip_addresses), AWS_FILTER_MAX_VALUES):
+            filters = [{'Name': 'ip-address', 'Values': ip_addresses[start:start + AWS_FILTER_MAX_VALUES]}]
+            for page in paginator.paginate(Filters=filters):
+                for reservation in page['Reservations']:
+                    instances.extend(reservation['Instances'])
+        return instances
+    
+    def iter_instances(
+        self,
+        page_size: int = AWS_PAGE_SIZE,
+        filters: Optional[List[Dict]] = None,
+        region: Optional[str] = None
+    ) -> Iterator[Dict]:
+        """
+        逐个返回一个区域的所有EC2实例，使用boto3分页器自动翻页
+        
+        每次只在内存中保留一页响应，调用方提前结束遍历时不会继续请求后续页面
+        
+        Args:
+            page_size (int): 每页数量（MaxResults）
+            filters (List[Dict], optional): describe_instances 的服务端过滤条件
+            region (str, optional): 区域，默认为 AWS_DEFAULT_REGION
+            
+        Yields:
+            Dict: EC2实例原始数据
+            
+        Raises:
+            Exception: API调用失败
+        """
+        paginator = self.get_client(region).get_paginator('describe_instances')
+        kwargs = {'PaginationConfig': {'PageSize': page_size}}
+        if filters:
+            kwargs['Filters'] = filters
+        for page in paginator.paginate(**kwargs):
+            for reservation in page['Reservations']:
+                yield from reservation['Instances']
+    
+    def iter_instance_summaries(
+        self,
+        page_size: int = AWS_PAGE_SIZE,
+        filters: Optional[List[Dict]] = None,
+        region: Optional[str] = None
+    ) -> Iterator[Dict]:
+        """
+        逐个返回一个区域所有EC2实例的摘要信息
+        
+        Args:
+            page_size (int): 每页数量（MaxResults）
+            filters (List[Dict], optional): describe_instances 的服务端过滤条件
+            region (str, optional): 区域，默认为 AWS_DEFAULT_REGION
+            
+        Yields:
+            Dict: 实例摘要信息
+        """
+        for instance in self.iter_instances(page_size, filters, region):
+            yield self._format_instance_summary(instance)
+    
+    @staticmethod
+    def _build_filters(name: Optional[str] = None, tag: Optional[str] = None) -> List[Dict]:
+        """根据名称和标签条件构建 describe_instances 过滤条件"""
+        filters = []
+        if name:
+            filters.append({'Name': 'tag:Name', 'Values': [name]})
+        if tag:
+            key, has_value, value = tag.partition('=')
+            if has_value:
+                filters.append({'Name': f'tag:{key}', 'Values': [value]})
+            else:
+                filters.append({'Name': 'tag-key', 'Values': [key]})
+        return filters
+    
     def get_instance_storage_info(self, instance_id: str) -> Dict:
         """
         获取实例的存储详细信息
@@ -380,6 +753,31 @@ class AWSProvider:
             'ebs_optimized': instance.get('EbsOptimized', False)
         }
     
+    def _format_inventory_record(self, instance: Dict) -> Dict:
+        """格式化实例清单记录"""
+        instance_info = self._format_instance_info(instance)
+        
+        public_ipv6 = []
+        private_ips = []
+        for interface in instance.get('NetworkInterfaces', []):
+            public_ipv6.extend(addr['Ipv6Address'] for addr in interface.get('Ipv6Addresses', []))
+            private_ips.extend(
+                addr['PrivateIpAddress'] for addr in interface.get('PrivateIpAddresses', [])
+                if addr.get('PrivateIpAddress')
+            )
+        if instance.get('PrivateIpAddress') and instance['PrivateIpAddress'] not in private_ips:
+            private_ips.insert(0, instance['PrivateIpAddress'])
+        
+        return {
+            'provider': 'aws',
+            'instance_id': instance_info['instance_id'],
+            'name': instance_info['name'],
+            'public_ipv4': [instance_info['public_ip']] if instance_info['public_ip'] else [],
+            'public_ipv6': public_ipv6,
+            'private_ips': private_ips,
+            'instance_info': instance_info
+        }
+    
     def _format_instance_summary(self, instance: Dict) -> Dict:
         """格式化实例摘要信息"""
         # 获取名称标签
@@ -5,8 +5,12 @@ DigitalOcean Droplet 提供商模块
 """
 
 import os
-from typing import Dict, Optional
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 from datetime import datetime, timedelta
+from utils.aio import get_fanout_executor
+from utils.circuit_breaker import get_circuit_breaker
+from utils.rate_limit import get_rate_limiter, limited
 from utils.security import SecurityConfirmation, require_triple_confirmation
 
 # DigitalOcean SDK导入
@@ -17,6 +21,9 @@ except ImportError:
     DO_AVAILABLE = False
     Client = None
 
+# DigitalOcean API 单页允许的最大数量
+DO_PAGE_SIZE = 200
+
 class DigitalOceanProvider:
     """DigitalOcean Droplet 提供商类"""
     
@@ -33,6 +40,13 @@ class DigitalOceanProvider:
         else:
             self.available = False
             self.error = "pydo SDK未安装或DIGITALOCEAN_TOKEN未配置"
+        
+        # 同一令牌共享限流器（未启用限流时为None）
+        self.rate_limiter = get_rate_limiter('digitalocean', self.token)
+        # API连续失败后快速失败（未启用熔断时为None）
+        self.circuit_breaker = get_circuit_breaker('digitalocean')
+        # 预取下一页的请求在共享的固定大小线程池中执行
+        self.fanout_executor = get_fanout_executor('digitalocean')
     
     def get_droplet_by_ip(self, ip_address: str) -> Dict:
         """
@@ -51,27 +65,20 @@ class DigitalOceanProvider:
             }
         
         try:
-            response = self.client.droplets.list()
-            droplets = response.get("droplets", [])
-            
-            for droplet in droplets:
-                networks = droplet.get("networks", {})
-                ipv4_networks = networks.get("v4", [])
-                
-                for network in ipv4_networks:
-                    if network.get("type") == "public" and network.get("ip_address") == ip_address:
-                        droplet_info = self._format_droplet_info(droplet)
-                        return {
-                            'provider': 'digitalocean',
-                            'found': True,
-                            'droplet_info': droplet_info
-                        }
+            # DigitalOcean API不支持按IP过滤，逐页在本地查找，找到后不再请求后续页面
+            found, droplets_checked = self._match_droplets_by_ips([ip_address])
+            if ip_address in found:
+                return {
+                    'provider': 'digitalocean',
+                    'found': True,
+                    'droplet_info': found[ip_address]
+                }
             
             return {
                 'provider': 'digitalocean',
                 'found': False,
                 'message': f'未找到使用IP地址 {ip_address} 的Droplet',
-                'total_droplets_checked': len(droplets)
+                'total_droplets_checked': droplets_checked
             }
             
         except Exception as e:
@@ -80,6 +87,80 @@ class DigitalOceanProvider:
                 'provider': 'digitalocean'
             }
     
+    def get_droplets_by_ips(self, ip_addresses: List[str]) -> Dict:
+        """
+        批量根据公网IP地址查找Droplet
+        
+        DigitalOcean API不支持按IP过滤，遍历一次Droplet列表匹配所有IP，全部找到后提前结束
+        
+        Args:
+            ip_addresses (List[str]): 公网IP地址列表
+            
+        Returns:
+            Dict: 以IP为键的查询结果（格式与 get_droplet_by_ip 一致）或错误信息
+        """
+        if not self.available:
+            return {
+                'error': f'DigitalOcean服务不可用: {getattr(self, "error", "未知错误")}',
+                'provider': 'digitalocean'
+            }
+        
+        try:
+            ips = list(dict.fromkeys(ip_addresses))
+            found, droplets_checked = self._match_droplets_by_ips(ips)
+            
+            results = {}
+            for ip_address in ips:
+                if ip_address in found:
+                    results[ip_address] = {
+                        'provider': 'digitalocean',
+                        'found': True,
+                        'droplet_info': found[ip_address]
+                    }
+                else:
+                    results[ip_address] = {
+                        'provider': 'digitalocean',
+                        'found': False,
+                        'message': f'未找到使用IP地址 {ip_address} 的Droplet'
+                    }
+            
+            return {
+                'provider': 'digitalocean',
+                'results': results,
+                'total_droplets_checked': droplets_checked
+            }
+            
+        except Exception as e:
+            return {
+                'error': f'查询Droplet时发生错误: {str(e)}',
+                'provider': 'digitalocean'
+            }
+    
+    def _match_droplets_by_ips(self, ip_addresses: List[str]) -> Tuple[Dict[str, Dict], int]:
+        """
+        遍历Droplet列表，按公网IPv4和IPv6地址匹配，全部找到后提前结束
+        
+        单IP和批量查询共用，保证两者的匹配规则一致
+        
+        Returns:
+            Tuple[Dict[str, Dict], int]: 以IP为键的格式化Droplet信息，以及检查过的Droplet数量
+        """
+        wanted = set(ip_addresses)
+        found = {}
+        droplets_checked = 0
+        
+        for droplet in self.iter_droplets():
+            droplets_checked += 1
+            networks = droplet.get("networks", {})
+            for network in networks.get("v4", []) + networks.get("v6", []):
+                ip = network.get("ip_address")
+                if network.get("type") == "public" and ip in wanted and ip not in found:
+                    found[ip] = self._format_droplet_info(droplet)
+            if len(found) == len(wanted):
+                break
+        
+        return found, droplets_checked
+    
     def get_droplet_by_id(self, droplet_id: int) -> Dict:
         """
         根据Droplet ID查找信息
@@ -97,7 +178,7 @@ class DigitalOceanProvider:
             }
         
         try:
-            response = self.client.droplets.get(droplet_id)
+            response = self._call(self.client.droplets.get, droplet_id)
             droplet = response.get("droplet", {})
             
             if not droplet:
@@ -120,10 +201,17 @@ class DigitalOceanProvider:
                 'provider': 'digitalocean'
             }
     
-    def list_droplets(self) -> Dict:
+    def list_droplets(self, name: Optional[str] = None, tag: Optional[str] = None) -> Dict:
         """
-        列出所有Droplets
+        列出Droplets
         
+        标签条件（tag_name）和名称条件（name）由API在服务端过滤；
+        同时指定两者时按标签在服务端过滤，名称在本地过滤
+        
+        Args:
+            name (str, optional): Droplet名称（精确匹配）
+            tag (str, optional): 标签名称
+            
         Returns:
             Dict: Droplets列表或错误信息
         """
@@ -134,8 +222,12 @@ class DigitalOceanProvider:
             }
         
         try:
-            response = self.client.droplets.list()
-            droplets = response.get("droplets", [])
+            if tag:
+                droplets = self.iter_droplets(tag_name=tag)
+                if name:
+                    droplets = (droplet for droplet in droplets if droplet.get("name") == name)
+            else:
+                droplets = self.iter_droplets(name=name)
             
             droplet_list = []
             for droplet in droplets:
@@ -154,6 +246,72 @@ class DigitalOceanProvider:
                 'provider': 'digitalocean'
             }
     
+    def list_inventory_records(self) -> List[Dict]:
+        """
+        获取用于内存清单缓存的标准化Droplet记录
+        
+        Returns:
+            List[Dict]: Droplet记录列表
+            
+        Raises:
+            Exception: 服务不可用或API调用失败
+        """
+        if not self.available:
+            raise RuntimeError(f'DigitalOcean服务不可用: {getattr(self, "error", "未知错误")}')
+        
+        return [self._format_inventory_record(droplet) for droplet in self.iter_droplets()]
+    
+    def iter_droplets(
+        self,
+        per_page: int = DO_PAGE_SIZE,
+        tag_name: Optional[str] = None,
+        name: Optional[str] = None
+    ) -> Iterator[Dict]:
+        """
+        逐个返回账户下的所有Droplet，自动翻页
+        
+        每页按最大数量获取，处理当前页时已在后台请求下一页；
+        调用方提前结束遍历时不会继续请求后续页面
+        
+        Args:
+            per_page (int): 每页数量
+            tag_name (str, optional): 只返回带有此标签的Droplet（服务端过滤）
+            name (str, optional): 只返回此名称的Droplet（服务端过滤）
+            
+        Yields:
+            Dict: Droplet原始数据
+            
+        Raises:
+            Exception: API调用失败
+        """
+        filters = {}
+        if tag_name:
+            filters['tag_name'] = tag_name
+        if name:
+            filters['name'] = name
+        
+        def submit_page(page_number: int) -> Future:
+            # 线程池在调用方的上下文中执行请求，保留调用优先级
+            return self.fanout_executor.submit(
+                self._call, self.client.droplets.list, per_page=per_page, page=page_number, **filters
+            )
+        
+        try:
+            page = 1
+            future = submit_page(page)
+            while future is not None:
+                response = future.result()
+                droplets = response.get("droplets", [])
+                has_next = bool(response.get("links", {}).get("pages", {}).get("next")) and droplets
+                
+                # 先发出下一页请求，再处理当前页
+                page += 1
+                future = submit_page(page) if has_next else None
+                yield from droplets
+        finally:
+            if future is not None:
+                future.cancel()
+    
     def get_droplet_monitoring(self, droplet_id: int) -> Dict:
         """
         获取Droplet监控信息
@@ -172,7 +330,7 @@ class DigitalOceanProvider:
         
         try:
             # 先检查droplet是否存在和是否启用了监控
-            droplet_response = self.client.droplets.get(droplet_id)
+            droplet_response = self._call(self.client.droplets.get, droplet_id)
             droplet = droplet_response.get("droplet", {})
             
             if not droplet:
@@ -290,7 +448,7 @@ class DigitalOceanProvider:
         
         # 首先获取droplet信息
         try:
-            droplet_response = self.client.droplets.get(droplet_id)
+            droplet_response = self._call(self.client.droplets.get, droplet_id)
             droplet = droplet_response.get("droplet", {})
             
             if not droplet:
@@ -329,7 +487,7 @@ class DigitalOceanProvider:
         # 执行实际操作
         try:
             action_data = {"type": operation}
-            response = self.client.droplet_actions.post(droplet_id=droplet_id, body=action_data)
+            response = self._call(self.client.droplet_actions.post, droplet_id=droplet_id, body=action_data)
             
             action = response.get("action", {})
             
@@ -371,7 +529,7 @@ class DigitalOceanProvider:
             }
         
         try:
-            response = self.client.droplet_actions.list(droplet_id=droplet_id)
+            response = self._call(self.client.droplet_actions.list, droplet_id=droplet_id)
             actions = response.get("actions", [])
             
             action_list = []
@@ -401,6 +559,61 @@ class DigitalOceanProvider:
                 'provider': 'digitalocean'
             }
     
+    def _call(self, operation: Callable, *args, **kwargs) -> Any:
+        """
+        经过熔断器和限流器调用pydo接口，并根据响应头（Retry-After、RateLimit-Remaining）调整限流状态
+        
+        Args:
+            operation (Callable): pydo接口方法，例如 self.client.droplets.get
+            *args: 位置参数
+            **kwargs: 关键字参数
+            
+        Returns:
+            Any: 接口返回的数据
+            
+        Raises:
+            CircuitOpenError: 熔断器打开
+        """
+        if self.circuit_breaker is None:
+            return self._call_limited(operation, *args, **kwargs)
+        
+        self.circuit_breaker.before_call()
+        try:
+            result = self._call_limited(operation, *args, **kwargs)
+        except Exception as e:
+            # 4xx（例如404、429）说明API可以正常响应，连接失败和5xx计为失败
+            status_code = getattr(e, 'status_code', None)
+            if status_code is not None and status_code < 500:
+                self.circuit_breaker.record_success()
+            else:
+                self.circuit_breaker.record_failure()
+            raise
+        self.circuit_breaker.record_success()
+        return result
+    
+    def _call_limited(self, operation: Callable, *args, **kwargs) -> Any:
+        """经过限流器调用pydo接口"""
+        if self.rate_limiter is None:
+            return operation(*args, **kwargs)
+        
+        response_headers = {}
+        
+        def capture_headers(pipeline_response, deserialized, headers):
+            response_headers.update(pipeline_response.http_response.headers)
+            return deserialized
+        
+        with limited(self.rate_limiter):
+            try:
+                result = operation(*args, cls=capture_headers, **kwargs)
+            except Exception as e:
+                response = getattr(e, 'response', None)
+                self.rate_limiter.record_response(
+                    getattr(e, 'status_code', None), getattr(response, 'headers', None)
+                )
+                raise
+            self.rate_limiter.record_response(200, response_headers)
+        return result
+    
     def _format_droplet_info(self, droplet: Dict) -> Dict:
         """格式化Droplet详细信息"""
         networks = droplet.get("networks", {})
@@ -446,6 +659,23 @@ class DigitalOceanProvider:
             'vpc_uuid': droplet.get("vpc_uuid")
         }
     
+    def _format_inventory_record(self, droplet: Dict) -> Dict:
+        """格式化Droplet清单记录"""
+        networks = droplet.get("networks", {})
+        public_ipv4 = [net.get("ip_address") for net in networks.get("v4", []) if net.get("type") == "public"]
+        public_ipv6 = [net.get("ip_address") for net in networks.get("v6", []) if net.get("type") == "public"]
+        private_ips = [net.get("ip_address") for net in networks.get("v4", []) if net.get("type") == "private"]
+        
+        return {
+            'provider': 'digitalocean',
+            'instance_id': str(droplet.get("id")),
+            'name': droplet.get("name"),
+            'public_ipv4': public_ipv4,
+            'public_ipv6': public_ipv6,
+            'private_ips': private_ips,
+            'instance_info': self._format_droplet_info(droplet)
+        }
+    
     def _format_droplet_summary(self, droplet: Dict) -> Dict:
         """格式化Droplet摘要信息"""
         networks = droplet.get("networks", {})
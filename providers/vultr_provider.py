@@ -4,14 +4,80 @@ Vultr 提供商模块
 支持查询、开关机、重启操作，带三次确认机制
 """
 
+import ipaddress
 import os
 import requests
-from typing import Dict, Optional
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from utils.aio import HTTPX_AVAILABLE, httpx
+from utils.circuit_breaker import get_circuit_breaker
+from utils.http import get_request_executor
+from utils.rate_limit import get_rate_limiter, parse_retry_after
 from utils.security import SecurityConfirmation, require_triple_confirmation
 
+# Vultr API 单页允许的最大数量
+VULTR_PAGE_SIZE = 500
+
+
+def _clamp_page_size(page_size: Optional[int]) -> int:
+    """将调用方指定的每页数量限制在 1 到 VULTR_PAGE_SIZE 之间"""
+    return min(max(page_size or VULTR_PAGE_SIZE, 1), VULTR_PAGE_SIZE)
+
+
+def _page_params(cursor: Optional[str], per_page: int, filters: Optional[Dict] = None) -> Dict:
+    """实例列表请求的查询参数"""
+    params = dict(filters or {})
+    params['per_page'] = per_page
+    if cursor:
+        params['cursor'] = cursor
+    return params
+
+
+def _is_ipv4(ip: str) -> bool:
+    """是否为合法的IPv4地址"""
+    try:
+        return ipaddress.ip_address(ip).version == 4
+    except ValueError:
+        return False
+
+
+class _IpMatcher:
+    """在遍历实例列表时按IP匹配实例，同步和异步查询共用"""
+    
+    def __init__(self, ip_addresses: List[str], fields: Tuple[str, ...] = ('main_ip', 'v6_main_ip')):
+        self.ips = list(dict.fromkeys(ip_addresses))
+        self.wanted = set(self.ips)
+        self.fields = fields
+        self.found: Dict[str, Dict] = {}
+        self.instances_checked = 0
+    
+    @property
+    def filters(self) -> Optional[Dict]:
+        """只有一个IPv4地址时使用 main_ip 服务端过滤，IPv6地址遍历实例列表匹配 v6_main_ip"""
+        if len(self.ips) == 1 and _is_ipv4(self.ips[0]):
+            return {'main_ip': self.ips[0]}
+        return None
+    
+    def add(self, instance: Dict) -> bool:
+        """
+        检查一个实例
+        
+        Returns:
+            bool: 是否已找到所有IP（可以结束遍历）
+        """
+        self.instances_checked += 1
+        for field in self.fields:
+            ip = instance.get(field)
+            if ip in self.wanted and ip not in self.found:
+                self.found[ip] = instance
+        return len(self.found) == len(self.wanted)
+
+
 class VultrProvider:
     """Vultr 提供商类"""
     
+    # 查询方法提供基于httpx的原生异步版本（方法名带 _async 后缀）
+    native_async = HTTPX_AVAILABLE
+    
     def __init__(self):
         self.api_key = os.getenv('VULTR_API_KEY')
         self.base_url = 'https://api.vultr.com/v2'
@@ -25,6 +91,13 @@ class VultrProvider:
         else:
             self.available = False
             self.error = "VULTR_API_KEY环境变量未配置"
+        
+        # 同一API Key共享限流器（未启用限流时为None）
+        self.rate_limiter = get_rate_limiter('vultr', self.api_key)
+        # GET请求失败时按指数退避重试（可选对冲），POST请求只发送一次
+        self.http = get_request_executor('vultr')
+        # API连续失败后快速失败（未启用熔断时为None）
+        self.circuit_breaker = get_circuit_breaker('vultr')
     
     def get_instance_by_ip(self, ip_address: str) -> Dict:
         """
@@ -37,51 +110,41 @@ class VultrProvider:
             Dict: 实例信息或错误信息
         """
         if not self.available:
-            return {
-                'error': f'Vultr服务不可用: {getattr(self, "error", "未知错误")}',
-                'provider': 'vultr'
-            }
+            return self._unavailable_result()
         
         try:
-            # 获取所有实例
-            response = requests.get(f'{self.base_url}/instances', headers=self.headers, timeout=10)
-            
-            if response.status_code != 200:
-                return {
-                    'error': f'Vultr API调用失败: {response.status_code} - {response.text}',
-                    'provider': 'vultr'
-                }
-            
-            data = response.json()
-            instances = data.get('instances', [])
-            
-            # 查找匹配的IP地址
-            for instance in instances:
-                if instance.get('main_ip') == ip_address:
-                    instance_info = self._format_instance_info(instance)
-                    return {
-                        'provider': 'vultr',
-                        'found': True,
-                        'instance_info': instance_info
-                    }
-            
-            return {
-                'provider': 'vultr',
-                'found': False,
-                'message': f'未找到使用IP地址 {ip_address} 的Vultr实例',
-                'total_instances_checked': len(instances)
-            }
+            # IPv4地址由API按主IP在服务端过滤，只返回匹配的实例
+            matcher = _IpMatcher([ip_address])
+            for instance in self.iter_instances(filters=matcher.filters):
+                if matcher.add(instance):
+                    break
+            return self._ip_result(matcher, ip_address, include_checked=True)
+        except Exception as e:
+            return self._error_result(e)
+    
+    def get_instances_by_ips(self, ip_addresses: List[str]) -> Dict:
+        """
+        批量根据公网IP地址查找Vultr实例
+        
+        只有一个IPv4地址时使用 main_ip 服务端过滤；IPv6地址或多个IP时遍历一次实例列表匹配所有IP，全部找到后提前结束
+        
+        Args:
+            ip_addresses (List[str]): 公网IP地址列表
             
-        except requests.RequestException as e:
-            return {
-                'error': f'网络请求失败: {str(e)}',
-                'provider': 'vultr'
-            }
+        Returns:
+            Dict: 以IP为键的查询结果（格式与 get_instance_by_ip 一致）或错误信息
+        """
+        if not self.available:
+            return self._unavailable_result()
+        
+        try:
+            matcher = _IpMatcher(ip_addresses)
+            for instance in self.iter_instances(filters=matcher.filters):
+                if matcher.add(instance):
+                    break
+            return self._ips_result(matcher)
         except Exception as e:
-            return {
-                'error': f'查询Vultr实例时发生错误: {str(e)}',
-                'provider': 'vultr'
-            }
+            return self._error_result(e)
     
     def get_instance_by_id(self, instance_id: str) -> Dict:
         """
@@ -94,94 +157,350 @@ class VultrProvider:
             Dict: 实例信息或错误信息
         """
         if not self.available:
-            return {
-                'error': f'Vultr服务不可用: {getattr(self, "error", "未知错误")}',
-                'provider': 'vultr'
-            }
+            return self._unavailable_result()
         
         try:
-            response = requests.get(f'{self.base_url}/instances/{instance_id}', headers=self.headers, timeout=10)
+            response = self._request('GET', f'/instances/{instance_id}')
+            return self._instance_response_result(response, instance_id)
+        except Exception as e:
+            return self._error_result(e)
+    
+    def list_instances(
+        self,
+        cursor: Optional[str] = None,
+        page_size: Optional[int] = None,
+        name: Optional[str] = None,
+        tag: Optional[str] = None
+    ) -> Dict:
+        """
+        列出Vultr实例
+        
+        未指定 cursor 和 page_size 时返回所有实例；指定任一参数时只返回一页，
+        并在 next_cursor 中返回下一页的游标（没有更多实例时为None）。
+        名称和标签条件由API在服务端过滤
+        
+        Args:
+            cursor (str, optional): 上一页返回的 next_cursor
+            page_size (int, optional): 每页数量（1-500），默认为 VULTR_PAGE_SIZE
+            name (str, optional): 实例标签名（label）
+            tag (str, optional): 实例标签（tag）
             
-            if response.status_code == 404:
-                return {
-                    'provider': 'vultr',
-                    'found': False,
-                    'message': f'未找到ID为 {instance_id} 的Vultr实例'
-                }
+        Returns:
+            Dict: 实例列表或错误信息
+        """
+        if not self.available:
+            return self._unavailable_result()
+        
+        try:
+            filters = self._list_filters(name, tag)
+            if cursor is None and page_size is None:
+                return self._list_result(list(self.iter_instances(filters=filters)))
             
-            if response.status_code != 200:
-                return {
-                    'error': f'Vultr API调用失败: {response.status_code} - {response.text}',
-                    'provider': 'vultr'
-                }
+            instances, next_cursor = self._get_instances_page(cursor, _clamp_page_size(page_size), filters)
+            return self._list_result(instances, next_cursor=next_cursor)
+        except Exception as e:
+            return self._error_result(e, action='列出')
+    
+    def list_inventory_records(self) -> List[Dict]:
+        """
+        获取用于内存清单缓存的标准化实例记录
+        
+        Returns:
+            List[Dict]: 实例记录列表
             
-            data = response.json()
-            instance = data.get('instance', {})
-            instance_info = self._format_instance_info(instance)
+        Raises:
+            Exception: 服务不可用或API调用失败
+        """
+        if not self.available:
+            raise RuntimeError(f'Vultr服务不可用: {getattr(self, "error", "未知错误")}')
+        
+        return [self._format_inventory_record(instance) for instance in self.iter_instances()]
+    
+    def iter_instances(
+        self,
+        per_page: int = VULTR_PAGE_SIZE,
+        filters: Optional[Dict] = None
+    ) -> Iterator[Dict]:
+        """
+        逐个返回账户下的所有Vultr实例，按 meta.links.next 游标自动翻页
+        
+        调用方提前结束遍历时不会继续请求后续页面
+        
+        Args:
+            per_page (int): 每页数量
+            filters (dict, optional): 服务端过滤条件（main_ip、label、tag）
             
-            return {
-                'provider': 'vultr',
-                'found': True,
-                'instance_info': instance_info
-            }
+        Yields:
+            Dict: 实例原始数据
             
-        except requests.RequestException as e:
-            return {
-                'error': f'网络请求失败: {str(e)}',
-                'provider': 'vultr'
-            }
-        except Exception as e:
-            return {
-                'error': f'查询Vultr实例时发生错误: {str(e)}',
-                'provider': 'vultr'
-            }
+        Raises:
+            RuntimeError: API返回错误状态码
+            requests.RequestException: 网络请求失败
+        """
+        cursor = None
+        while True:
+            instances, cursor = self._get_instances_page(cursor, per_page, filters)
+            yield from instances
+            if not cursor:
+                break
     
-    def list_instances(self) -> Dict:
+    def _get_instances_page(
+        self,
+        cursor: Optional[str],
+        per_page: int,
+        filters: Optional[Dict] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
         """
-        列出所有Vultr实例
+        获取一页实例
         
         Returns:
-            Dict: 实例列表或错误信息
+            Tuple[List[Dict], Optional[str]]: (实例列表, 下一页游标)
         """
+        response = self._request('GET', '/instances', params=_page_params(cursor, per_page, filters))
+        return self._parse_instances_page(response)
+
+    # 原生异步版本（需要httpx）：参数和返回格式与同步版本一致，
+    # 只有请求方式不同，请求参数、分页和结果格式使用与同步版本相同的辅助方法
+    
+    async def get_instance_by_ip_async(self, ip_address: str) -> Dict:
+        """get_instance_by_ip 的原生异步版本"""
         if not self.available:
-            return {
-                'error': f'Vultr服务不可用: {getattr(self, "error", "未知错误")}',
-                'provider': 'vultr'
-            }
+            return self._unavailable_result()
         
         try:
-            response = requests.get(f'{self.base_url}/instances', headers=self.headers, timeout=10)
-            
-            if response.status_code != 200:
-                return {
-                    'error': f'Vultr API调用失败: {response.status_code} - {response.text}',
-                    'provider': 'vultr'
-                }
-            
-            data = response.json()
-            instances = data.get('instances', [])
+            matcher = _IpMatcher([ip_address])
+            async for instance in self.iter_instances_async(filters=matcher.filters):
+                if matcher.add(instance):
+                    break
+            return self._ip_result(matcher, ip_address, include_checked=True)
+        except Exception as e:
+            return self._error_result(e)
+    
+    async def get_instances_by_ips_async(self, ip_addresses: List[str]) -> Dict:
+        """get_instances_by_ips 的原生异步版本"""
+        if not self.available:
+            return self._unavailable_result()
+        
+        try:
+            matcher = _IpMatcher(ip_addresses)
+            async for instance in self.iter_instances_async(filters=matcher.filters):
+                if matcher.add(instance):
+                    break
+            return self._ips_result(matcher)
+        except Exception as e:
+            return self._error_result(e)
+    
+    async def get_instance_by_id_async(self, instance_id: str) -> Dict:
+        """get_instance_by_id 的原生异步版本"""
+        if not self.available:
+            return self._unavailable_result()
+        
+        try:
+            response = await self._request_async('GET', f'/instances/{instance_id}')
+            return self._instance_response_result(response, instance_id)
+        except Exception as e:
+            return self._error_result(e)
+    
+    async def list_instances_async(
+        self,
+        cursor: Optional[str] = None,
+        page_size: Optional[int] = None,
+        name: Optional[str] = None,
+        tag: Optional[str] = None
+    ) -> Dict:
+        """list_instances 的原生异步版本"""
+        if not self.available:
+            return self._unavailable_result()
+        
+        try:
+            filters = self._list_filters(name, tag)
+            if cursor is None and page_size is None:
+                return self._list_result([
+                    instance async for instance in self.iter_instances_async(filters=filters)
+                ])
             
-            instance_list = []
+            instances, next_cursor = await self._get_instances_page_async(
+                cursor, _clamp_page_size(page_size), filters
+            )
+            return self._list_result(instances, next_cursor=next_cursor)
+        except Exception as e:
+            return self._error_result(e, action='列出')
+    
+    async def iter_instances_async(
+        self,
+        per_page: int = VULTR_PAGE_SIZE,
+        filters: Optional[Dict] = None
+    ) -> AsyncIterator[Dict]:
+        """iter_instances 的原生异步版本"""
+        cursor = None
+        while True:
+            instances, cursor = await self._get_instances_page_async(cursor, per_page, filters)
             for instance in instances:
-                instance_info = self._format_instance_summary(instance)
-                instance_list.append(instance_info)
+                yield instance
+            if not cursor:
+                break
+    
+    async def _get_instances_page_async(
+        self,
+        cursor: Optional[str],
+        per_page: int,
+        filters: Optional[Dict] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """_get_instances_page 的原生异步版本"""
+        response = await self._request_async('GET', '/instances', params=_page_params(cursor, per_page, filters))
+        return self._parse_instances_page(response)
+    
+    # 同步和异步查询共用的请求参数、响应解析和结果格式
+    
+    def _parse_instances_page(self, response) -> Tuple[List[Dict], Optional[str]]:
+        """
+        解析实例列表响应（requests 或 httpx 响应）
+        
+        Returns:
+            Tuple[List[Dict], Optional[str]]: (实例列表, 下一页游标)
             
+        Raises:
+            RuntimeError: API返回错误状态码
+        """
+        if response.status_code != 200:
+            raise RuntimeError(self._api_error_message(response))
+        
+        data = response.json()
+        next_cursor = data.get('meta', {}).get('links', {}).get('next') or None
+        return data.get('instances', []), next_cursor
+    
+    def _instance_response_result(self, response, instance_id: str) -> Dict:
+        """将按ID查询实例的响应转换为查询结果"""
+        if response.status_code == 404:
             return {
                 'provider': 'vultr',
-                'total_instances': len(instance_list),
-                'instances': instance_list
+                'found': False,
+                'message': f'未找到ID为 {instance_id} 的Vultr实例'
             }
-            
-        except requests.RequestException as e:
+        
+        if response.status_code != 200:
             return {
-                'error': f'网络请求失败: {str(e)}',
+                'error': self._api_error_message(response),
                 'provider': 'vultr'
             }
-        except Exception as e:
+        
+        instance = response.json().get('instance', {})
+        return {
+            'provider': 'vultr',
+            'found': True,
+            'instance_info': self._format_instance_info(instance)
+        }
+    
+    def _ip_result(self, matcher: '_IpMatcher', ip_address: str, include_checked: bool = False) -> Dict:
+        """单个IP的查询结果"""
+        instance = matcher.found.get(ip_address)
+        if instance is not None:
             return {
-                'error': f'列出Vultr实例时发生错误: {str(e)}',
-                'provider': 'vultr'
+                'provider': 'vultr',
+                'found': True,
+                'instance_info': self._format_instance_info(instance)
             }
+        
+        result = {
+            'provider': 'vultr',
+            'found': False,
+            'message': f'未找到使用IP地址 {ip_address} 的Vultr实例'
+        }
+        if include_checked:
+            result['total_instances_checked'] = matcher.instances_checked
+        return result
+    
+    def _ips_result(self, matcher: '_IpMatcher') -> Dict:
+        """批量IP的查询结果"""
+        return {
+            'provider': 'vultr',
+            'results': {ip_address: self._ip_result(matcher, ip_address) for ip_address in matcher.ips},
+            'total_instances_checked': matcher.instances_checked
+        }
+    
+    @staticmethod
+    def _list_filters(name: Optional[str], tag: Optional[str]) -> Dict:
+        """列出实例时的服务端过滤条件"""
+        filters = {}
+        if name:
+            filters['label'] = name
+        if tag:
+            filters['tag'] = tag
+        return filters
+    
+    def _list_result(self, instances: List[Dict], **extra) -> Dict:
+        """列出实例的结果，分页查询时 extra 中包含 next_cursor"""
+        instance_list = [self._format_instance_summary(instance) for instance in instances]
+        return {
+            'provider': 'vultr',
+            'total_instances': len(instance_list),
+            'instances': instance_list,
+            **extra
+        }
+    
+    def _unavailable_result(self) -> Dict:
+        """服务不可用时的错误信息"""
+        return {
+            'error': f'Vultr服务不可用: {getattr(self, "error", "未知错误")}',
+            'provider': 'vultr'
+        }
+    
+    @staticmethod
+    def _error_result(error: Exception, action: str = '查询') -> Dict:
+        """
+        将查询过程中的异常转换为错误信息
+        
+        Args:
+            error (Exception): 异常（熔断、API错误状态码为RuntimeError）
+            action (str): 错误信息中的操作名称
+        """
+        if isinstance(error, RuntimeError):
+            message = str(error)
+        elif isinstance(error, requests.RequestException) or (HTTPX_AVAILABLE and isinstance(error, httpx.HTTPError)):
+            message = f'网络请求失败: {str(error)}'
+        else:
+            message = f'{action}Vultr实例时发生错误: {str(error)}'
+        return {
+            'error': message,
+            'provider': 'vultr'
+        }
+    
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """
+        经过熔断器、限流器和请求执行器发起API请求（GET请求失败时自动重试）
+        
+        Args:
+            method (str): HTTP方法
+            path (str): API路径，例如 '/instances'
+            **kwargs: 传给 requests.request 的其他参数
+            
+        Returns:
+            requests.Response: 响应
+            
+        Raises:
+            CircuitOpenError: 熔断器打开
+        """
+        return self.http.request(
+            method, f'{self.base_url}{path}', limiter=self.rate_limiter, breaker=self.circuit_breaker,
+            headers=self.headers, **kwargs
+        )
+    
+    async def _request_async(self, method: str, path: str, **kwargs) -> 'httpx.Response':
+        """_request 的原生异步版本"""
+        return await self.http.request_async(
+            method, f'{self.base_url}{path}', limiter=self.rate_limiter, breaker=self.circuit_breaker,
+            headers=self.headers, **kwargs
+        )
+    
+    def _api_error_message(self, response, prefix: str = 'Vultr API调用失败') -> str:
+        """格式化API错误信息，被限流（429）时给出需要等待的时间"""
+        if response.status_code == 429:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is None and self.rate_limiter:
+                retry_after = self.rate_limiter.retry_after()
+            hint = f'请在 {round(retry_after, 1):g} 秒后重试' if retry_after else '请稍后重试'
+            return f'Vultr API请求被限流（429），{hint}'
+        return f'{prefix}: {response.status_code} - {response.text}'
     
     def power_on_instance(
         self, 
@@ -244,7 +563,7 @@ class VultrProvider:
         
         # 首先获取实例信息
         try:
-            response = requests.get(f'{self.base_url}/instances/{instance_id}', headers=self.headers, timeout=10)
+            response = self._request('GET', f'/instances/{instance_id}')
             
             if response.status_code == 404:
                 return {
@@ -254,7 +573,7 @@ class VultrProvider:
             
             if response.status_code != 200:
                 return {
-                    'error': f'获取实例信息失败: {response.status_code} - {response.text}',
+                    'error': self._api_error_message(response, '获取实例信息失败'),
                     'provider': 'vultr'
                 }
             
@@ -304,16 +623,11 @@ class VultrProvider:
         # 执行实际操作
         try:
             operation_data = {'action': operation}
-            response = requests.post(
-                f'{self.base_url}/instances/{instance_id}/actions',
-                headers=self.headers,
-                json=operation_data,
-                timeout=10
-            )
+            response = self._request('POST', f'/instances/{instance_id}/actions', json=operation_data)
             
             if response.status_code not in [200, 202, 204]:
                 return {
-                    'error': f'执行 {operation} 操作失败: {response.status_code} - {response.text}',
+                    'error': self._api_error_message(response, f'执行 {operation} 操作失败'),
                     'provider': 'vultr'
                 }
             
@@ -349,11 +663,11 @@ class VultrProvider:
             }
         
         try:
-            response = requests.get(f'{self.base_url}/instances/{instance_id}/bandwidth', headers=self.headers, timeout=10)
+            response = self._request('GET', f'/instances/{instance_id}/bandwidth')
             
             if response.status_code != 200:
                 return {
-                    'error': f'获取带宽信息失败: {response.status_code} - {response.text}',
+                    'error': self._api_error_message(response, '获取带宽信息失败'),
                     'provider': 'vultr'
                 }
             
@@ -401,6 +715,23 @@ class VultrProvider:
             'date_created': instance.get('date_created')
         }
     
+    def _format_inventory_record(self, instance: Dict) -> Dict:
+        """格式化实例清单记录"""
+        main_ip = instance.get('main_ip')
+        v6_main_ip = instance.get('v6_main_ip')
+        internal_ip = instance.get('internal_ip')
+        
+        return {
+            'provider': 'vultr',
+            'instance_id': instance.get('id'),
+            'name': instance.get('label', '未命名'),
+            # 未分配IP的实例main_ip为 "0.0.0.0"
+            'public_ipv4': [main_ip] if main_ip and main_ip != '0.0.0.0' else [],
+            'public_ipv6': [v6_main_ip] if v6_main_ip else [],
+            'private_ips': [internal_ip] if internal_ip else [],
+            'instance_info': self._format_instance_info(instance)
+        }
+    
     def _format_instance_summary(self, instance: Dict) -> Dict:
         """格式化实例摘要信息"""
         return {
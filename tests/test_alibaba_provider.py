@@ -0,0 +1,127 @@
+"""阿里云多区域查询测试：并发翻页不会死锁，所有区域都失败时返回错误（使用桩ECS客户端）"""
+
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from providers import alibaba_provider
+from providers.alibaba_provider import AlibabaProvider
+from utils.aio import ProviderExecutor
+
+REGIONS = ['cn-hangzhou', 'cn-shanghai', 'cn-beijing']
+INSTANCES_PER_REGION = 250
+
+
+def make_instance(region_id, index):
+    return SimpleNamespace(
+        instance_id=f'i-{region_id}-{index}',
+        public_ip_address=SimpleNamespace(ip_address=[f'{region_id}/{index}']),
+        eip_address=None,
+        inner_ip_address=None,
+        vpc_attributes=None,
+    )
+
+
+class StubEcsClient:
+    """DescribeInstances 忽略IP过滤条件返回区域内所有实例，支持 PageNumber 和 NextToken 两种翻页方式"""
+
+    def __init__(self, region_id, requests):
+        self.region_id = region_id
+        self.requests = requests
+        self.instances = [make_instance(region_id, i) for i in range(INSTANCES_PER_REGION)]
+
+    def describe_instances(self, request):
+        self.requests.append((self.region_id, request.page_number, request.next_token, threading.current_thread().name))
+        if request.page_number:
+            start = (request.page_number - 1) * request.page_size
+            end = start + request.page_size
+            next_token = None
+        else:
+            start = int(request.next_token or 0)
+            end = start + request.max_results
+            next_token = str(end) if end < len(self.instances) else None
+        body = SimpleNamespace(
+            instances=SimpleNamespace(instance=self.instances[start:end]),
+            total_count=len(self.instances),
+            next_token=next_token,
+        )
+        return SimpleNamespace(body=body)
+
+
+class StubRequest(SimpleNamespace):
+    def __init__(self, page_number=None, page_size=None, max_results=None, next_token=None, **kwargs):
+        super().__init__(
+            page_number=page_number, page_size=page_size, max_results=max_results, next_token=next_token, **kwargs
+        )
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    monkeypatch.setattr(alibaba_provider, 'ecs_models', SimpleNamespace(DescribeInstancesRequest=StubRequest))
+    monkeypatch.setattr(alibaba_provider, 'ALIBABA_CLOUD_REGIONS', ','.join(REGIONS))
+    monkeypatch.setattr(alibaba_provider, 'ALIBABA_PAGE_CONCURRENCY', 2)
+    monkeypatch.setattr(alibaba_provider, 'ALIBABA_REGION_TIMEOUT', 5)
+
+    provider = AlibabaProvider.__new__(AlibabaProvider)
+    provider.available = True
+    provider.region_id = REGIONS[0]
+    provider.requests = []
+    provider._regions = list(REGIONS)
+    provider._clients = {region_id: StubEcsClient(region_id, provider.requests) for region_id in REGIONS}
+    provider.rate_limiter = None
+    provider.circuit_breaker = None
+    # 线程数少于区域数：所有线程都被区域任务占用
+    provider.fanout_executor = ProviderExecutor('alibaba-test', 2, thread_name_prefix='alibaba-test-fanout')
+    provider._format_instance_info = lambda instance: {'instance_id': instance.instance_id}
+    yield provider
+    provider.fanout_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def test_multi_region_lookup_with_page_concurrency_does_not_deadlock(provider):
+    target = f'{REGIONS[-1]}/{INSTANCES_PER_REGION - 1}'
+    result = provider.get_instance_by_ip(target)
+
+    assert result['found'] is True
+    assert result['instance_info']['instance_id'] == f'i-{REGIONS[-1]}-{INSTANCES_PER_REGION - 1}'
+    # 区域任务中顺序翻页（NextToken），不再向同一线程池提交页面请求
+    assert all(page_number is None for _, page_number, _, _ in provider.requests)
+
+
+def test_batch_lookup_across_regions(provider):
+    targets = [f'{region_id}/{INSTANCES_PER_REGION - 1}' for region_id in REGIONS]
+    result = provider.get_instances_by_ips(targets)
+
+    assert 'failed_regions' not in result
+    assert all(result['results'][ip]['found'] for ip in targets)
+
+
+def test_page_concurrency_outside_fanout_threads(provider):
+    instances = list(provider.iter_instances(region_id=REGIONS[0], public_ip_addresses=json.dumps([])))
+
+    assert len(instances) == INSTANCES_PER_REGION
+    assert [page_number for _, page_number, _, _ in provider.requests] == [1, 2, 3]
+    assert any(name.startswith('alibaba-test-fanout') for _, _, _, name in provider.requests)
+
+
+class FailingEcsClient:
+    def describe_instances(self, request):
+        raise ConnectionError('region unreachable')
+
+
+def test_ip_lookup_fails_when_every_region_fails(provider):
+    provider._clients = {region_id: FailingEcsClient() for region_id in REGIONS}
+    result = provider.get_instance_by_ip(f'{REGIONS[0]}/0')
+    assert 'found' not in result
+    assert '所有区域查询失败' in result['error']
+
+    batch = provider.get_instances_by_ips([f'{REGIONS[0]}/0'])
+    assert '所有区域查询失败' in batch['error']
+
+
+def test_ip_lookup_reports_partial_region_failures(provider):
+    provider._clients[REGIONS[1]] = FailingEcsClient()
+    result = provider.get_instance_by_ip('203.0.113.1')
+    assert result['found'] is False
+    assert list(result['failed_regions']) == [REGIONS[1]]
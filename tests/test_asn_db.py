@@ -0,0 +1,86 @@
+"""基于mmap的ASN数据库测试"""
+
+import ipaddress
+import random
+
+import pytest
+
+from utils.asn_db import ASNDatabase
+
+ROWS = [
+    ('1.0.0.0', '1.0.0.255', 13335, 'CLOUDFLARENET'),
+    ('3.0.0.0', '3.255.255.255', 16509, 'AMAZON-02'),
+    ('4.0.0.0', '4.0.0.255', 0, 'Not routed'),
+    ('45.32.0.0', '45.32.255.255', 20473, 'AS-CHOOPA'),
+    ('2600:1f00::', '2600:1fff:ffff:ffff:ffff:ffff:ffff:ffff', 16509, 'AMAZON-02'),
+]
+
+
+def write_database(path, rows, trailing_newline=True):
+    lines = [f'{start}\t{end}\t{asn}\tUS\t{description}' for start, end, asn, description in rows]
+    path.write_text('\n'.join(lines) + ('\n' if trailing_newline else ''))
+    return str(path)
+
+
+@pytest.fixture(params=[True, False], ids=['trailing-newline', 'no-trailing-newline'])
+def database(request, tmp_path):
+    db = ASNDatabase(write_database(tmp_path / 'ip2asn.tsv', ROWS, trailing_newline=request.param))
+    yield db
+    db.close()
+
+
+@pytest.mark.parametrize('ip_address,asn', [
+    ('1.0.0.0', 13335),
+    ('1.0.0.255', 13335),
+    ('3.1.2.3', 16509),
+    ('3.255.255.255', 16509),
+    ('45.32.0.1', 20473),
+    ('2600:1f00::1', 16509),
+])
+def test_lookup_inside_ranges(database, ip_address, asn):
+    assert database.lookup_asn(ip_address) == asn
+
+
+@pytest.mark.parametrize('ip_address', [
+    '0.0.0.1',        # 第一行之前
+    '2.0.0.1',        # 两行之间的空隙
+    '4.0.0.1',        # ASN为0（未路由）
+    '200.0.0.1',      # 最后一个IPv4区间之后
+    '2001:db8::1',    # IPv6中第一行之前
+    'not-an-ip',
+])
+def test_lookup_outside_ranges(database, ip_address):
+    assert database.lookup_asn(ip_address) is None
+
+
+def test_lookup_provider_maps_cloud_asns(database):
+    assert database.lookup_provider('3.1.2.3') == 'aws'
+    assert database.lookup_provider('45.32.10.10') == 'vultr'
+    assert database.lookup_provider('1.0.0.1') is None
+
+
+def test_bisect_matches_linear_scan(tmp_path):
+    rng = random.Random(5)
+    starts = sorted(rng.sample(range(1 << 24, 1 << 31, 256), 2000))
+    rows = []
+    for i, start in enumerate(starts):
+        end = start + rng.randint(0, 255)
+        rows.append((str(ipaddress.IPv4Address(start)), str(ipaddress.IPv4Address(end)), i + 1, 'AS'))
+
+    db = ASNDatabase(write_database(tmp_path / 'ip2asn.tsv', rows))
+    bounds = [(int(ipaddress.IPv4Address(start)), int(ipaddress.IPv4Address(end)), asn) for start, end, asn, _ in rows]
+    try:
+        probes = [start for start, _, _ in bounds[::7]] + [end + 1 for _, end, _ in bounds[::11]]
+        probes += [rng.randrange(0, 1 << 32) for _ in range(500)]
+        for address in probes:
+            expected = next((asn for start, end, asn in bounds if start <= address <= end), None)
+            assert db.lookup_asn(str(ipaddress.IPv4Address(address))) == expected
+    finally:
+        db.close()
+
+
+def test_empty_file_rejected(tmp_path):
+    path = tmp_path / 'empty.tsv'
+    path.write_text('')
+    with pytest.raises(ValueError):
+        ASNDatabase(str(path))
@@ -0,0 +1,208 @@
+"""异步提供商包装测试（单飞合并、取消传递、原生异步方法、熔断备用结果）"""
+
+import asyncio
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+import pytest
+
+from providers.async_provider import AsyncProvider
+from utils.aio import ProviderExecutor
+from utils.circuit_breaker import CircuitBreaker
+from utils.regions import first_hit
+
+
+class BlockingProvider:
+    """同步提供商，查询在 release 事件被设置前一直阻塞"""
+
+    available = True
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+
+    def get_instance_by_ip(self, ip_address):
+        with self.lock:
+            self.calls.append(ip_address)
+        self.release.wait(5)
+        return {'provider': 'test', 'found': True, 'instance_info': {'ip': ip_address}}
+
+    def power_on_instance(self, instance_id):
+        with self.lock:
+            self.calls.append(instance_id)
+        self.release.wait(5)
+        return {'success': True}
+
+
+class RegionProvider:
+    """按IP查询时在多个区域上执行 first_hit，区域线程池只有一个线程，其余区域排队"""
+
+    available = True
+
+    def __init__(self):
+        self.started = []
+        self.release = threading.Event()
+        self.finished = threading.Event()
+        self.fanout_executor = ProviderExecutor('test', 1)
+        self.outcome = None
+
+    def get_instance_by_ip(self, ip_address):
+        try:
+            first_hit(['r1', 'r2', 'r3'], self.lookup, 5, self.fanout_executor)
+            self.outcome = 'completed'
+        except CancelledError:
+            self.outcome = 'cancelled'
+        finally:
+            self.finished.set()
+
+    def lookup(self, region):
+        self.started.append(region)
+        self.release.wait(5)
+        return None
+
+
+class NativeProvider:
+    native_async = True
+
+    def __init__(self):
+        self.sync_calls = 0
+        self.async_calls = 0
+
+    def get_instance_by_id(self, instance_id):
+        self.sync_calls += 1
+        return {'found': True}
+
+    async def get_instance_by_id_async(self, instance_id):
+        self.async_calls += 1
+        await asyncio.sleep(0.05)
+        return {'found': True, 'id': instance_id}
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(4) as pool:
+        yield pool
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0.02)
+
+
+def test_concurrent_identical_lookups_share_one_call(executor):
+    provider = BlockingProvider()
+    wrapped = AsyncProvider(provider, executor=executor, coalesce=True)
+
+    async def scenario():
+        tasks = [asyncio.ensure_future(wrapped.get_instance_by_ip('1.2.3.4')) for _ in range(5)]
+        await settle()
+        provider.release.set()
+        return await asyncio.gather(*tasks)
+
+    results = asyncio.run(scenario())
+    assert provider.calls == ['1.2.3.4']
+    assert all(result == results[0] for result in results)
+    # 每个调用方得到独立的副本
+    assert len({id(result) for result in results}) == 5
+    stats = wrapped.get_coalescing_stats()
+    assert (stats['requests'], stats['coalesced'], stats['inflight']) == (1, 4, 0)
+
+
+def test_different_arguments_and_later_calls_are_not_merged(executor):
+    provider = BlockingProvider()
+    provider.release.set()
+    wrapped = AsyncProvider(provider, executor=executor, coalesce=True)
+
+    async def scenario():
+        await asyncio.gather(wrapped.get_instance_by_ip('1.1.1.1'), wrapped.get_instance_by_ip('2.2.2.2'))
+        await wrapped.get_instance_by_ip('1.1.1.1')
+
+    asyncio.run(scenario())
+    assert sorted(provider.calls) == ['1.1.1.1', '1.1.1.1', '2.2.2.2']
+
+
+def test_mutating_methods_are_never_merged(executor):
+    provider = BlockingProvider()
+    wrapped = AsyncProvider(provider, executor=executor, coalesce=True)
+
+    async def scenario():
+        tasks = [asyncio.ensure_future(wrapped.power_on_instance('i-1')) for _ in range(2)]
+        await settle()
+        provider.release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert provider.calls == ['i-1', 'i-1']
+
+
+def test_cancelled_caller_does_not_cancel_shared_request(executor):
+    provider = BlockingProvider()
+    wrapped = AsyncProvider(provider, executor=executor, coalesce=True)
+
+    async def scenario():
+        first = asyncio.ensure_future(wrapped.get_instance_by_ip('1.2.3.4'))
+        second = asyncio.ensure_future(wrapped.get_instance_by_ip('1.2.3.4'))
+        await settle()
+        first.cancel()
+        provider.release.set()
+        result = await second
+        assert first.cancelled()
+        return result
+
+    assert asyncio.run(scenario())['found'] is True
+    assert provider.calls == ['1.2.3.4']
+
+
+def test_cancelling_every_caller_cancels_shared_request(executor):
+    provider = RegionProvider()
+    wrapped = AsyncProvider(provider, executor=executor, coalesce=True)
+
+    async def scenario():
+        callers = [asyncio.ensure_future(wrapped.get_instance_by_ip('1.2.3.4')) for _ in range(2)]
+        await settle()
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await settle()
+
+    asyncio.run(scenario())
+    # 阻塞调用停止等待区域结果，排队中的区域不再执行
+    assert provider.finished.wait(2)
+    assert provider.outcome == 'cancelled'
+    provider.release.set()
+    provider.fanout_executor.shutdown()
+    assert provider.started == ['r1']
+    assert wrapped.get_coalescing_stats()['inflight'] == 0
+
+
+def test_native_async_methods_are_used_and_coalesced():
+    provider = NativeProvider()
+    wrapped = AsyncProvider(provider, coalesce=True)
+
+    async def scenario():
+        return await asyncio.gather(*(wrapped.get_instance_by_id('abc') for _ in range(3)))
+
+    results = asyncio.run(scenario())
+    assert results == [{'found': True, 'id': 'abc'}] * 3
+    assert (provider.async_calls, provider.sync_calls) == (1, 0)
+
+
+def test_open_breaker_serves_fallback(executor):
+    provider = BlockingProvider()
+    provider.release.set()
+    provider.circuit_breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=60)
+    fallback_calls = []
+
+    def fallback(name, args, kwargs):
+        fallback_calls.append((name, args))
+        return {'provider': 'test', 'found': True, 'source': 'inventory_cache'}
+
+    wrapped = AsyncProvider(provider, executor=executor, coalesce=False, fallback=fallback)
+    assert asyncio.run(wrapped.get_instance_by_ip('1.2.3.4'))['instance_info'] == {'ip': '1.2.3.4'}
+
+    provider.circuit_breaker.record_failure()
+    assert asyncio.run(wrapped.get_instance_by_ip('1.2.3.4'))['source'] == 'inventory_cache'
+    assert fallback_calls == [('get_instance_by_ip', ('1.2.3.4',))]
+    assert provider.calls == ['1.2.3.4']
+    assert wrapped.get_circuit_breaker_stats()['fallback_served'] == 1
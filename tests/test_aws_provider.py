@@ -0,0 +1,124 @@
+"""AWS 提供商测试：多区域分页游标记录当前区域，多区域IP查询区分部分失败和全部失败（使用桩客户端）"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from providers import aws_provider
+from providers.aws_provider import AWSProvider
+from utils.aio import ProviderExecutor
+
+REGION_INSTANCES = {
+    'us-east-1': [f'i-use1-{i}' for i in range(7)],
+    'eu-west-1': [],
+    'ap-south-1': [f'i-aps1-{i}' for i in range(3)],
+}
+
+
+class StubEC2:
+    """describe_instances 按 MaxResults 分页，NextToken 为下一页的起始位置"""
+
+    def __init__(self, region, requests):
+        self.region = region
+        self.requests = requests
+
+    def describe_instances(self, MaxResults, NextToken=None, Filters=None):
+        self.requests.append((self.region, NextToken))
+        instance_ids = REGION_INSTANCES[self.region]
+        start = int(NextToken or 0)
+        end = start + MaxResults
+        response = {
+            'Reservations': [
+                {'Instances': [{'InstanceId': instance_id} for instance_id in instance_ids[start:end]]}
+            ]
+        }
+        if end < len(instance_ids):
+            response['NextToken'] = str(end)
+        return response
+
+
+@pytest.fixture
+def provider():
+    provider = AWSProvider.__new__(AWSProvider)
+    provider.available = True
+    provider.region = 'us-east-1'
+    provider.requests = []
+    provider._regions = list(REGION_INSTANCES)
+    provider.get_client = lambda region=None: StubEC2(region or provider.region, provider.requests)
+    provider._format_instance_summary = lambda instance: {'instance_id': instance['InstanceId']}
+    return provider
+
+
+def list_all_pages(provider, page_size):
+    pages = [provider.list_instances(page_size=page_size)]
+    while pages[-1]['next_cursor']:
+        pages.append(provider.list_instances(cursor=pages[-1]['next_cursor'], page_size=page_size))
+    return pages
+
+
+def test_cursor_pages_through_every_region(provider):
+    pages = list_all_pages(provider, page_size=5)
+
+    assert [page['region'] for page in pages] == ['us-east-1', 'us-east-1', 'ap-south-1']
+    assert [page['next_cursor'] for page in pages] == ['us-east-1:5', 'eu-west-1:', None]
+    instance_ids = [instance['instance_id'] for page in pages for instance in page['instances']]
+    assert instance_ids == REGION_INSTANCES['us-east-1'] + REGION_INSTANCES['ap-south-1']
+    assert pages[0]['regions'] == list(REGION_INSTANCES)
+    # 没有实例的区域被跳过，不返回空页
+    assert ('eu-west-1', None) in provider.requests
+
+
+def test_single_region_cursor(provider):
+    provider._regions = ['us-east-1']
+    pages = list_all_pages(provider, page_size=5)
+    assert [page['total_instances'] for page in pages] == [5, 2]
+    assert pages[-1]['next_cursor'] is None
+
+
+def test_cursor_for_unknown_region_is_rejected(provider):
+    result = provider.list_instances(cursor='mars-1:5', page_size=5)
+    assert result == {'error': '无效的分页游标: mars-1:5', 'provider': 'aws'}
+    assert provider.requests == []
+
+
+class FailingEC2:
+    def __init__(self, region):
+        self.region = region
+
+    def describe_instances(self, **kwargs):
+        if self.region == 'ap-south-1':
+            return {'Reservations': []}
+        raise ConnectionError(f'{self.region} unreachable')
+
+    def get_paginator(self, operation_name):
+        return SimpleNamespace(paginate=lambda **kwargs: iter([self.describe_instances(**kwargs)]))
+
+
+@pytest.fixture
+def multi_region_provider(provider, monkeypatch):
+    monkeypatch.setattr(aws_provider, 'AWS_REGIONS', ','.join(REGION_INSTANCES))
+    provider.fanout_executor = ProviderExecutor('aws-test', 4)
+    provider.get_client = lambda region=None: FailingEC2(region)
+    yield provider
+    provider.fanout_executor.shutdown()
+
+
+def test_ip_lookup_fails_when_every_region_fails(multi_region_provider):
+    multi_region_provider._regions = ['us-east-1', 'eu-west-1']
+    result = multi_region_provider.get_instance_by_ip('198.51.100.1')
+    assert 'found' not in result
+    assert '所有区域查询失败' in result['error']
+
+    batch = multi_region_provider.get_instances_by_ips(['198.51.100.1'])
+    assert 'results' not in batch
+    assert '所有区域查询失败' in batch['error']
+
+
+def test_ip_lookup_reports_partial_region_failures(multi_region_provider):
+    result = multi_region_provider.get_instance_by_ip('198.51.100.1')
+    assert result['found'] is False
+    assert set(result['failed_regions']) == {'us-east-1', 'eu-west-1'}
+
+    batch = multi_region_provider.get_instances_by_ips(['198.51.100.1'])
+    assert batch['results']['198.51.100.1']['found'] is False
+    assert set(batch['failed_regions']) == {'us-east-1', 'eu-west-1'}
@@ -0,0 +1,146 @@
+"""LRU + TTL 缓存测试"""
+
+import pytest
+
+from utils import cache as cache_module
+from utils.cache import TTLCache
+
+
+@pytest.fixture(autouse=True)
+def fake_time(monkeypatch, clock):
+    monkeypatch.setattr(cache_module, 'time', clock)
+
+
+def test_evicts_least_recently_used():
+    cache = TTLCache('test', max_size=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == (True, 1)
+
+    cache.set('c', 3)
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 1)
+    assert cache.get('c') == (True, 3)
+    assert cache.evictions == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache('test', ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=120)
+
+    clock.advance(59)
+    assert cache.get('a') == (True, 1)
+    clock.advance(1)
+    assert cache.get('a') == (False, None)
+    assert cache.get('b') == (True, 2)
+    assert cache.expirations == 1
+    assert len(cache) == 1
+
+
+def test_negative_results_use_negative_ttl(clock):
+    cache = TTLCache('test', ttl=3600, negative_ttl=30)
+    cache.set('ok', {'isp': 'AMAZON'})
+    cache.set('failed', {'error': 'timeout'}, negative=True)
+
+    assert cache.get('failed') == (True, {'error': 'timeout'})
+    assert cache.negative_hits == 1
+    clock.advance(30)
+    assert cache.get('failed') == (False, None)
+    assert cache.get('ok') == (True, {'isp': 'AMAZON'})
+
+
+def test_persists_across_instances(tmp_path, clock):
+    db_path = str(tmp_path / 'cache.sqlite3')
+    cache = TTLCache('ipinfo', ttl=100, negative_ttl=10, db_path=db_path)
+    cache.set('1.1.1.1', {'isp': 'CLOUDFLARENET'})
+    cache.set('2.2.2.2', {'error': 'timeout'}, negative=True)
+    cache.set('3.3.3.3', {'isp': 'deleted'})
+    cache.delete('3.3.3.3')
+
+    clock.advance(20)
+    reloaded = TTLCache('ipinfo', ttl=100, negative_ttl=10, db_path=db_path)
+    assert reloaded.get('1.1.1.1') == (True, {'isp': 'CLOUDFLARENET'})
+    assert reloaded.get('2.2.2.2') == (False, None)
+    assert reloaded.get('3.3.3.3') == (False, None)
+    assert reloaded.get_stats()['persistent']
+
+
+def test_reload_keeps_most_recent_entries_within_max_size(tmp_path, clock):
+    db_path = str(tmp_path / 'cache.sqlite3')
+    cache = TTLCache('ipinfo', max_size=10, db_path=db_path)
+    for i in range(5):
+        cache.set(f'key{i}', i)
+        clock.advance(1)
+
+    reloaded = TTLCache('ipinfo', max_size=2, db_path=db_path)
+    assert len(reloaded) == 2
+    assert reloaded.get('key4') == (True, 4)
+    assert reloaded.get('key3') == (True, 3)
+
+
+def test_set_many_skips_unchanged_entries(tmp_path, clock):
+    db_path = str(tmp_path / 'cache.sqlite3')
+    cache = TTLCache('learned', ttl=100, db_path=db_path)
+    assert cache.set_many({'a': 'aws', 'b': 'vultr'}) == 2
+    assert cache.set_many({'a': 'aws', 'b': 'vultr'}) == 0
+
+    # 值变化或剩余有效期不足一半时重新写入
+    assert cache.set_many({'a': 'alibaba', 'b': 'vultr'}) == 1
+    clock.advance(60)
+    assert cache.set_many({'a': 'alibaba', 'b': 'vultr'}) == 2
+
+    cache.set('c', 'failed', negative=True)
+    assert cache.set_many({'c': 'failed'}) == 1
+    assert cache.get('c') == (True, 'failed')
+    assert cache.negative_hits == 0
+
+    reloaded = TTLCache('learned', ttl=100, db_path=db_path)
+    assert reloaded.get('a') == (True, 'alibaba')
+
+
+def test_set_many_evicts_over_max_size(tmp_path):
+    db_path = str(tmp_path / 'cache.sqlite3')
+    cache = TTLCache('learned', max_size=2, db_path=db_path)
+    cache.set('old', 1)
+    assert cache.set_many({'a': 1, 'b': 2}) == 2
+    assert cache.get('old') == (False, None)
+
+    reloaded = TTLCache('learned', max_size=10, db_path=db_path)
+    assert len(reloaded) == 2
+    assert reloaded.get('old') == (False, None)
+
+
+def test_get_does_not_write_to_sqlite(tmp_path, clock):
+    db_path = str(tmp_path / 'cache.sqlite3')
+    cache = TTLCache('ipinfo', ttl=10, db_path=db_path)
+    cache.set('a', 1)
+    statements = []
+    cache._db.set_trace_callback(statements.append)
+
+    clock.advance(10)
+    assert cache.get('a') == (False, None)
+    assert cache.expirations == 1
+    assert statements == []
+
+    # 过期记录在加载时清理
+    reloaded = TTLCache('ipinfo', ttl=10, db_path=db_path)
+    assert len(reloaded) == 0
+
+
+def test_set_many_negative_results_use_negative_ttl(tmp_path, clock):
+    db_path = str(tmp_path / 'cache.sqlite3')
+    cache = TTLCache('ipinfo', ttl=100, negative_ttl=10, db_path=db_path)
+    statements = []
+    cache._db.set_trace_callback(statements.append)
+
+    assert cache.set_many({f'10.0.0.{i}': {'org': 'Unknown'} for i in range(50)}, negative=True) == 50
+    assert [statement for statement in statements if statement == 'COMMIT'] == ['COMMIT']
+    assert cache.get('10.0.0.1') == (True, {'org': 'Unknown'})
+    assert cache.negative_hits == 1
+
+    reloaded = TTLCache('ipinfo', ttl=100, negative_ttl=10, db_path=db_path)
+    assert reloaded.get('10.0.0.2') == (True, {'org': 'Unknown'})
+    assert reloaded.negative_hits == 1
+    clock.advance(10)
+    assert reloaded.get('10.0.0.3') == (False, None)
@@ -0,0 +1,91 @@
+"""熔断器测试"""
+
+import pytest
+
+from utils import circuit_breaker as circuit_breaker_module
+from utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def breaker(monkeypatch, clock):
+    monkeypatch.setattr(circuit_breaker_module, 'time', clock)
+    return CircuitBreaker('test', failure_threshold=3, reset_timeout=30)
+
+
+def trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.before_call()
+        breaker.record_failure()
+
+
+def test_opens_after_consecutive_failures(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.is_open()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.rejected == 1
+
+
+def test_half_open_allows_single_probe(breaker, clock):
+    trip(breaker)
+    clock.advance(30)
+    assert not breaker.is_open()
+
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    assert breaker.is_open()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.before_call()
+    breaker.before_call()
+
+
+def test_failed_probe_reopens(breaker, clock):
+    trip(breaker)
+    clock.advance(30)
+    breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert breaker.times_opened == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock.advance(29)
+    assert breaker.is_open()
+    clock.advance(1)
+    breaker.before_call()
+
+
+def test_lost_probe_is_replaced_after_reset_timeout(breaker, clock):
+    trip(breaker)
+    clock.advance(30)
+    breaker.before_call()
+
+    # 探测请求一直没有结果（例如调用方被取消），冷却时间后放行新的探测请求
+    clock.advance(29)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock.advance(1)
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+
+
+def test_stats_report_state(breaker, clock):
+    trip(breaker)
+    clock.advance(10)
+    stats = breaker.get_stats()
+    assert stats['state'] == OPEN
+    assert stats['consecutive_failures'] == 3
+    assert stats['retry_after_seconds'] == 20
+    assert stats['times_opened'] == 1
@@ -0,0 +1,79 @@
+"""对冲请求测试：调用方被取消时，进行中的主请求和对冲请求都被取消"""
+
+import asyncio
+
+from utils.http import RequestExecutor
+
+
+class SlowSender:
+    """记录每个请求的开始和结束方式，请求在 release 被设置前一直等待"""
+
+    def __init__(self):
+        self.started = 0
+        self.cancelled = 0
+        self.release = None
+
+    async def send(self):
+        self.started += 1
+        try:
+            await self.release.wait()
+            return 'response'
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+def hedging_executor():
+    executor = RequestExecutor('test', hedging=True)
+    executor.hedge_delay = lambda: 0.01
+    return executor
+
+
+def test_cancelled_caller_cancels_primary_and_hedge():
+    executor = hedging_executor()
+    sender = SlowSender()
+
+    async def scenario():
+        sender.release = asyncio.Event()
+        task = asyncio.ensure_future(executor._send_hedged_async(sender.send))
+        await asyncio.sleep(0.05)
+        assert sender.started == 2
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return task
+
+    task = asyncio.run(scenario())
+    assert task.cancelled()
+    assert sender.cancelled == 2
+    assert executor.hedged == 1
+
+
+def test_cancelled_caller_cancels_primary_before_hedge_delay():
+    executor = hedging_executor()
+    executor.hedge_delay = lambda: 10
+    sender = SlowSender()
+
+    async def scenario():
+        sender.release = asyncio.Event()
+        task = asyncio.ensure_future(executor._send_hedged_async(sender.send))
+        await asyncio.sleep(0.02)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert (sender.started, sender.cancelled, executor.hedged) == (1, 1, 0)
+
+
+def test_first_response_wins():
+    executor = hedging_executor()
+    sender = SlowSender()
+
+    async def scenario():
+        sender.release = asyncio.Event()
+        task = asyncio.ensure_future(executor._send_hedged_async(sender.send))
+        await asyncio.sleep(0.05)
+        sender.release.set()
+        return await task
+
+    assert asyncio.run(scenario()) == 'response'
+    assert sender.started == 2
@@ -0,0 +1,77 @@
+"""IP段索引测试"""
+
+import ipaddress
+import random
+
+from utils.ip_ranges import IPRangeIndex, build_disjoint_intervals
+
+
+def most_specific(intervals, address):
+    """暴力查找包含地址的最小区间的值"""
+    matches = [(end - start, value) for start, end, value in intervals if start <= address <= end]
+    return min(matches)[1] if matches else None
+
+
+def segment_lookup(segments, address):
+    for start, end, value in segments:
+        if start <= address <= end:
+            return value
+    return None
+
+
+def test_nested_interval_splits_outer():
+    assert build_disjoint_intervals([(0, 255, 'a'), (16, 31, 'b')]) == [
+        (0, 15, 'a'), (16, 31, 'b'), (32, 255, 'a')
+    ]
+
+
+def test_deeply_nested_intervals():
+    intervals = [(0, 99, 'a'), (10, 49, 'b'), (20, 29, 'c')]
+    assert build_disjoint_intervals(intervals) == [
+        (0, 9, 'a'), (10, 19, 'b'), (20, 29, 'c'), (30, 49, 'b'), (50, 99, 'a')
+    ]
+
+
+def test_inner_interval_sharing_start_or_end():
+    assert build_disjoint_intervals([(0, 99, 'a'), (0, 49, 'b')]) == [(0, 49, 'b'), (50, 99, 'a')]
+    assert build_disjoint_intervals([(0, 99, 'a'), (50, 99, 'b')]) == [(0, 49, 'a'), (50, 99, 'b')]
+
+
+def test_adjacent_same_value_merged_and_gaps_kept():
+    assert build_disjoint_intervals([(10, 19, 'a'), (0, 9, 'a')]) == [(0, 19, 'a')]
+    assert build_disjoint_intervals([(0, 9, 'a'), (20, 29, 'b')]) == [(0, 9, 'a'), (20, 29, 'b')]
+    assert build_disjoint_intervals([]) == []
+
+
+def test_matches_most_specific_prefix_on_random_networks():
+    rng = random.Random(7)
+    intervals = []
+    for _ in range(200):
+        prefix_len = rng.randint(20, 32)
+        size = 1 << (32 - prefix_len)
+        start = rng.randrange(0, 1 << 16) * size % (1 << 32)
+        intervals.append((start, start + size - 1, rng.choice('abcd')))
+    # 完全相同的网段会使最具体匹配不唯一，只保留一个
+    intervals = list({(start, end): (start, end, value) for start, end, value in intervals}.values())
+
+    segments = build_disjoint_intervals(intervals)
+    assert all(prev[1] < cur[0] for prev, cur in zip(segments, segments[1:]))
+
+    probes = [point for start, end, _ in intervals for point in (start, end, end + 1, max(start - 1, 0))]
+    probes += [rng.randrange(0, 1 << 32) for _ in range(500)]
+    for address in probes:
+        assert segment_lookup(segments, address) == most_specific(intervals, address)
+
+
+def test_index_lookup_prefers_longest_prefix():
+    index = IPRangeIndex()
+    assert index.add_prefix('10.0.0.0/8', 'aws')
+    assert index.add_prefix('10.1.0.0/16', 'vultr')
+    assert index.add_prefix('2600:1f00::/24', 'aws')
+    assert not index.add_prefix('not-a-network', 'aws')
+
+    assert index.lookup('10.2.3.4') == 'aws'
+    assert index.lookup('10.1.3.4') == 'vultr'
+    assert index.lookup('11.0.0.1') is None
+    assert index.lookup(str(ipaddress.ip_address('2600:1f00::1'))) == 'aws'
+    assert index.lookup('invalid') is None
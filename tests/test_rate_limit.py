@@ -0,0 +1,118 @@
+"""令牌桶 + AIMD 限流器测试"""
+
+import threading
+import time
+from email.utils import formatdate
+
+import pytest
+
+from utils.rate_limit import BACKGROUND, INTERACTIVE, RateLimiter, parse_retry_after
+
+
+@pytest.mark.parametrize('value,expected', [
+    ('2', 2.0),
+    ('0.5', 0.5),
+    ('-3', 0.0),
+    ('', None),
+    (None, None),
+    ('soon', None),
+])
+def test_parse_retry_after_seconds(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    assert parse_retry_after(formatdate(time.time() + 30, usegmt=True)) == pytest.approx(30, abs=2)
+    assert parse_retry_after(formatdate(time.time() - 30, usegmt=True)) == 0.0
+
+
+def test_throttling_halves_concurrency_down_to_minimum():
+    limiter = RateLimiter('test', rate=1000, burst=10, max_concurrency=8)
+    for expected in (4, 2, 1, 1):
+        limiter.record_response(429, {'Retry-After': '0'})
+        assert limiter.get_stats()['concurrency_limit'] == expected
+    assert limiter.throttled == 4
+
+
+def test_success_restores_concurrency_additively():
+    limiter = RateLimiter('test', rate=1000, burst=10, max_concurrency=4)
+    limiter.record_throttled(0)
+    limiter.record_throttled(0)
+    assert limiter.get_stats()['concurrency_limit'] == 1
+
+    limiter.record_response(200)
+    assert limiter.get_stats()['concurrency_limit'] == 2
+    limiter.record_response(200)
+    assert limiter.get_stats()['concurrency_limit'] == 2
+    for _ in range(20):
+        limiter.record_success()
+    assert limiter.get_stats()['concurrency_limit'] == 4
+
+    # 5xx 不影响并发数量
+    limiter.record_throttled(0)
+    limiter.record_response(503)
+    assert limiter.get_stats()['concurrency_limit'] == 2
+
+
+def test_retry_after_pauses_acquire():
+    limiter = RateLimiter('test', rate=1000, burst=10)
+    limiter.record_response(429, {'retry-after': '0.2'})
+    assert 0.1 < limiter.retry_after() <= 0.2
+
+    started = time.monotonic()
+    with limiter.slot():
+        pass
+    assert time.monotonic() - started >= 0.18
+    assert limiter.retry_after() == 0.0
+
+
+def test_ratelimit_remaining_zero_blocks_until_reset():
+    limiter = RateLimiter('test', rate=1000, burst=10)
+    limiter.record_response(200, {'RateLimit-Remaining': '0', 'RateLimit-Reset': '5'})
+    assert limiter.server_remaining == 0
+    assert limiter.retry_after() == pytest.approx(5, abs=0.1)
+
+    limiter = RateLimiter('test', rate=1000, burst=10)
+    limiter.record_response(200, {'RateLimit-Remaining': '3'})
+    stats = limiter.get_stats()
+    assert stats['tokens'] <= 3.1
+    assert stats['blocked_for_seconds'] == 0
+
+
+def test_concurrency_limit_blocks_until_release():
+    limiter = RateLimiter('test', rate=1000, burst=10, max_concurrency=1)
+    limiter.acquire()
+    acquired = threading.Event()
+
+    def second():
+        limiter.acquire()
+        acquired.set()
+
+    thread = threading.Thread(target=second)
+    thread.start()
+    assert not acquired.wait(0.15)
+    limiter.release()
+    assert acquired.wait(1)
+    limiter.release()
+    thread.join()
+
+
+def test_background_waits_for_interactive():
+    limiter = RateLimiter('test', rate=1000, burst=10, max_concurrency=1)
+    limiter.acquire(INTERACTIVE)
+    order = []
+
+    def worker(priority):
+        with limiter.slot(priority):
+            order.append(priority)
+
+    background = threading.Thread(target=worker, args=(BACKGROUND,))
+    background.start()
+    time.sleep(0.1)
+    interactive = threading.Thread(target=worker, args=(INTERACTIVE,))
+    interactive.start()
+    time.sleep(0.1)
+    limiter.release()
+    background.join(2)
+    interactive.join(2)
+    assert order == [INTERACTIVE, BACKGROUND]
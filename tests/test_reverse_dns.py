@@ -0,0 +1,115 @@
+"""PTR查询测试（本地UDP桩DNS服务器），通过 PTR_NAMESERVERS 指定带端口的DNS服务器"""
+
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('dns.asyncresolver')
+
+import dns.flags
+import dns.message
+import dns.rcode
+import dns.rdataclass
+import dns.rdatatype
+import dns.rrset
+
+from utils import reverse_dns
+from utils.reverse_dns import _build_resolver, resolve_ptrs, resolve_ptrs_sync
+
+PTR_RECORDS = {
+    '7.113.0.203.in-addr.arpa.': 'ec2-203-0-113-7.compute-1.amazonaws.com.',
+    '8.113.0.203.in-addr.arpa.': 'Droplet-8.DigitalOcean.com.',
+}
+# 桩服务器不回复这些IP的查询，用于测试超时
+SILENT_NAMES = {'9.113.0.203.in-addr.arpa.'}
+
+
+class DnsStubServer:
+    """在 127.0.0.1 的临时端口上应答PTR查询，未知名称返回NXDOMAIN"""
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.settimeout(0.1)
+        self.port = self.sock.getsockname()[1]
+        self.queries = []
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while not self._stopped.is_set():
+            try:
+                data, address = self.sock.recvfrom(4096)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            query = dns.message.from_wire(data)
+            name = query.question[0].name.to_text()
+            self.queries.append(name)
+            if name in SILENT_NAMES:
+                continue
+
+            response = dns.message.make_response(query)
+            response.flags |= dns.flags.AA
+            if name in PTR_RECORDS:
+                response.answer.append(dns.rrset.from_text(
+                    name, 60, dns.rdataclass.IN, dns.rdatatype.PTR, PTR_RECORDS[name]
+                ))
+            else:
+                response.set_rcode(dns.rcode.NXDOMAIN)
+            self.sock.sendto(response.to_wire(), address)
+
+    def close(self):
+        self._stopped.set()
+        self._thread.join()
+        self.sock.close()
+
+
+@pytest.fixture(scope='module')
+def stub():
+    server = DnsStubServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def nameserver(stub, monkeypatch):
+    monkeypatch.setattr(reverse_dns, 'PTR_NAMESERVERS', f'127.0.0.1:{stub.port}')
+    stub.queries.clear()
+    return stub
+
+
+def test_resolves_ptr_through_configured_nameserver(nameserver):
+    result = resolve_ptrs_sync(['203.0.113.7', '203.0.113.8', '203.0.113.7'], timeout=2)
+    assert result == {
+        '203.0.113.7': 'ec2-203-0-113-7.compute-1.amazonaws.com',
+        '203.0.113.8': 'droplet-8.digitalocean.com',
+    }
+    assert sorted(nameserver.queries) == ['7.113.0.203.in-addr.arpa.', '8.113.0.203.in-addr.arpa.']
+
+
+def test_nxdomain_and_timeout_return_none(nameserver):
+    started = time.monotonic()
+    result = asyncio.run(resolve_ptrs(['203.0.113.1', '203.0.113.9'], timeout=0.5))
+    assert result == {'203.0.113.1': None, '203.0.113.9': None}
+    # 两个查询并发进行，总耗时接近单个查询的超时时间
+    assert time.monotonic() - started < 1.5
+    assert '9.113.0.203.in-addr.arpa.' in nameserver.queries
+
+
+def test_nameserver_ports_are_per_server(monkeypatch):
+    monkeypatch.setattr(reverse_dns, 'PTR_NAMESERVERS', '127.0.0.1:5353, [::1]:5354,10.0.0.1,')
+    resolver = _build_resolver()
+
+    if reverse_dns.Do53Nameserver is not None:
+        assert [(ns.address, ns.port) for ns in resolver.nameservers] == [
+            ('127.0.0.1', 5353), ('::1', 5354), ('10.0.0.1', 53)
+        ]
+    else:
+        assert resolver.nameservers == ['127.0.0.1', '::1', '10.0.0.1']
+        assert resolver.nameserver_ports == {'127.0.0.1': 5353, '::1': 5354, '10.0.0.1': 53}
@@ -0,0 +1,211 @@
+"""Vultr 游标分页测试（本地 http.server 桩服务器），同步和原生异步版本结果一致"""
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from providers.vultr_provider import VULTR_PAGE_SIZE, VultrProvider
+from utils.aio import HTTPX_AVAILABLE
+
+INSTANCES = [
+    {
+        'id': f'id-{i}',
+        'label': 'web' if i % 2 == 0 else 'db',
+        'tags': ['prod'] if i < 3 else [],
+        'main_ip': f'203.0.113.{i}',
+        'v6_main_ip': f'2001:db8::{i}',
+        'status': 'active',
+        'power_status': 'running',
+        'region': 'ewr',
+        'plan': 'vc2-1c-1gb',
+    }
+    for i in range(1, 6)
+]
+
+
+class VultrStubHandler(BaseHTTPRequestHandler):
+    """实现 /instances 游标分页和 main_ip、label、tag 过滤，游标为下一页的起始位置，每页数量不超过 max_page_size"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self.server.requests.append((url.path, query))
+
+        if url.path == '/instances':
+            if query.get('cursor', '0').isdigit():
+                self._send(200, self._page(query))
+            else:
+                self._send(400, {'error': 'invalid cursor'})
+        elif url.path.startswith('/instances/'):
+            instance = next((i for i in INSTANCES if i['id'] == url.path.rsplit('/', 1)[1]), None)
+            if instance is None:
+                self._send(404, {'error': 'not found'})
+            else:
+                self._send(200, {'instance': instance})
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def _page(self, query):
+        matched = [
+            instance for instance in INSTANCES
+            if query.get('main_ip', instance['main_ip']) == instance['main_ip']
+            and query.get('label', instance['label']) == instance['label']
+            and ('tag' not in query or query['tag'] in instance['tags'])
+        ]
+        start = int(query.get('cursor', '0'))
+        end = start + min(int(query['per_page']), self.server.max_page_size)
+        next_cursor = str(end) if end < len(matched) else ''
+        return {
+            'instances': matched[start:end],
+            'meta': {'total': len(matched), 'links': {'next': next_cursor, 'prev': ''}}
+        }
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), VultrStubHandler)
+    httpd.daemon_threads = True
+    httpd.requests = []
+    httpd.max_page_size = VULTR_PAGE_SIZE
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def provider(server, monkeypatch):
+    monkeypatch.setenv('VULTR_API_KEY', 'test-key')
+    provider = VultrProvider()
+    provider.base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    server.requests.clear()
+    server.max_page_size = VULTR_PAGE_SIZE
+    return provider
+
+
+MODES = ['sync', pytest.param('async', marks=pytest.mark.skipif(not HTTPX_AVAILABLE, reason='需要httpx'))]
+
+
+def call(provider, mode, method, *args, **kwargs):
+    """以同步或原生异步方式调用提供商方法"""
+    if mode == 'sync':
+        return getattr(provider, method)(*args, **kwargs)
+    return asyncio.run(getattr(provider, f'{method}_async')(*args, **kwargs))
+
+
+def collect(provider, mode, **kwargs):
+    if mode == 'sync':
+        return list(provider.iter_instances(**kwargs))
+
+    async def gather():
+        return [instance async for instance in provider.iter_instances_async(**kwargs)]
+
+    return asyncio.run(gather())
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_iter_instances_follows_cursors(provider, server, mode):
+    instances = collect(provider, mode, per_page=2)
+    assert [instance['id'] for instance in instances] == [instance['id'] for instance in INSTANCES]
+    assert [query.get('cursor') for _, query in server.requests] == [None, '2', '4']
+    assert all(query['per_page'] == '2' for _, query in server.requests)
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_list_instances_returns_pages_and_next_cursor(provider, server, mode):
+    first = call(provider, mode, 'list_instances', page_size=2)
+    assert [instance['id'] for instance in first['instances']] == ['id-1', 'id-2']
+    assert first['next_cursor'] == '2'
+
+    second = call(provider, mode, 'list_instances', cursor=first['next_cursor'], page_size=2)
+    assert [instance['id'] for instance in second['instances']] == ['id-3', 'id-4']
+    last = call(provider, mode, 'list_instances', cursor='4', page_size=2)
+    assert last['total_instances'] == 1
+    assert last['next_cursor'] is None
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_list_instances_without_paging_returns_everything(provider, server, mode):
+    result = call(provider, mode, 'list_instances', name='web', tag='prod')
+    assert 'next_cursor' not in result
+    assert [instance['id'] for instance in result['instances']] == ['id-2']
+    assert server.requests[0][1] == {'label': 'web', 'tag': 'prod', 'per_page': str(VULTR_PAGE_SIZE)}
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_page_size_is_clamped(provider, server, mode):
+    call(provider, mode, 'list_instances', page_size=10000)
+    call(provider, mode, 'list_instances', page_size=-5)
+    assert [query['per_page'] for _, query in server.requests] == [str(VULTR_PAGE_SIZE), '1']
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_invalid_cursor_returns_error(provider, mode):
+    result = call(provider, mode, 'list_instances', cursor='bogus', page_size=2)
+    assert result['provider'] == 'vultr'
+    assert result['error'].startswith('Vultr API调用失败: 400')
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_get_instance_by_ip_filters_on_server(provider, server, mode):
+    result = call(provider, mode, 'get_instance_by_ip', '203.0.113.3')
+    assert result['found'] is True
+    assert result['instance_info']['id'] == 'id-3'
+    assert server.requests[0][1]['main_ip'] == '203.0.113.3'
+
+    missing = call(provider, mode, 'get_instance_by_ip', '198.51.100.1')
+    assert missing['found'] is False
+    assert missing['total_instances_checked'] == 0
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_single_ipv6_lookup_is_not_pushed_down(provider, server, mode):
+    result = call(provider, mode, 'get_instance_by_ip', '2001:db8::2')
+    assert result['found'] is True
+    assert result['instance_info']['id'] == 'id-2'
+    assert 'main_ip' not in server.requests[0][1]
+
+    batch = call(provider, mode, 'get_instances_by_ips', ['2001:db8::2'])
+    assert batch['results']['2001:db8::2']['found'] is True
+    assert all('main_ip' not in query for _, query in server.requests)
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_get_instances_by_ips_stops_paging_when_all_found(provider, server, mode):
+    # 服务端每页只返回2个实例，两个IP都在第一页
+    server.max_page_size = 2
+    result = call(provider, mode, 'get_instances_by_ips', ['203.0.113.1', '2001:db8::2', '203.0.113.1'])
+
+    assert list(result['results']) == ['203.0.113.1', '2001:db8::2']
+    assert result['results']['2001:db8::2']['instance_info']['id'] == 'id-2'
+    assert result['total_instances_checked'] == 2
+    assert len(server.requests) == 1
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_get_instance_by_id(provider, mode):
+    assert call(provider, mode, 'get_instance_by_id', 'id-4')['instance_info']['main_ip'] == '203.0.113.4'
+    missing = call(provider, mode, 'get_instance_by_id', 'id-404')
+    assert missing == {'provider': 'vultr', 'found': False, 'message': '未找到ID为 id-404 的Vultr实例'}
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_unavailable_without_api_key(monkeypatch, mode):
+    monkeypatch.delenv('VULTR_API_KEY', raising=False)
+    result = call(VultrProvider(), mode, 'get_instance_by_ip', '203.0.113.1')
+    assert result == {'error': 'Vultr服务不可用: VULTR_API_KEY环境变量未配置', 'provider': 'vultr'}
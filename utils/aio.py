@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+异步支持模块
+提供在线程池中执行阻塞调用的工具函数、每个提供商独立的有界线程池（执行SDK调用的线程池，
+以及执行多区域查询、并发翻页等子任务的线程池），以及按事件循环复用的异步HTTP客户端
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+# httpx为可选依赖，未安装时原生异步请求退回到线程池中执行同步请求
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+    httpx = None
+
+# 执行其他阻塞调用（IP检测、清单查找等）的线程数量
+BLOCKING_IO_WORKERS = int(os.getenv('BLOCKING_IO_WORKERS', '32'))
+# 每个提供商执行SDK调用的线程数量，可用 <提供商>_MAX_WORKERS 单独设置（例如 ALIBABA_MAX_WORKERS）
+PROVIDER_MAX_WORKERS = int(os.getenv('PROVIDER_MAX_WORKERS', '8'))
+# 每个提供商执行子任务（多区域查询、并发翻页）的线程数量，可用 <提供商>_FANOUT_WORKERS 单独设置
+PROVIDER_FANOUT_WORKERS = int(os.getenv('PROVIDER_FANOUT_WORKERS', '16'))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+# 提供商名称 -> 执行子任务的线程池
+_fanout_executors: Dict[str, 'ProviderExecutor'] = {}
+_fanout_executors_lock = threading.Lock()
+
+# run_blocking 的调用方协程被取消时设置的事件，在线程中执行的调用及其提交的子任务通过上下文变量读取
+_cancel_event: contextvars.ContextVar[Optional[threading.Event]] = contextvars.ContextVar(
+    'blocking_cancel_event', default=None
+)
+
+# (客户端名称, 事件循环) -> 异步HTTP客户端，异步客户端不能跨事件循环使用
+_clients: Dict[Tuple[str, int], Any] = {}
+_clients_lock = threading.Lock()
+
+
+class ProviderExecutor(Executor):
+    """
+    单个提供商的有界线程池
+
+    同一提供商的阻塞调用同时最多占用 max_workers 个线程，超出的调用排队等待，
+    不会占用其他提供商的线程；同时统计排队数量和正在执行的调用数量
+    """
+
+    def __init__(self, name: str, max_workers: int, thread_name_prefix: Optional[str] = None):
+        """
+        Args:
+            name (str): 提供商名称
+            max_workers (int): 最大线程数量
+            thread_name_prefix (str, optional): 线程名前缀，默认为 <提供商>-sdk
+        """
+        self.name = name
+        self.max_workers = max(max_workers, 1)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix=thread_name_prefix or f'{name}-sdk'
+        )
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.peak_queued = 0
+        self.completed = 0
+        # 本线程池的工作线程
+        self._worker_threads = set()
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        with self._lock:
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+        # 在提交方上下文的副本中执行，保留调用优先级等上下文变量
+        context = contextvars.copy_context()
+
+        def run():
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                self._worker_threads.add(threading.get_ident())
+            try:
+                return context.run(fn, *args, **kwargs)
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+
+        future = self._executor.submit(run)
+        future.add_done_callback(self._on_cancelled)
+        return future
+
+    def in_worker_thread(self) -> bool:
+        """
+        当前线程是否为本线程池的工作线程
+
+        在工作线程中向同一线程池提交任务并等待结果，线程全部被占用时会互相等待（死锁），
+        此时调用方应直接在当前线程中执行
+        """
+        return threading.get_ident() in self._worker_threads
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def get_stats(self) -> Dict:
+        """获取线程池统计信息"""
+        return {
+            'max_workers': self.max_workers,
+            'active_workers': self.active,
+            'queue_depth': self.queued,
+            'peak_queue_depth': self.peak_queued,
+            'completed': self.completed
+        }
+
+    def _on_cancelled(self, future: Future) -> None:
+        # 排队中被取消的调用不会执行，需要在这里减少排队数量
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+
+def create_provider_executors(names: Iterable[str]) -> Dict[str, ProviderExecutor]:
+    """
+    为每个提供商创建独立的有界线程池
+
+    Args:
+        names (Iterable[str]): 提供商名称
+
+    Returns:
+        Dict[str, ProviderExecutor]: 提供商名称到线程池的映射
+    """
+    return {
+        name: ProviderExecutor(name, int(os.getenv(f'{name.upper()}_MAX_WORKERS', str(PROVIDER_MAX_WORKERS))))
+        for name in names
+    }
+
+
+def get_fanout_executor(name: str) -> ProviderExecutor:
+    """
+    获取提供商执行子任务（多区域查询、并发翻页）的共享有界线程池
+
+    子任务由正在SDK线程池中执行的调用提交并等待，放在同一个线程池中会在线程全部被占用时互相等待（死锁），
+    因此使用独立的固定大小线程池；所有调用共享，提供商的总并发数量不会随区域数量增长
+
+    Args:
+        name (str): 提供商名称
+
+    Returns:
+        ProviderExecutor: 线程池
+    """
+    with _fanout_executors_lock:
+        executor = _fanout_executors.get(name)
+        if executor is None:
+            executor = ProviderExecutor(
+                name,
+                int(os.getenv(f'{name.upper()}_FANOUT_WORKERS', str(PROVIDER_FANOUT_WORKERS))),
+                thread_name_prefix=f'{name}-fanout'
+            )
+            _fanout_executors[name] = executor
+    return executor
+
+
+def get_blocking_executor() -> ThreadPoolExecutor:
+    """
+    获取执行阻塞调用的全局线程池（首次调用时创建）
+
+    Returns:
+        ThreadPoolExecutor: 线程池
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(BLOCKING_IO_WORKERS, 1), thread_name_prefix='blocking-io'
+                )
+    return _executor
+
+
+async def run_blocking(fn: Callable, *args, executor: Optional[Executor] = None, **kwargs) -> Any:
+    """
+    在线程池中执行阻塞调用，不阻塞事件循环
+
+    调用方协程被取消时设置取消事件（见 get_cancel_event），函数提交的多区域查询等子任务据此提前结束
+
+    Args:
+        fn (Callable): 阻塞函数
+        *args: 位置参数
+        executor (Executor, optional): 线程池，默认为全局线程池
+        **kwargs: 关键字参数
+
+    Returns:
+        Any: 函数返回值
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    cancelled = threading.Event()
+    context.run(_cancel_event.set, cancelled)
+    try:
+        return await loop.run_in_executor(
+            executor or get_blocking_executor(), functools.partial(context.run, fn, *args, **kwargs)
+        )
+    except asyncio.CancelledError:
+        # 已开始执行的阻塞调用无法中断，通知其停止等待并取消尚未开始的子任务
+        cancelled.set()
+        raise
+
+
+def get_cancel_event() -> Optional[threading.Event]:
+    """
+    获取当前阻塞调用的取消事件
+
+    Returns:
+        Optional[threading.Event]: 由 run_blocking 执行时返回调用方被取消时设置的事件，否则为None
+    """
+    return _cancel_event.get()
+
+
+def get_async_client(name: str, **kwargs) -> 'httpx.AsyncClient':
+    """
+    获取当前事件循环中按名称复用的异步HTTP客户端（需要httpx）
+
+    Args:
+        name (str): 客户端名称，同名客户端在同一事件循环中共享连接池
+        **kwargs: 首次创建时传给 httpx.AsyncClient 的参数
+
+    Returns:
+        httpx.AsyncClient: 异步HTTP客户端
+    """
+    if not HTTPX_AVAILABLE:
+        raise RuntimeError('原生异步请求需要安装httpx')
+
+    key = (name, id(asyncio.get_running_loop()))
+    client = _clients.get(key)
+    if client is None or client.is_closed:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(**kwargs)
+                _clients[key] = client
+    return client
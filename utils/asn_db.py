@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+ASN数据库查询模块
+通过内存映射（mmap）读取本地 IP→ASN 数据库文件，按ASN识别云服务提供商
+
+数据库格式与 iptoasn.com 的 ip2asn-v4.tsv / ip2asn-v6.tsv / ip2asn-combined.tsv 一致：
+每行 "起始IP<TAB>结束IP<TAB>ASN<TAB>国家<TAB>描述"，按起始IP升序排列（IPv4在IPv6之前）。
+文件不会被整体读入内存，查询时直接在映射区域上二分查找，启动开销和内存占用与文件大小无关。
+"""
+
+import ipaddress
+import mmap
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+# ASN到云服务提供商的映射
+ASN_PROVIDER_MAP = {
+    16509: 'aws',
+    14618: 'aws',
+    14061: 'digitalocean',
+    20473: 'vultr',
+    37963: 'alibaba',
+    45102: 'alibaba',
+}
+
+# ASN数据库文件路径
+IP2ASN_DB_PATH = os.getenv('IP2ASN_DB_PATH')
+
+
+class ASNDatabase:
+    """基于mmap的 IP→ASN 数据库"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lookups = 0
+        self._file = open(path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件无法映射
+            self._file.close()
+            raise
+        self.size = self._mm.size()
+
+    def lookup_asn(self, ip_address: str) -> Optional[int]:
+        """
+        查询IP地址所属的ASN
+
+        Args:
+            ip_address (str): IP地址
+
+        Returns:
+            Optional[int]: ASN，未收录或未路由时返回None
+        """
+        try:
+            target = self._address_key(ip_address)
+        except ValueError:
+            return None
+
+        self.lookups += 1
+        mm = self._mm
+        lo, hi = 0, self.size
+        best_line = None
+
+        # 在行起始位置上二分查找最后一个起始IP不大于目标地址的行（查找过程只解析起始IP）
+        while lo < hi:
+            mid = (lo + hi) // 2
+            line_start = mm.rfind(b'\n', 0, mid) + 1
+            line_end = mm.find(b'\n', line_start)
+            if line_end == -1:
+                line_end = self.size
+
+            line = mm[line_start:line_end]
+            start = self._parse_start(line)
+            if start is None or start <= target:
+                if start is not None:
+                    best_line = line
+                lo = line_end + 1
+            else:
+                hi = line_start
+
+        if best_line is None:
+            return None
+        record = self._parse_line(best_line)
+        if record is None or record[1] < target or record[2] == 0:
+            return None
+        return record[2]
+
+    def lookup_provider(self, ip_address: str) -> Optional[str]:
+        """
+        查询IP地址所属的云服务提供商
+
+        Args:
+            ip_address (str): IP地址
+
+        Returns:
+            Optional[str]: 提供商名称，ASN不属于已知云厂商时返回None
+        """
+        asn = self.lookup_asn(ip_address)
+        if asn is None:
+            return None
+        return ASN_PROVIDER_MAP.get(asn)
+
+    def close(self) -> None:
+        """关闭内存映射和文件"""
+        self._mm.close()
+        self._file.close()
+
+    @staticmethod
+    def _address_key(ip_address: str) -> Tuple[int, int]:
+        """地址排序键 (IP版本, 整数地址)，保证IPv4排在IPv6之前"""
+        address = ipaddress.ip_address(ip_address.strip())
+        return address.version, int(address)
+
+    @classmethod
+    def _parse_start(cls, line: bytes) -> Optional[Tuple[int, int]]:
+        """解析一行记录的起始IP，无法解析时返回None"""
+        try:
+            return cls._address_key(line[:line.index(b'\t')].decode('ascii'))
+        except (ValueError, UnicodeDecodeError):
+            return None
+
+    @classmethod
+    def _parse_line(cls, line: bytes) -> Optional[Tuple[Tuple[int, int], Tuple[int, int], int]]:
+        """解析一行记录，返回 (起始键, 结束键, ASN)，无法解析时返回None"""
+        fields = line.split(b'\t', 3)
+        if len(fields) < 3:
+            return None
+        try:
+            start = cls._address_key(fields[0].decode('ascii'))
+            end = cls._address_key(fields[1].decode('ascii'))
+            return start, end, int(fields[2])
+        except (ValueError, UnicodeDecodeError):
+            return None
+
+
+_database: Optional[ASNDatabase] = None
+_database_error: Optional[str] = None
+_database_lock = threading.Lock()
+
+
+def get_asn_database() -> Optional[ASNDatabase]:
+    """
+    获取全局ASN数据库（首次调用时映射 IP2ASN_DB_PATH 指定的文件）
+
+    Returns:
+        Optional[ASNDatabase]: 数据库对象，未配置或打开失败时返回None
+    """
+    global _database, _database_error
+    if _database is None and _database_error is None and IP2ASN_DB_PATH:
+        with _database_lock:
+            if _database is None and _database_error is None:
+                try:
+                    _database = ASNDatabase(IP2ASN_DB_PATH)
+                except (OSError, ValueError) as e:
+                    _database_error = f'ASN数据库不可用: {str(e)}'
+    return _database
+
+
+def lookup_asn_provider(ip_address: str) -> Optional[str]:
+    """
+    通过本地ASN数据库识别云服务提供商
+
+    Args:
+        ip_address (str): IP地址
+
+    Returns:
+        Optional[str]: 提供商名称，无法识别时返回None
+    """
+    database = get_asn_database()
+    if database is None:
+        return None
+    return database.lookup_provider(ip_address)
+
+
+def get_asn_database_stats() -> Dict:
+    """获取ASN数据库状态"""
+    database = get_asn_database()
+    return {
+        'enabled': database is not None,
+        'path': IP2ASN_DB_PATH,
+        'size_bytes': database.size if database else 0,
+        'lookups': database.lookups if database else 0,
+        'error': _database_error
+    }
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+缓存工具模块
+提供带容量上限（LRU淘汰）、按条目过期（TTL）、失败结果缓存和SQLite持久化的缓存
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class TTLCache:
+    """LRU + TTL 缓存，可选持久化到SQLite，服务重启后仍然有效"""
+
+    def __init__(
+        self,
+        name: str,
+        max_size: int = 1024,
+        ttl: float = 86400,
+        negative_ttl: float = 300,
+        db_path: Optional[str] = None
+    ):
+        """
+        Args:
+            name (str): 缓存名称，同时作为SQLite表名
+            max_size (int): 最大条目数，超出后淘汰最久未使用的条目
+            ttl (float): 正常结果的过期时间（秒）
+            negative_ttl (float): 失败结果的过期时间（秒）
+            db_path (str, optional): SQLite数据库路径，为空时只在内存中缓存
+        """
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.db_path = db_path
+        self.error = None
+
+        # key -> (value, expires_at, negative)
+        self._entries: "OrderedDict[str, Tuple[Any, float, bool]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if db_path:
+            self._open_db(db_path)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        读取缓存
+
+        Args:
+            key (str): 缓存键
+
+        Returns:
+            Tuple[bool, Any]: (是否命中, 缓存值)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+
+            value, expires_at, negative = entry
+            if expires_at <= time.time():
+                # 读取只访问内存：过期的SQLite记录在下次写入时被覆盖，或在下次加载时清理
+                self._entries.pop(key, None)
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if negative:
+                self.negative_hits += 1
+            return True, value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, negative: bool = False) -> None:
+        """
+        写入缓存
+
+        Args:
+            key (str): 缓存键
+            value (Any): 缓存值（需可JSON序列化）
+            ttl (float, optional): 过期时间（秒），默认按是否失败结果选择 ttl / negative_ttl
+            negative (bool): 是否为失败结果
+        """
+        if ttl is None:
+            ttl = self.negative_ttl if negative else self.ttl
+        expires_at = time.time() + ttl
+
+        with self._lock:
+            self._entries[key] = (value, expires_at, negative)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+            self._persist(key, value, expires_at, negative)
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None, negative: bool = False) -> int:
+        """
+        批量写入，在一个SQLite事务中完成
+
+        值未变化且剩余有效期超过一半的条目只更新LRU顺序，不重复写入
+
+        Args:
+            items (dict): 缓存键到缓存值的映射
+            ttl (float, optional): 过期时间（秒），默认按是否失败结果选择 ttl / negative_ttl
+            negative (bool): 是否为失败结果
+
+        Returns:
+            int: 实际写入的条目数量
+        """
+        if ttl is None:
+            ttl = self.negative_ttl if negative else self.ttl
+        now = time.time()
+        expires_at = now + ttl
+        rows = []
+        evicted = []
+
+        with self._lock:
+            for key, value in items.items():
+                entry = self._entries.get(key)
+                if entry is not None and entry[2] == negative and entry[0] == value and entry[1] - now > ttl / 2:
+                    self._entries.move_to_end(key)
+                    continue
+                self._entries[key] = (value, expires_at, negative)
+                self._entries.move_to_end(key)
+                rows.append((key, value))
+            while len(self._entries) > self.max_size:
+                oldest_key = next(iter(self._entries))
+                self._entries.pop(oldest_key)
+                evicted.append(oldest_key)
+                self.evictions += 1
+            self._persist_many(rows, expires_at, negative, evicted)
+        return len(rows)
+
+    def delete(self, key: str) -> bool:
+        """
+        删除缓存条目
+
+        Args:
+            key (str): 缓存键
+
+        Returns:
+            bool: 条目是否存在
+        """
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            return True
+
+    def clear(self) -> None:
+        """清空缓存（包括持久化数据）"""
+        with self._lock:
+            self._entries.clear()
+            if self._db:
+                try:
+                    self._db.execute(f'DELETE FROM "{self.name}"')
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    self.error = str(e)
+
+    @property
+    def persistent(self) -> bool:
+        """是否持久化到SQLite（写入和删除会执行SQLite事务）"""
+        return self._db is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict:
+        """获取缓存统计信息"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl_seconds': self.ttl,
+            'negative_ttl_seconds': self.negative_ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'negative_hits': self.negative_hits,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'persistent': self.persistent,
+            'db_path': self.db_path,
+            'error': self.error
+        }
+
+    def _remove(self, key: str) -> None:
+        """删除条目（调用方需持有锁）"""
+        self._entries.pop(key, None)
+        if self._db:
+            try:
+                self._db.execute(f'DELETE FROM "{self.name}" WHERE key = ?', (key,))
+                self._db.commit()
+            except sqlite3.Error as e:
+                self.error = str(e)
+
+    def _persist(self, key: str, value: Any, expires_at: float, negative: bool) -> None:
+        """写入SQLite（调用方需持有锁）"""
+        if not self._db:
+            return
+        try:
+            self._db.execute(
+                f'INSERT OR REPLACE INTO "{self.name}" (key, value, expires_at, negative) '
+                'VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value, ensure_ascii=False), expires_at, int(negative))
+            )
+            self._db.commit()
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            self.error = str(e)
+
+    def _persist_many(self, rows, expires_at: float, negative: bool, deleted) -> None:
+        """在一个事务中写入多个条目并删除被淘汰的条目（调用方需持有锁）"""
+        if not self._db or not (rows or deleted):
+            return
+        try:
+            with self._db:
+                self._db.executemany(
+                    f'INSERT OR REPLACE INTO "{self.name}" (key, value, expires_at, negative) '
+                    'VALUES (?, ?, ?, ?)',
+                    [
+                        (key, json.dumps(value, ensure_ascii=False), expires_at, int(negative))
+                        for key, value in rows
+                    ]
+                )
+                self._db.executemany(f'DELETE FROM "{self.name}" WHERE key = ?', [(key,) for key in deleted])
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            self.error = str(e)
+
+    def _open_db(self, db_path: str) -> None:
+        """打开SQLite数据库并加载未过期的条目"""
+        try:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                f'CREATE TABLE IF NOT EXISTS "{self.name}" ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                'expires_at REAL NOT NULL, negative INTEGER NOT NULL DEFAULT 0)'
+            )
+            now = time.time()
+            self._db.execute(f'DELETE FROM "{self.name}" WHERE expires_at <= ?', (now,))
+            self._db.commit()
+
+            # 按过期时间加载，越晚过期越接近最近使用，超出容量的旧条目直接丢弃
+            rows = self._db.execute(
+                f'SELECT key, value, expires_at, negative FROM "{self.name}" '
+                'ORDER BY expires_at DESC LIMIT ?',
+                (self.max_size,)
+            ).fetchall()
+            for key, value, expires_at, negative in reversed(rows):
+                self._entries[key] = (json.loads(value), expires_at, bool(negative))
+        except (sqlite3.Error, OSError, ValueError) as e:
+            self.error = f'缓存持久化不可用: {str(e)}'
+            self._db = None
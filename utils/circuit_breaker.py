@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+熔断器模块
+每个提供商一个熔断器：API连续失败（连接失败、超时、5xx）达到阈值后进入打开状态，
+之后的请求立即失败而不是等待超时；冷却时间结束后进入半开状态，每次只放行一个探测请求，
+探测成功则恢复，失败则重新打开
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+# 熔断器配置
+CIRCUIT_BREAKER_ENABLED = os.getenv('CIRCUIT_BREAKER_ENABLED', 'true').lower() == 'true'
+# 连续失败多少次后打开熔断器
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_BREAKER_FAILURE_THRESHOLD', '5'))
+# 打开后多久（秒）进入半开状态放行探测请求
+CIRCUIT_BREAKER_RESET_TIMEOUT = float(os.getenv('CIRCUIT_BREAKER_RESET_TIMEOUT', '30'))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器打开时请求被拒绝"""
+
+
+class CircuitBreaker:
+    """单个提供商的熔断器（线程安全）"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30):
+        """
+        Args:
+            name (str): 提供商名称
+            failure_threshold (int): 连续失败多少次后打开
+            reset_timeout (float): 打开后多久（秒）放行探测请求
+        """
+        self.name = name
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_timeout = reset_timeout
+
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        # 半开状态下正在进行的探测请求的开始时间，None表示没有探测请求
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+        self.rejected = 0
+        self.times_opened = 0
+        self.last_failure: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def is_open(self) -> bool:
+        """熔断器打开且尚未到放行探测请求的时间（此时请求会被立即拒绝）"""
+        with self._lock:
+            if self._state == OPEN:
+                return time.monotonic() - self._opened_at < self.reset_timeout
+            if self._state == HALF_OPEN:
+                return self._probe_running(time.monotonic())
+            return False
+
+    def before_call(self) -> None:
+        """
+        请求前调用：熔断器关闭时放行；打开时拒绝；半开时只放行一个探测请求
+
+        Raises:
+            CircuitOpenError: 请求被拒绝
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._state == CLOSED:
+                return
+            if self._state == OPEN and now - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN and not self._probe_running(now):
+                self._probe_started = now
+                return
+            self.rejected += 1
+            retry_after = max(self._opened_at + self.reset_timeout - now, 0)
+        raise CircuitOpenError(
+            f'{self.name} API暂时不可用（熔断中：最近连续 {self._consecutive_failures} 次请求失败），'
+            f'约 {retry_after:.0f} 秒后自动重试'
+        )
+
+    def record_success(self) -> None:
+        """记录一次成功的请求（包括4xx等说明API可以正常响应的结果）"""
+        with self._lock:
+            self._consecutive_failures = 0
+            self._probe_started = None
+            self._state = CLOSED
+
+    def record_failure(self) -> None:
+        """记录一次失败的请求（连接失败、超时、5xx）"""
+        with self._lock:
+            now = time.monotonic()
+            self._consecutive_failures += 1
+            self.last_failure = time.time()
+            if self._state == HALF_OPEN or (
+                self._state == CLOSED and self._consecutive_failures >= self.failure_threshold
+            ):
+                self._state = OPEN
+                self._opened_at = now
+                self._probe_started = None
+                self.times_opened += 1
+
+    def get_stats(self) -> Dict:
+        """获取熔断器状态"""
+        with self._lock:
+            retry_after = (
+                max(self._opened_at + self.reset_timeout - time.monotonic(), 0) if self._state == OPEN else 0
+            )
+            return {
+                'state': self._state,
+                'consecutive_failures': self._consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout_seconds': self.reset_timeout,
+                'retry_after_seconds': round(retry_after, 1),
+                'times_opened': self.times_opened,
+                'rejected': self.rejected,
+                'last_failure': datetime.fromtimestamp(self.last_failure).isoformat() if self.last_failure else None
+            }
+
+    def _probe_running(self, now: float) -> bool:
+        # 探测请求超过冷却时间仍未结束时视为丢失，允许新的探测请求
+        return self._probe_started is not None and now - self._probe_started < self.reset_timeout
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str) -> Optional[CircuitBreaker]:
+    """
+    获取提供商的熔断器
+
+    Args:
+        name (str): 提供商名称
+
+    Returns:
+        Optional[CircuitBreaker]: 熔断器，未启用熔断时返回None
+    """
+    if not CIRCUIT_BREAKER_ENABLED:
+        return None
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                name,
+                failure_threshold=CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                reset_timeout=CIRCUIT_BREAKER_RESET_TIMEOUT
+            )
+            _breakers[name] = breaker
+    return breaker
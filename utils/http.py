@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+HTTP请求执行模块
+为直接调用HTTP API的提供商（Vultr、IPInfo）提供统一的请求执行器。
+每个执行器持有一个连接池（同步请求使用 requests.Session，异步请求使用按事件循环复用的httpx客户端），
+所有工具调用复用keep-alive连接，避免每次请求重新建立TCP+TLS连接；
+幂等请求（GET）在连接失败、超时和 429/5xx 响应时按带抖动的指数退避重试，
+可选对冲请求（hedging）：请求耗时超过近期延迟的P95仍未返回时再发送一个相同请求，取先返回的结果。
+非幂等请求（例如电源操作的POST）只发送一次，不重试也不对冲。
+传入熔断器时，连接失败、超时和5xx响应计为失败，熔断器打开后请求立即失败
+"""
+
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.aio import get_async_client, httpx
+from utils.circuit_breaker import CircuitBreaker
+from utils.rate_limit import RateLimiter, limited, limited_async, parse_retry_after
+
+# HTTP/2需要可选依赖h2（pip install httpx[http2]）
+try:
+    import h2  # noqa: F401
+    H2_AVAILABLE = True
+except ImportError:
+    H2_AVAILABLE = False
+
+# 连接超时和读取超时（秒），连接超时较短，避免一个慢连接拖住整个请求
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '10'))
+# 幂等请求失败后的最大重试次数
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '2'))
+# 指数退避的基础等待时间和上限（秒），实际等待时间在 [0, min(上限, 基础 * 2^n)] 中随机选取
+HTTP_RETRY_BASE_DELAY = float(os.getenv('HTTP_RETRY_BASE_DELAY', '0.2'))
+HTTP_RETRY_MAX_DELAY = float(os.getenv('HTTP_RETRY_MAX_DELAY', '5'))
+# 对冲请求：等待超过近期延迟的指定分位数后再发送一个相同请求
+HTTP_HEDGING_ENABLED = os.getenv('HTTP_HEDGING_ENABLED', 'false').lower() == 'true'
+HTTP_HEDGE_PERCENTILE = float(os.getenv('HTTP_HEDGE_PERCENTILE', '95'))
+# 延迟样本少于此数量时不对冲
+HTTP_HEDGE_MIN_SAMPLES = int(os.getenv('HTTP_HEDGE_MIN_SAMPLES', '20'))
+# 每个服务保持的keep-alive连接数量上限
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '20'))
+# 异步客户端空闲连接的保持时间（秒）
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', '30'))
+# 异步客户端使用HTTP/2（需要安装h2），同步请求始终使用HTTP/1.1
+HTTP2_ENABLED = os.getenv('HTTP2_ENABLED', 'false').lower() == 'true'
+
+# 连接池会话的默认请求头：响应使用gzip压缩。
+# 不设置 Connection 头：requests 和 httpx 默认保持连接，且HTTP/2禁止发送 Connection 等逐跳头
+DEFAULT_HEADERS = {
+    'Accept-Encoding': 'gzip, deflate'
+}
+
+# 需要重试的响应状态码
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+# 幂等的HTTP方法
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+# 用于计算分位数的最近延迟样本数量
+_LATENCY_WINDOW = 200
+
+
+class LatencyTracker:
+    """记录最近请求的延迟，计算分位数"""
+
+    def __init__(self, window: int = _LATENCY_WINDOW):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """
+        Args:
+            percent (float): 分位数（0-100）
+
+        Returns:
+            Optional[float]: 延迟（秒），没有样本时返回None
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(int(len(samples) * percent / 100), len(samples) - 1)
+        return samples[index]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class RequestExecutor:
+    """单个HTTP服务的请求执行器，负责超时、重试、对冲和限流"""
+
+    def __init__(self, name: str, hedging: Optional[bool] = None):
+        """
+        Args:
+            name (str): 服务名称（同名的异步客户端共享连接池）
+            hedging (bool, optional): 是否对冲幂等请求，默认由 HTTP_HEDGING_ENABLED 决定
+        """
+        self.name = name
+        self.hedging = HTTP_HEDGING_ENABLED if hedging is None else hedging
+        # 未安装h2时退回HTTP/1.1
+        self.http2 = HTTP2_ENABLED and H2_AVAILABLE
+        self.latency = LatencyTracker()
+        self._session: Optional[requests.Session] = None
+        self._session_lock = threading.Lock()
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        self._hedge_pool_lock = threading.Lock()
+
+        self.requests = 0
+        self.retries = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.failures = 0
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        limiter: Optional[RateLimiter] = None,
+        idempotent: Optional[bool] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        **kwargs
+    ) -> requests.Response:
+        """
+        发送HTTP请求
+
+        Args:
+            method (str): HTTP方法
+            url (str): 请求地址
+            limiter (RateLimiter, optional): 每次发送（包括重试和对冲）前获取令牌的限流器
+            idempotent (bool, optional): 是否可以安全地重复发送，默认按HTTP方法判断（GET等为幂等）
+            breaker (CircuitBreaker, optional): 每次发送前检查、发送后记录结果的熔断器
+            **kwargs: 传给 requests.Session.request 的其他参数（headers、params、json等）
+
+        Returns:
+            requests.Response: 最后一次请求的响应（重试用尽后可能是 429/5xx 响应）
+
+        Raises:
+            requests.RequestException: 重试用尽后仍然连接失败或超时
+            CircuitOpenError: 熔断器打开
+        """
+        method = method.upper()
+        idempotent = method in IDEMPOTENT_METHODS if idempotent is None else idempotent
+        kwargs.setdefault('timeout', (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+        session = self.get_session()
+
+        def send() -> requests.Response:
+            if breaker:
+                breaker.before_call()
+            with limited(limiter):
+                started = time.monotonic()
+                try:
+                    response = session.request(method, url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout):
+                    if breaker:
+                        breaker.record_failure()
+                    raise
+                self._record(response.status_code, time.monotonic() - started, breaker)
+                if limiter:
+                    limiter.record_response(response.status_code, response.headers)
+            return response
+
+        self.requests += 1
+        if not idempotent:
+            return send()
+
+        attempt = 0
+        while True:
+            response = None
+            try:
+                response = self._send_hedged(send) if self.hedging else send()
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= HTTP_MAX_RETRIES:
+                    self.failures += 1
+                    raise
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= HTTP_MAX_RETRIES:
+                    return response
+            time.sleep(self._backoff(attempt, response))
+            attempt += 1
+            self.retries += 1
+
+    async def request_async(
+        self,
+        method: str,
+        url: str,
+        limiter: Optional[RateLimiter] = None,
+        idempotent: Optional[bool] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        **kwargs
+    ) -> 'httpx.Response':
+        """
+        request 的原生异步版本（需要httpx），重试和对冲规则相同
+
+        Raises:
+            httpx.TransportError: 重试用尽后仍然连接失败或超时
+            CircuitOpenError: 熔断器打开
+        """
+        method = method.upper()
+        idempotent = method in IDEMPOTENT_METHODS if idempotent is None else idempotent
+        client = get_async_client(
+            self.name,
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=100,
+                max_keepalive_connections=HTTP_POOL_MAXSIZE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+            ),
+            http2=self.http2,
+            headers=DEFAULT_HEADERS
+        )
+
+        async def send() -> 'httpx.Response':
+            if breaker:
+                breaker.before_call()
+            async with limited_async(limiter):
+                started = time.monotonic()
+                try:
+                    response = await client.request(method, url, **kwargs)
+                except httpx.TransportError:
+                    if breaker:
+                        breaker.record_failure()
+                    raise
+                self._record(response.status_code, time.monotonic() - started, breaker)
+                if limiter:
+                    limiter.record_response(response.status_code, response.headers)
+            return response
+
+        self.requests += 1
+        if not idempotent:
+            return await send()
+
+        attempt = 0
+        while True:
+            response = None
+            try:
+                response = await (self._send_hedged_async(send) if self.hedging else send())
+            except httpx.TransportError:
+                if attempt >= HTTP_MAX_RETRIES:
+                    self.failures += 1
+                    raise
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= HTTP_MAX_RETRIES:
+                    return response
+            await asyncio.sleep(self._backoff(attempt, response))
+            attempt += 1
+            self.retries += 1
+
+    def get_session(self) -> requests.Session:
+        """获取执行器的连接池会话（首次调用时创建），所有线程共享"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    # 重试由执行器负责，连接池本身不重试
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=0)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    session.headers.update(DEFAULT_HEADERS)
+                    self._session = session
+        return self._session
+
+    def hedge_delay(self) -> Optional[float]:
+        """发送对冲请求前的等待时间（近期延迟的分位数），样本不足时返回None"""
+        if len(self.latency) < HTTP_HEDGE_MIN_SAMPLES:
+            return None
+        return self.latency.percentile(HTTP_HEDGE_PERCENTILE)
+
+    def get_stats(self) -> Dict:
+        """获取请求执行器统计信息"""
+        p50 = self.latency.percentile(50)
+        p95 = self.latency.percentile(95)
+        return {
+            'requests': self.requests,
+            'retries': self.retries,
+            'failures': self.failures,
+            'hedging_enabled': self.hedging,
+            'hedged': self.hedged,
+            'hedge_wins': self.hedge_wins,
+            'latency_p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'latency_p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+            'pool_maxsize': HTTP_POOL_MAXSIZE,
+            'connections_opened': self._connections_opened(),
+            'http2': self.http2
+        }
+
+    def _connections_opened(self) -> int:
+        """同步连接池累计建立的连接数量（远小于请求数量说明连接被复用）"""
+        if self._session is None:
+            return 0
+        pools = self._session.get_adapter('https://').poolmanager.pools
+        opened = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+        return opened
+
+    def _record(self, status_code: int, seconds: float, breaker: Optional[CircuitBreaker] = None) -> None:
+        # 只用正常响应的延迟计算对冲等待时间
+        if status_code < 500 and status_code != 429:
+            self.latency.record(seconds)
+        # 429说明服务本身可用，只有5xx计为熔断失败
+        if breaker:
+            if status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+
+    def _backoff(self, attempt: int, response=None) -> float:
+        """带完全抖动的指数退避等待时间，429响应至少等待 Retry-After"""
+        delay = random.uniform(0, min(HTTP_RETRY_MAX_DELAY, HTTP_RETRY_BASE_DELAY * (2 ** attempt)))
+        if response is not None and response.status_code == 429:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, HTTP_RETRY_MAX_DELAY))
+        return delay
+
+    def _get_hedge_pool(self) -> ThreadPoolExecutor:
+        if self._hedge_pool is None:
+            with self._hedge_pool_lock:
+                if self._hedge_pool is None:
+                    self._hedge_pool = ThreadPoolExecutor(
+                        max_workers=16, thread_name_prefix=f'{self.name}-hedge'
+                    )
+        return self._hedge_pool
+
+    def _send_hedged(self, send: Callable[[], requests.Response]) -> requests.Response:
+        """发送请求，超过对冲等待时间仍未返回时再发送一个相同请求，返回先成功的响应"""
+        delay = self.hedge_delay()
+        if delay is None:
+            return send()
+
+        pool = self._get_hedge_pool()
+        primary = pool.submit(contextvars.copy_context().run, send)
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeoutError:
+            pass
+
+        self.hedged += 1
+        hedge = pool.submit(contextvars.copy_context().run, send)
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                if future is hedge:
+                    self.hedge_wins += 1
+                # 另一个请求无法中断，其响应会被丢弃
+                return future.result()
+        raise error
+
+    async def _send_hedged_async(self, send: Callable[[], Awaitable]) -> 'httpx.Response':
+        """
+        _send_hedged 的异步版本，先返回的响应胜出后取消另一个请求；
+        调用方被取消时同样取消并等待所有未完成的请求
+        """
+        delay = self.hedge_delay()
+        if delay is None:
+            return await send()
+
+        primary = asyncio.ensure_future(send())
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return primary.result()
+
+            self.hedged += 1
+            hedge = asyncio.ensure_future(send())
+            tasks.append(hedge)
+            pending = {primary, hedge}
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if task is hedge:
+                        self.hedge_wins += 1
+                    return task.result()
+            raise error
+        finally:
+            outstanding = [task for task in tasks if not task.done()]
+            for task in outstanding:
+                task.cancel()
+            if outstanding:
+                await asyncio.gather(*outstanding, return_exceptions=True)
+
+
+_executors: Dict[str, RequestExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_request_executor(name: str) -> RequestExecutor:
+    """
+    获取按名称共享的请求执行器
+
+    Args:
+        name (str): 服务名称，例如 'vultr'、'ipinfo'
+
+    Returns:
+        RequestExecutor: 请求执行器
+    """
+    with _executors_lock:
+        executor = _executors.get(name)
+        if executor is None:
+            executor = RequestExecutor(name)
+            _executors[name] = executor
+    return executor
+
+
+def get_request_executor_stats() -> Dict[str, Dict]:
+    """获取所有请求执行器的统计信息"""
+    return {name: executor.get_stats() for name, executor in list(_executors.items())}
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+实例清单缓存模块
+在内存中保存所有提供商的标准化实例记录，按公网IP、私网IP、实例ID和名称建立哈希索引
+（私网IP可能在多个账号/VPC中重复使用，每个私网IP对应一个记录列表），
+并在后台按固定间隔刷新，使按IP/ID的查询无需访问云厂商API
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from utils.ip_detection import learn_ip_providers
+from utils.rate_limit import background_priority
+
+# 清单缓存配置
+INVENTORY_CACHE_ENABLED = os.getenv('INVENTORY_CACHE_ENABLED', 'false').lower() == 'true'
+INVENTORY_REFRESH_INTERVAL = float(os.getenv('INVENTORY_REFRESH_INTERVAL', '300'))
+# 服务启动时在后台预热（并发拉取所有提供商的清单），开启后自动启用清单缓存
+INVENTORY_WARMUP = os.getenv('INVENTORY_WARMUP', 'false').lower() == 'true'
+# 查询时等待进行中的清单拉取的最长时间（秒）
+INVENTORY_WAIT_TIMEOUT = float(os.getenv('INVENTORY_WAIT_TIMEOUT', '30'))
+
+
+class InventoryCache:
+    """跨提供商的实例清单内存缓存"""
+
+    def __init__(
+        self,
+        providers: Dict,
+        refresh_interval: float = 300,
+        enabled: bool = True,
+        wait_timeout: float = 30,
+        executors: Optional[Dict[str, Executor]] = None
+    ):
+        """
+        Args:
+            providers (dict): 提供商名称到提供商对象的映射，提供商需实现 list_inventory_records()
+            refresh_interval (float): 后台刷新间隔（秒）
+            enabled (bool): 是否启用
+            wait_timeout (float): 查询时等待进行中的清单拉取的最长时间（秒）
+            executors (dict, optional): 提供商名称到线程池的映射，清单拉取在对应提供商的线程池中执行
+        """
+        self.providers = providers
+        self.refresh_interval = refresh_interval
+        self.enabled = enabled
+        self.wait_timeout = wait_timeout
+        self.executors = executors or {}
+        # 超过此时间未成功刷新的清单不再用于查询
+        self.max_age = refresh_interval * 3
+
+        # 提供商名称 -> 清单快照，刷新时整体替换，读取无需加锁
+        self._snapshots: Dict[str, Dict] = {}
+        self._errors: Dict[str, str] = {}
+        # 进行中的清单拉取，同一提供商同时只有一个拉取，其他调用方等待同一个Future
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(len(providers), 1), thread_name_prefix='inventory'
+        )
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._warm_up_started: Optional[float] = None
+        self._warm_up_duration: Optional[float] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.inflight_waits = 0
+
+    def refresh(self, provider_name: str) -> bool:
+        """
+        刷新单个提供商的清单，已有进行中的拉取时等待其完成而不是重复拉取
+
+        Args:
+            provider_name (str): 提供商名称
+
+        Returns:
+            bool: 是否刷新成功
+        """
+        return self.refresh_async(provider_name).result()
+
+    def refresh_async(self, provider_name: str) -> Future:
+        """
+        在后台刷新单个提供商的清单
+
+        Args:
+            provider_name (str): 提供商名称
+
+        Returns:
+            Future: 刷新任务，结果为是否刷新成功；已有进行中的拉取时返回同一个Future
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(provider_name)
+            if future is None:
+                future = self._executor.submit(self._fetch, provider_name)
+                self._inflight[provider_name] = future
+                future.add_done_callback(lambda f: self._clear_inflight(provider_name, f))
+            return future
+
+    def refresh_all(self) -> Dict[str, bool]:
+        """
+        并发刷新所有可用提供商的清单
+
+        Returns:
+            Dict[str, bool]: 各提供商是否刷新成功
+        """
+        futures = {
+            name: self.refresh_async(name)
+            for name, p in self.providers.items() if getattr(p, 'available', False)
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+    def warm_up(self) -> None:
+        """
+        预热：立即在后台并发拉取所有可用提供商的清单，不阻塞调用方
+
+        预热完成前到达的查询会等待进行中的拉取，而不是重复请求云厂商API
+        """
+        self.enabled = True
+        self._warm_up_started = time.time()
+        futures = [
+            self.refresh_async(name)
+            for name, p in self.providers.items() if getattr(p, 'available', False)
+        ]
+
+        def on_done(_):
+            if all(f.done() for f in futures) and self._warm_up_duration is None:
+                self._warm_up_duration = time.time() - self._warm_up_started
+
+        for future in futures:
+            future.add_done_callback(on_done)
+        if not futures:
+            self._warm_up_duration = 0.0
+
+    def lookup_ip(
+        self, ip_address: str, provider_name: Optional[str] = None, allow_stale: bool = False
+    ) -> Optional[Dict]:
+        """
+        按IP地址（公网IPv4/IPv6或私网IP）查找实例
+
+        Args:
+            ip_address (str): IP地址
+            provider_name (str, optional): 只在此提供商的清单中查找
+            allow_stale (bool): 是否使用已过期的清单（提供商API不可用时）
+
+        Returns:
+            Optional[Dict]: 实例记录，未找到或私网IP匹配到多个实例时返回None
+        """
+        records = self.lookup_ip_all(ip_address, provider_name, allow_stale)
+        # 私网IP匹配到多个实例时无法确定是哪一个，交由调用方按其他方式查询
+        return records[0] if len(records) == 1 else None
+
+    def lookup_ip_all(
+        self, ip_address: str, provider_name: Optional[str] = None, allow_stale: bool = False
+    ) -> List[Dict]:
+        """
+        按IP地址查找所有匹配的实例：公网IP最多匹配一个实例，私网IP可能匹配多个账号/VPC中的实例
+
+        Args:
+            ip_address (str): IP地址
+            provider_name (str, optional): 只在此提供商的清单中查找
+            allow_stale (bool): 是否使用已过期的清单（提供商API不可用时）
+
+        Returns:
+            List[Dict]: 实例记录列表
+        """
+        snapshots = list(self._all_snapshots(provider_name) if allow_stale else self._fresh_snapshots(provider_name))
+        for _, snapshot in snapshots:
+            record = snapshot['by_ip'].get(ip_address)
+            if record is not None:
+                self.hits += 1
+                return [record]
+
+        records = []
+        for _, snapshot in snapshots:
+            records.extend(snapshot['by_private_ip'].get(ip_address, []))
+        if records:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return records
+
+    def lookup_id(
+        self, instance_id: str, provider_name: Optional[str] = None, allow_stale: bool = False
+    ) -> Optional[Dict]:
+        """
+        按实例ID查找实例
+
+        Args:
+            instance_id (str): 实例ID
+            provider_name (str, optional): 只在此提供商的清单中查找
+            allow_stale (bool): 是否使用已过期的清单（提供商API不可用时）
+
+        Returns:
+            Optional[Dict]: 实例记录，未找到时返回None
+        """
+        return self._lookup('by_id', str(instance_id), provider_name, allow_stale)
+
+    def lookup_name(self, name: str, provider_name: Optional[str] = None) -> List[Dict]:
+        """
+        按实例名称查找实例（名称可能重复）
+
+        Args:
+            name (str): 实例名称
+            provider_name (str, optional): 只在此提供商的清单中查找
+
+        Returns:
+            List[Dict]: 实例记录列表
+        """
+        records = []
+        for _, snapshot in self._fresh_snapshots(provider_name):
+            records.extend(snapshot['by_name'].get(name, []))
+        if records:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return records
+
+    def to_lookup_result(self, record: Dict) -> Dict:
+        """
+        将实例记录转换为与提供商查询方法一致的返回格式
+
+        Args:
+            record (dict): 实例记录
+
+        Returns:
+            Dict: 查询结果
+        """
+        provider_name = record['provider']
+        info_key = 'droplet_info' if provider_name == 'digitalocean' else 'instance_info'
+        snapshot = self._snapshots.get(provider_name, {})
+        return {
+            'provider': provider_name,
+            'found': True,
+            info_key: dict(record['instance_info']),
+            'source': 'inventory_cache',
+            'inventory_age_seconds': round(time.time() - snapshot.get('refreshed_at', time.time()), 1)
+        }
+
+    def start(self, run_immediately: bool = True) -> None:
+        """
+        启动后台刷新线程
+
+        Args:
+            run_immediately (bool): 是否立即进行第一次刷新（已预热时可等待一个刷新间隔）
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._refresh_loop, args=(run_immediately,), name='inventory-refresh', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止后台刷新线程"""
+        self._stop_event.set()
+
+    def get_stats(self) -> Dict:
+        """获取清单缓存统计信息"""
+        now = time.time()
+        providers = {}
+        for name in self.providers:
+            snapshot = self._snapshots.get(name)
+            providers[name] = {
+                'instances': len(snapshot['records']) if snapshot else 0,
+                'refreshed_at': datetime.fromtimestamp(snapshot['refreshed_at']).isoformat() if snapshot else None,
+                'age_seconds': round(now - snapshot['refreshed_at'], 1) if snapshot else None,
+                'refresh_duration_ms': snapshot['refresh_duration_ms'] if snapshot else None,
+                'refreshing': name in self._inflight,
+                'error': self._errors.get(name)
+            }
+        return {
+            'enabled': self.enabled,
+            'background_refresh_running': bool(self._thread and self._thread.is_alive()),
+            'refresh_interval_seconds': self.refresh_interval,
+            'total_instances': sum(p['instances'] for p in providers.values()),
+            'hits': self.hits,
+            'misses': self.misses,
+            'inflight_waits': self.inflight_waits,
+            'warm_up': {
+                'started': self._warm_up_started is not None,
+                'completed': self._warm_up_duration is not None,
+                'duration_ms': round(self._warm_up_duration * 1000, 1) if self._warm_up_duration is not None else None
+            },
+            'providers': providers
+        }
+
+    def _lookup(
+        self, index: str, key: str, provider_name: Optional[str], allow_stale: bool = False
+    ) -> Optional[Dict]:
+        snapshots = self._all_snapshots(provider_name) if allow_stale else self._fresh_snapshots(provider_name)
+        for _, snapshot in snapshots:
+            record = snapshot[index].get(key)
+            if record is not None:
+                self.hits += 1
+                return record
+        self.misses += 1
+        return None
+
+    def _fresh_snapshots(self, provider_name: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """遍历未过期的清单快照，快照缺失或过期但有进行中的拉取时等待其完成"""
+        if not self.enabled:
+            return
+        names = [provider_name] if provider_name else list(self.providers)
+        for name in names:
+            snapshot = self._snapshots.get(name)
+            if not self._is_fresh(snapshot):
+                future = self._inflight.get(name)
+                if future is not None:
+                    self.inflight_waits += 1
+                    try:
+                        future.result(timeout=self.wait_timeout)
+                    except Exception:
+                        pass
+                    snapshot = self._snapshots.get(name)
+            if self._is_fresh(snapshot):
+                yield name, snapshot
+
+    def _all_snapshots(self, provider_name: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """遍历所有清单快照（包括已过期的），不等待进行中的拉取"""
+        if not self.enabled:
+            return
+        names = [provider_name] if provider_name else list(self.providers)
+        for name in names:
+            snapshot = self._snapshots.get(name)
+            if snapshot:
+                yield name, snapshot
+
+    def _is_fresh(self, snapshot: Optional[Dict]) -> bool:
+        return bool(snapshot) and time.time() - snapshot['refreshed_at'] <= self.max_age
+
+    def _fetch(self, provider_name: str) -> bool:
+        """拉取提供商清单并替换快照"""
+        provider = self.providers[provider_name]
+        if not getattr(provider, 'available', False):
+            return False
+
+        started = time.time()
+        try:
+            # 清单拉取是后台任务，API限流时让交互式查询优先
+            with background_priority():
+                executor = self.executors.get(provider_name)
+                if executor is not None:
+                    records = executor.submit(provider.list_inventory_records).result()
+                else:
+                    records = provider.list_inventory_records()
+        except Exception as e:
+            self._errors[provider_name] = str(e)
+            return False
+
+        self._snapshots[provider_name] = self._build_snapshot(records, started)
+        self._errors.pop(provider_name, None)
+
+        # 一次批量写入，归属未变化的IP不重复写入
+        learn_ip_providers({
+            ip: provider_name for record in records for ip in record['public_ipv4'] + record['public_ipv6']
+        })
+        return True
+
+    def _clear_inflight(self, provider_name: str, future: Future) -> None:
+        with self._inflight_lock:
+            if self._inflight.get(provider_name) is future:
+                del self._inflight[provider_name]
+
+    def _refresh_loop(self, run_immediately: bool) -> None:
+        if not run_immediately and self._stop_event.wait(self.refresh_interval):
+            return
+        while not self._stop_event.is_set():
+            self.refresh_all()
+            self._stop_event.wait(self.refresh_interval)
+
+    @staticmethod
+    def _build_snapshot(records: List[Dict], started: float) -> Dict:
+        """构建清单快照和索引"""
+        by_ip: Dict[str, Dict] = {}
+        by_private_ip: Dict[str, List[Dict]] = {}
+        by_id: Dict[str, Dict] = {}
+        by_name: Dict[str, List[Dict]] = {}
+
+        for record in records:
+            # 公网IP全局唯一；私网IP可能在多个VPC中重复，保留所有实例
+            for ip in record['public_ipv4'] + record['public_ipv6']:
+                by_ip[ip] = record
+            for ip in record['private_ips']:
+                by_private_ip.setdefault(ip, []).append(record)
+            by_id[str(record['instance_id'])] = record
+            if record.get('name'):
+                by_name.setdefault(record['name'], []).append(record)
+
+        return {
+            'records': records,
+            'by_ip': by_ip,
+            'by_private_ip': by_private_ip,
+            'by_id': by_id,
+            'by_name': by_name,
+            'refreshed_at': time.time(),
+            'refresh_duration_ms': round((time.time() - started) * 1000, 1)
+        }
@@ -5,12 +5,128 @@ IP地址检测工具模块
 """
 
 import os
-import requests
-from typing import Dict, Optional
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.aio import HTTPX_AVAILABLE, run_blocking
+from utils.asn_db import lookup_asn_provider
+from utils.cache import TTLCache
+from utils.http import HTTP_CONNECT_TIMEOUT, get_request_executor
+from utils.ip_ranges import NUMPY_AVAILABLE, get_ip_range_index, lookup_ip_range
+from utils.reverse_dns import PTR_DETECTION_ENABLED, resolve_ptrs, resolve_ptrs_sync
+
+if NUMPY_AVAILABLE:
+    import numpy as np
+
+# IPInfo查询结果缓存配置
+IPINFO_CACHE_SIZE = int(os.getenv('IPINFO_CACHE_SIZE', '1024'))
+IPINFO_CACHE_TTL = float(os.getenv('IPINFO_CACHE_TTL', '86400'))
+IPINFO_CACHE_NEGATIVE_TTL = float(os.getenv('IPINFO_CACHE_NEGATIVE_TTL', '300'))
+IPINFO_CACHE_PATH = os.path.expanduser(
+    os.getenv('IPINFO_CACHE_PATH', '~/.cache/multi-cloud-manager/cache.sqlite3')
+)
+
+# 从提供商查询结果中学习到的IP归属配置
+LEARNED_PROVIDER_CACHE_SIZE = int(os.getenv('LEARNED_PROVIDER_CACHE_SIZE', '4096'))
+LEARNED_PROVIDER_TTL = float(os.getenv('LEARNED_PROVIDER_TTL', '604800'))
+
+# IPInfo批量查询配置（每批IP数量上限为1000）
+IPINFO_BATCH_SIZE = min(int(os.getenv('IPINFO_BATCH_SIZE', '100')), 1000)
+IPINFO_BATCH_CONCURRENCY = int(os.getenv('IPINFO_BATCH_CONCURRENCY', '4'))
+
+# IPInfo请求执行器（超时、重试和对冲）
+ipinfo_http = get_request_executor('ipinfo')
+
+isp_cache = TTLCache(
+    'ipinfo',
+    max_size=IPINFO_CACHE_SIZE,
+    ttl=IPINFO_CACHE_TTL,
+    negative_ttl=IPINFO_CACHE_NEGATIVE_TTL,
+    db_path=IPINFO_CACHE_PATH or None
+)
+
+# 已确认的IP归属（由提供商查询成功的结果和实例列表写入）
+learned_providers = TTLCache(
+    'learned_providers',
+    max_size=LEARNED_PROVIDER_CACHE_SIZE,
+    ttl=LEARNED_PROVIDER_TTL,
+    db_path=IPINFO_CACHE_PATH or None
+)
+
+def learn_ip_provider(ip_address: str, provider: str) -> None:
+    """
+    记录已确认的IP归属
+    
+    Args:
+        ip_address (str): IP地址
+        provider (str): 提供商名称
+    """
+    if ip_address:
+        learned_providers.set(ip_address, provider)
+
+def learn_ip_providers(ip_providers: Dict[str, str]) -> int:
+    """
+    批量记录已确认的IP归属（实例清单刷新时使用），在一个事务中写入，归属未变化的IP不重复写入
+    
+    Args:
+        ip_providers (dict): IP地址到提供商名称的映射
+        
+    Returns:
+        int: 实际写入的记录数量
+    """
+    return learned_providers.set_many({ip: provider for ip, provider in ip_providers.items() if ip})
+
+def forget_ip_provider(ip_address: str, provider: Optional[str] = None) -> bool:
+    """
+    删除已确认的IP归属
+    
+    Args:
+        ip_address (str): IP地址
+        provider (str, optional): 仅当记录的提供商与此一致时才删除
+        
+    Returns:
+        bool: 是否删除了记录
+    """
+    if provider is not None:
+        hit, learned = learned_providers.get(ip_address)
+        if not hit or learned != provider:
+            return False
+    return learned_providers.delete(ip_address)
+
+async def learn_ip_providers_async(ip_providers: Dict[str, str]) -> int:
+    """learn_ip_providers 的异步版本，SQLite写入在线程池中执行"""
+    return await _write_cache_async(learned_providers, learn_ip_providers, ip_providers)
+
+async def forget_ip_provider_async(ip_address: str, provider: Optional[str] = None) -> bool:
+    """forget_ip_provider 的异步版本，SQLite删除在线程池中执行"""
+    return await _write_cache_async(learned_providers, forget_ip_provider, ip_address, provider)
+
+async def _write_cache_async(cache: TTLCache, fn: Callable, *args, **kwargs) -> Any:
+    """
+    写入缓存：持久化缓存的写入包含SQLite事务提交，在线程池中执行以免阻塞事件循环，
+    只在内存中缓存时直接写入
+    """
+    if cache.persistent:
+        return await run_blocking(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
+
+def lookup_learned_provider(ip_address: str) -> Optional[str]:
+    """
+    查询已确认的IP归属
+    
+    Args:
+        ip_address (str): IP地址
+        
+    Returns:
+        Optional[str]: 提供商名称，没有记录时返回None
+    """
+    hit, provider = learned_providers.get(ip_address)
+    return provider if hit else None
 
 def get_isp_by_ip(ip_address: str, ipinfo_token: Optional[str] = None) -> Dict[str, str]:
     """
-    根据IP地址获取ISP信息
+    根据IP地址获取ISP信息（结果会被缓存，查询失败的结果以较短的有效期缓存）
     
     Args:
         ip_address (str): 要查询的IP地址
@@ -19,35 +135,112 @@ def get_isp_by_ip(ip_address: str, ipinfo_token: Optional[str] = None) -> Dict[s
     Returns:
         Dict[str, str]: 包含ISP信息的字典
     """
+    hit, cached = isp_cache.get(ip_address)
+    if hit:
+        return dict(cached)
+    
+    isp_info = _query_ipinfo(ip_address, ipinfo_token)
+    if isp_info is None:
+        isp_info = {'org': 'Unknown', 'hostname': ''}
+        isp_cache.set(ip_address, isp_info, negative=True)
+    else:
+        isp_cache.set(ip_address, isp_info)
+    
+    return dict(isp_info)
+
+def _query_ipinfo(ip_address: str, ipinfo_token: Optional[str] = None) -> Optional[Dict[str, str]]:
+    """
+    调用IPInfo API查询IP信息
+    
+    Args:
+        ip_address (str): 要查询的IP地址
+        ipinfo_token (str, optional): IPInfo API令牌
+        
+    Returns:
+        Optional[Dict[str, str]]: ISP信息，查询失败时返回None
+    """
     try:
         # 使用IPInfo API查询
-        if ipinfo_token:
-            headers = {'Authorization': f'Bearer {ipinfo_token}'}
-            response = requests.get(f'https://ipinfo.io/{ip_address}', headers=headers, timeout=10)
-        else:
-            response = requests.get(f'https://ipinfo.io/{ip_address}', timeout=10)
+        headers = {'Authorization': f'Bearer {ipinfo_token}'} if ipinfo_token else None
+        response = ipinfo_http.request('GET', f'https://ipinfo.io/{ip_address}', headers=headers)
         
         if response.status_code == 200:
             data = response.json()
-            return {
-                'org': data.get('org', ''),
-                'hostname': data.get('hostname', ''),
-                'country': data.get('country', ''),
-                'region': data.get('region', ''),
-                'city': data.get('city', ''),
-                'loc': data.get('loc', ''),
-                'postal': data.get('postal', ''),
-                'timezone': data.get('timezone', '')
-            }
+            return _format_isp_info(data)
     except Exception as e:
         print(f"查询IP信息时发生错误: {str(e)}")
     
-    return {'org': 'Unknown', 'hostname': ''}
+    return None
+
+async def get_isp_by_ip_async(ip_address: str, ipinfo_token: Optional[str] = None) -> Dict[str, str]:
+    """
+    get_isp_by_ip 的异步版本，与同步版本共享缓存
+    
+    Args:
+        ip_address (str): 要查询的IP地址
+        ipinfo_token (str, optional): IPInfo API令牌
+        
+    Returns:
+        Dict[str, str]: 包含ISP信息的字典
+    """
+    hit, cached = isp_cache.get(ip_address)
+    if hit:
+        return dict(cached)
+    
+    isp_info = await _query_ipinfo_async(ip_address, ipinfo_token)
+    if isp_info is None:
+        isp_info = {'org': 'Unknown', 'hostname': ''}
+        await _write_cache_async(isp_cache, isp_cache.set, ip_address, isp_info, negative=True)
+    else:
+        await _write_cache_async(isp_cache, isp_cache.set, ip_address, isp_info)
+    
+    return dict(isp_info)
+
+async def _query_ipinfo_async(ip_address: str, ipinfo_token: Optional[str] = None) -> Optional[Dict[str, str]]:
+    """
+    _query_ipinfo 的异步版本，使用httpx发起请求（未安装httpx时在线程池中执行同步请求）
+    
+    Args:
+        ip_address (str): 要查询的IP地址
+        ipinfo_token (str, optional): IPInfo API令牌
+        
+    Returns:
+        Optional[Dict[str, str]]: ISP信息，查询失败时返回None
+    """
+    if not HTTPX_AVAILABLE:
+        return await run_blocking(_query_ipinfo, ip_address, ipinfo_token)
+    
+    try:
+        headers = {'Authorization': f'Bearer {ipinfo_token}'} if ipinfo_token else None
+        response = await ipinfo_http.request_async('GET', f'https://ipinfo.io/{ip_address}', headers=headers)
+        
+        if response.status_code == 200:
+            return _format_isp_info(response.json())
+    except Exception as e:
+        print(f"查询IP信息时发生错误: {str(e)}")
+    
+    return None
+
+def _format_isp_info(data: Dict) -> Dict[str, str]:
+    """格式化IPInfo返回的数据"""
+    return {
+        'org': data.get('org', ''),
+        'hostname': data.get('hostname', ''),
+        'country': data.get('country', ''),
+        'region': data.get('region', ''),
+        'city': data.get('city', ''),
+        'loc': data.get('loc', ''),
+        'postal': data.get('postal', ''),
+        'timezone': data.get('timezone', '')
+    }
 
 def detect_cloud_provider(ip_address: str, ipinfo_token: Optional[str] = None) -> str:
     """
     检测IP地址属于哪个云服务提供商
     
+    依次使用已确认的IP归属、本地IP段索引、本地ASN数据库（均无网络请求），
+    都无法识别时查询PTR记录（需开启 PTR_DETECTION_ENABLED），最后再查询IPInfo
+    
     Args:
         ip_address (str): 要检测的IP地址
         ipinfo_token (str, optional): IPInfo API令牌
@@ -55,7 +248,243 @@ def detect_cloud_provider(ip_address: str, ipinfo_token: Optional[str] = None) -
     Returns:
         str: 云服务提供商名称 ('aws', 'digitalocean', 'vultr', 'alibaba', 'unknown')
     """
+    provider = (
+        lookup_learned_provider(ip_address)
+        or lookup_ip_range(ip_address)
+        or lookup_asn_provider(ip_address)
+    )
+    if provider:
+        return provider
+    
+    if PTR_DETECTION_ENABLED:
+        provider = classify_hostname(resolve_ptrs_sync([ip_address]).get(ip_address))
+        if provider:
+            return provider
+    
     isp_info = get_isp_by_ip(ip_address, ipinfo_token)
+    return classify_isp_info(isp_info)
+
+async def detect_cloud_provider_async(ip_address: str, ipinfo_token: Optional[str] = None) -> str:
+    """
+    detect_cloud_provider 的异步版本
+    
+    本地识别（已确认的IP归属、IP段索引、ASN数据库）直接进行，PTR查询和IPInfo查询不阻塞事件循环
+    
+    Args:
+        ip_address (str): 要检测的IP地址
+        ipinfo_token (str, optional): IPInfo API令牌
+        
+    Returns:
+        str: 云服务提供商名称 ('aws', 'digitalocean', 'vultr', 'alibaba', 'unknown')
+    """
+    provider = (
+        lookup_learned_provider(ip_address)
+        or lookup_ip_range(ip_address)
+        or lookup_asn_provider(ip_address)
+    )
+    if provider:
+        return provider
+    
+    if PTR_DETECTION_ENABLED:
+        hostnames = await resolve_ptrs([ip_address])
+        provider = classify_hostname(hostnames.get(ip_address))
+        if provider:
+            return provider
+    
+    isp_info = await get_isp_by_ip_async(ip_address, ipinfo_token)
+    return classify_isp_info(isp_info)
+
+def detect_cloud_providers(ip_addresses: List[str], ipinfo_token: Optional[str] = None) -> Dict[str, str]:
+    """
+    批量检测IP地址属于哪个云服务提供商
+    
+    输入会先去重，已确认的IP归属、本地IP段索引、ASN数据库和缓存能识别的直接返回，
+    开启PTR检测时并发查询其余IP的PTR记录，仍无法识别的IP按批次并发发送到IPInfo批量查询接口
+    
+    Args:
+        ip_addresses (List[str]): 要检测的IP地址列表
+        ipinfo_token (str, optional): IPInfo API令牌（批量接口需要令牌，未配置时逐个查询）
+        
+    Returns:
+        Dict[str, str]: IP地址到云服务提供商名称的映射（按输入顺序）
+    """
+    unique_ips = list(dict.fromkeys(ip.strip() for ip in ip_addresses if ip and ip.strip()))
+    
+    results = {}
+    pending = []
+    for ip_address in unique_ips:
+        provider = (
+            lookup_learned_provider(ip_address)
+            or lookup_ip_range(ip_address)
+            or lookup_asn_provider(ip_address)
+        )
+        if provider:
+            results[ip_address] = provider
+            continue
+        
+        hit, cached = isp_cache.get(ip_address)
+        if hit:
+            results[ip_address] = classify_isp_info(cached)
+            continue
+        
+        pending.append(ip_address)
+    
+    if pending and PTR_DETECTION_ENABLED:
+        hostnames = resolve_ptrs_sync(pending)
+        unresolved = []
+        for ip_address in pending:
+            provider = classify_hostname(hostnames.get(ip_address))
+            if provider:
+                results[ip_address] = provider
+            else:
+                unresolved.append(ip_address)
+        pending = unresolved
+    
+    if pending:
+        isp_infos = get_isp_by_ips(pending, ipinfo_token)
+        for ip_address in pending:
+            results[ip_address] = classify_isp_info(isp_infos[ip_address])
+    
+    return {ip_address: results[ip_address] for ip_address in unique_ips}
+
+def get_isp_by_ips(ip_addresses: List[str], ipinfo_token: Optional[str] = None) -> Dict[str, Dict[str, str]]:
+    """
+    批量查询IP地址的ISP信息（不读取缓存，查询结果会写入缓存）
+    
+    Args:
+        ip_addresses (List[str]): 要查询的IP地址列表
+        ipinfo_token (str, optional): IPInfo API令牌
+        
+    Returns:
+        Dict[str, Dict[str, str]]: IP地址到ISP信息的映射
+    """
+    if ipinfo_token:
+        chunks = [
+            ip_addresses[i:i + IPINFO_BATCH_SIZE]
+            for i in range(0, len(ip_addresses), IPINFO_BATCH_SIZE)
+        ]
+        with ThreadPoolExecutor(max_workers=IPINFO_BATCH_CONCURRENCY) as executor:
+            chunk_results = list(executor.map(lambda chunk: _query_ipinfo_batch(chunk, ipinfo_token), chunks))
+        queried = {}
+        for chunk_result in chunk_results:
+            queried.update(chunk_result)
+    else:
+        # 批量接口需要令牌，未配置时并发逐个查询
+        with ThreadPoolExecutor(max_workers=IPINFO_BATCH_CONCURRENCY) as executor:
+            queried = dict(zip(ip_addresses, executor.map(_query_ipinfo, ip_addresses)))
+    
+    results = {}
+    failed = {}
+    for ip_address in ip_addresses:
+        isp_info = queried.get(ip_address)
+        if isp_info is None:
+            isp_info = failed[ip_address] = {'org': 'Unknown', 'hostname': ''}
+        results[ip_address] = isp_info
+    
+    # 成功和失败的结果各在一个事务中写入缓存
+    isp_cache.set_many({ip_address: isp_info for ip_address, isp_info in results.items() if ip_address not in failed})
+    isp_cache.set_many(failed, negative=True)
+    return results
+
+def _query_ipinfo_batch(ip_addresses: List[str], ipinfo_token: str) -> Dict[str, Dict[str, str]]:
+    """
+    调用IPInfo批量查询接口
+    
+    Args:
+        ip_addresses (List[str]): 要查询的IP地址列表（不超过1000个）
+        ipinfo_token (str): IPInfo API令牌
+        
+    Returns:
+        Dict[str, Dict[str, str]]: 查询成功的IP地址到ISP信息的映射
+    """
+    try:
+        headers = {'Authorization': f'Bearer {ipinfo_token}'}
+        # 批量查询虽然是POST，但只读取数据，可以安全地重试
+        response = ipinfo_http.request(
+            'POST', 'https://ipinfo.io/batch', idempotent=True,
+            json=ip_addresses, headers=headers, timeout=(HTTP_CONNECT_TIMEOUT, 30)
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            return {
+                ip_address: _format_isp_info(info)
+                for ip_address, info in data.items()
+                if isinstance(info, dict) and 'error' not in info
+            }
+        print(f"批量查询IP信息失败: {response.status_code} - {response.text}")
+    except Exception as e:
+        print(f"批量查询IP信息时发生错误: {str(e)}")
+    
+    return {}
+
+def classify_ipv4_array(addresses: 'np.ndarray') -> 'np.ndarray':
+    """
+    使用本地IP段索引向量化识别一组IPv4地址（需要numpy，不发起网络请求）
+    
+    Args:
+        addresses (np.ndarray): 整数形式的IPv4地址数组
+        
+    Returns:
+        np.ndarray: 与输入等长的提供商名称数组，无法识别的为 'unknown'
+    """
+    starts, ends, codes, providers = get_ip_range_index().get_ipv4_arrays()
+    labels = np.array(providers + ['unknown'], dtype=object)
+    addresses = np.asarray(addresses, dtype=np.uint32)
+    if len(starts) == 0:
+        return np.full(addresses.shape, 'unknown', dtype=object)
+    
+    # 找到起始地址不大于目标地址的最后一个区间，再检查是否落在区间内
+    positions = np.searchsorted(starts, addresses, side='right') - 1
+    clipped = np.clip(positions, 0, None)
+    matched = (positions >= 0) & (addresses <= ends[clipped])
+    result_codes = np.where(matched, codes[clipped], -1)
+    return labels[result_codes]
+
+def detect_cloud_providers_bulk(ip_addresses: List[str]) -> List[str]:
+    """
+    离线批量识别大量IP地址（日志、防火墙导出等）的云服务提供商
+    
+    IPv4地址使用numpy向量化区间匹配，IPv6地址使用前缀树逐个匹配，
+    本地索引无法识别的地址返回 'unknown'，不会查询IPInfo
+    
+    Args:
+        ip_addresses (List[str]): IP地址列表
+        
+    Returns:
+        List[str]: 与输入顺序一致的提供商名称列表
+    """
+    index = get_ip_range_index()
+    if not NUMPY_AVAILABLE:
+        return [index.lookup(ip_address) or 'unknown' for ip_address in ip_addresses]
+    
+    results = ['unknown'] * len(ip_addresses)
+    ipv4_positions = []
+    packed = []
+    for position, ip_address in enumerate(ip_addresses):
+        try:
+            packed.append(socket.inet_pton(socket.AF_INET, ip_address))
+            ipv4_positions.append(position)
+        except (OSError, TypeError):
+            results[position] = index.lookup(ip_address) or 'unknown'
+    
+    if packed:
+        addresses = np.frombuffer(b''.join(packed), dtype='>u4')
+        for position, provider in zip(ipv4_positions, classify_ipv4_array(addresses)):
+            results[position] = provider
+    
+    return results
+
+def classify_isp_info(isp_info: Dict[str, str]) -> str:
+    """
+    根据ISP信息中的org和hostname字段识别云服务提供商
+    
+    Args:
+        isp_info (dict): ISP信息，包含 'org' 和 'hostname'
+        
+    Returns:
+        str: 云服务提供商名称 ('aws', 'digitalocean', 'vultr', 'alibaba', 'unknown')
+    """
     org = isp_info.get('org', '').lower()
     hostname = isp_info.get('hostname', '').lower()
     
@@ -85,6 +514,21 @@ def detect_cloud_provider(ip_address: str, ipinfo_token: Optional[str] = None) -
     
     return 'unknown'
 
+def classify_hostname(hostname: Optional[str]) -> Optional[str]:
+    """
+    根据主机名（例如PTR记录）识别云服务提供商
+    
+    Args:
+        hostname (str, optional): 主机名，例如 'ec2-3-5-140-1.compute.amazonaws.com'
+        
+    Returns:
+        Optional[str]: 提供商名称，无法识别时返回None
+    """
+    if not hostname:
+        return None
+    provider = classify_isp_info({'org': '', 'hostname': hostname})
+    return None if provider == 'unknown' else provider
+
 def get_cloud_provider_info(provider: str) -> Dict[str, str]:
     """
     获取云服务提供商的基本信息
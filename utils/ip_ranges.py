@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+云厂商IP段索引模块
+从本地保存的云厂商公开IP段文件构建前缀树，离线识别IP地址归属的云服务提供商
+"""
+
+import csv
+import ipaddress
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# NumPy为可选依赖，仅批量向量化匹配需要
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+# 支持识别的云服务提供商（文件名需以这些名称开头，例如 aws.json、vultr.txt）
+KNOWN_PROVIDERS = ['aws', 'digitalocean', 'vultr', 'alibaba']
+
+# IP段文件目录
+CLOUD_IP_RANGES_DIR = os.getenv('CLOUD_IP_RANGES_DIR')
+
+
+class PrefixTrie:
+    """二进制前缀树，按位保存网段，支持最长前缀匹配"""
+
+    def __init__(self, max_bits: int):
+        self.max_bits = max_bits
+        # 节点结构: [0分支, 1分支, 值]
+        self._root: List = [None, None, None]
+        self.size = 0
+
+    def insert(self, network: int, prefix_len: int, value: str) -> None:
+        """
+        插入一个网段
+
+        Args:
+            network (int): 网段起始地址（整数形式）
+            prefix_len (int): 前缀长度
+            value (str): 网段对应的值
+        """
+        node = self._root
+        for shift in range(self.max_bits - 1, self.max_bits - 1 - prefix_len, -1):
+            bit = (network >> shift) & 1
+            child = node[bit]
+            if child is None:
+                child = [None, None, None]
+                node[bit] = child
+            node = child
+
+        if node[2] is None:
+            self.size += 1
+        node[2] = value
+
+    def lookup(self, address: int) -> Optional[str]:
+        """
+        查找地址的最长前缀匹配
+
+        Args:
+            address (int): 地址（整数形式）
+
+        Returns:
+            Optional[str]: 匹配网段的值，未匹配时返回None
+        """
+        node = self._root
+        best = node[2]
+        for shift in range(self.max_bits - 1, -1, -1):
+            node = node[(address >> shift) & 1]
+            if node is None:
+                break
+            if node[2] is not None:
+                best = node[2]
+        return best
+
+
+class IPRangeIndex:
+    """云厂商IP段索引，分别为IPv4和IPv6维护前缀树"""
+
+    def __init__(self):
+        self._tries = {4: PrefixTrie(32), 6: PrefixTrie(128)}
+        self.prefix_counts: Dict[str, int] = {}
+        self.loaded_files: List[str] = []
+        self.errors: List[str] = []
+        # IPv4网段区间 (起始地址, 结束地址, 提供商)，用于构建向量化匹配数组
+        self._ipv4_intervals: List[Tuple[int, int, str]] = []
+        self._ipv4_arrays = None
+
+    def add_prefix(self, cidr: str, provider: str) -> bool:
+        """
+        添加一个网段
+
+        Args:
+            cidr (str): CIDR格式的网段，例如 '3.5.140.0/22'
+            provider (str): 提供商名称
+
+        Returns:
+            bool: 是否添加成功
+        """
+        try:
+            network = ipaddress.ip_network(cidr.strip(), strict=False)
+        except ValueError:
+            return False
+
+        self._tries[network.version].insert(
+            int(network.network_address), network.prefixlen, provider
+        )
+        if network.version == 4:
+            self._ipv4_intervals.append(
+                (int(network.network_address), int(network.broadcast_address), provider)
+            )
+            self._ipv4_arrays = None
+        self.prefix_counts[provider] = self.prefix_counts.get(provider, 0) + 1
+        return True
+
+    def lookup(self, ip_address: str) -> Optional[str]:
+        """
+        查询IP地址所属的提供商
+
+        Args:
+            ip_address (str): IP地址
+
+        Returns:
+            Optional[str]: 提供商名称，无法识别时返回None
+        """
+        try:
+            address = ipaddress.ip_address(ip_address.strip())
+        except ValueError:
+            return None
+        return self._tries[address.version].lookup(int(address))
+
+    def get_ipv4_arrays(self) -> Tuple:
+        """
+        获取用于向量化匹配的IPv4区间数组
+
+        嵌套的网段会被展开为互不重叠的区间（内层更长的前缀优先），
+        与前缀树的最长前缀匹配结果一致
+
+        Returns:
+            Tuple: (起始地址数组, 结束地址数组, 提供商编号数组, 提供商名称列表)
+        """
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError('批量匹配需要安装numpy')
+
+        if self._ipv4_arrays is None:
+            providers = sorted({provider for _, _, provider in self._ipv4_intervals})
+            codes = {provider: i for i, provider in enumerate(providers)}
+            segments = build_disjoint_intervals(self._ipv4_intervals)
+            self._ipv4_arrays = (
+                np.array([start for start, _, _ in segments], dtype=np.uint32),
+                np.array([end for _, end, _ in segments], dtype=np.uint32),
+                np.array([codes[provider] for _, _, provider in segments], dtype=np.int16),
+                providers
+            )
+        return self._ipv4_arrays
+
+    def load_file(self, path: str, provider: str) -> int:
+        """
+        从文件加载IP段
+
+        支持的格式：
+        - AWS ip-ranges.json（prefixes / ipv6_prefixes）
+        - JSON geofeed（subnets[].ip_prefix，例如Vultr）
+        - CSV / 纯文本，每行第一列为CIDR（例如DigitalOcean geofeed、阿里云网段列表）
+
+        Args:
+            path (str): 文件路径
+            provider (str): 提供商名称
+
+        Returns:
+            int: 成功加载的网段数量
+        """
+        if path.endswith('.json'):
+            with open(path, 'r', encoding='utf-8') as f:
+                prefixes = self._parse_json_prefixes(json.load(f))
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                prefixes = self._parse_text_prefixes(f)
+
+        count = sum(1 for cidr in prefixes if self.add_prefix(cidr, provider))
+        self.loaded_files.append(path)
+        return count
+
+    def load_directory(self, directory: str) -> int:
+        """
+        加载目录下所有以提供商名称开头的IP段文件
+
+        Args:
+            directory (str): 目录路径
+
+        Returns:
+            int: 成功加载的网段总数
+        """
+        total = 0
+        for filename in sorted(os.listdir(directory)):
+            provider = next((p for p in KNOWN_PROVIDERS if filename.lower().startswith(p)), None)
+            if not provider:
+                continue
+            try:
+                total += self.load_file(os.path.join(directory, filename), provider)
+            except Exception as e:
+                self.errors.append(f'{filename}: {str(e)}')
+        return total
+
+    @property
+    def total_prefixes(self) -> int:
+        return sum(self.prefix_counts.values())
+
+    def get_stats(self) -> Dict:
+        """获取索引统计信息"""
+        return {
+            'enabled': self.total_prefixes > 0,
+            'source_dir': CLOUD_IP_RANGES_DIR,
+            'total_prefixes': self.total_prefixes,
+            'prefixes_by_provider': dict(self.prefix_counts),
+            'loaded_files': len(self.loaded_files),
+            'errors': list(self.errors)
+        }
+
+    @staticmethod
+    def _parse_json_prefixes(data: Dict) -> List[str]:
+        """解析JSON格式的IP段文件"""
+        prefixes = []
+        for key in ('prefixes', 'ipv6_prefixes', 'subnets'):
+            for entry in data.get(key, []):
+                cidr = entry.get('ip_prefix') or entry.get('ipv6_prefix')
+                if cidr:
+                    prefixes.append(cidr)
+        return prefixes
+
+    @staticmethod
+    def _parse_text_prefixes(lines: Iterable[str]) -> List[str]:
+        """解析CSV或纯文本格式的IP段文件"""
+        prefixes = []
+        for row in csv.reader(lines):
+            if not row:
+                continue
+            first = row[0].strip()
+            if first and not first.startswith('#'):
+                prefixes.append(first)
+        return prefixes
+
+
+def build_disjoint_intervals(intervals: List[Tuple[int, int, str]]) -> List[Tuple[int, int, str]]:
+    """
+    将网段区间展开为按起始地址排序、互不重叠的区间
+
+    网段之间只存在包含或不相交两种关系，按起始地址升序、范围降序遍历，
+    用栈维护当前包含关系，内层网段覆盖外层网段
+
+    Args:
+        intervals (List[Tuple[int, int, str]]): (起始地址, 结束地址, 值) 列表
+
+    Returns:
+        List[Tuple[int, int, str]]: 互不重叠的 (起始地址, 结束地址, 值) 列表，相邻同值区间会合并
+    """
+    segments: List[Tuple[int, int, str]] = []
+
+    def emit(start: int, end: int, value: str) -> None:
+        if segments and segments[-1][2] == value and segments[-1][1] + 1 == start:
+            segments[-1] = (segments[-1][0], end, value)
+        else:
+            segments.append((start, end, value))
+
+    stack: List[Tuple[int, str]] = []
+    cursor = 0
+    for start, end, value in sorted(intervals, key=lambda item: (item[0], -item[1])):
+        # 结束所有不包含当前网段的外层网段
+        while stack and stack[-1][0] < start:
+            top_end, top_value = stack.pop()
+            if cursor <= top_end:
+                emit(cursor, top_end, top_value)
+                cursor = top_end + 1
+        if stack and cursor < start:
+            emit(cursor, start - 1, stack[-1][1])
+        stack.append((end, value))
+        cursor = start
+
+    while stack:
+        top_end, top_value = stack.pop()
+        if cursor <= top_end:
+            emit(cursor, top_end, top_value)
+            cursor = top_end + 1
+
+    return segments
+
+
+_index: Optional[IPRangeIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_ip_range_index() -> IPRangeIndex:
+    """
+    获取全局IP段索引（首次调用时从 CLOUD_IP_RANGES_DIR 加载）
+
+    Returns:
+        IPRangeIndex: IP段索引
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = IPRangeIndex()
+                if CLOUD_IP_RANGES_DIR and os.path.isdir(CLOUD_IP_RANGES_DIR):
+                    index.load_directory(CLOUD_IP_RANGES_DIR)
+                elif CLOUD_IP_RANGES_DIR:
+                    index.errors.append(f'目录不存在: {CLOUD_IP_RANGES_DIR}')
+                _index = index
+    return _index
+
+
+def lookup_ip_range(ip_address: str) -> Optional[str]:
+    """
+    通过本地IP段索引识别云服务提供商
+
+    Args:
+        ip_address (str): IP地址
+
+    Returns:
+        Optional[str]: 提供商名称，无法识别时返回None
+    """
+    return get_ip_range_index().lookup(ip_address)
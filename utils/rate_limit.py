@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+API限流模块
+每个提供商（按凭证区分）一个令牌桶限流器：按配置的速率发放请求令牌，
+根据响应中的 Retry-After / RateLimit-Remaining 头暂停请求，并按AIMD（加性增、乘性减）
+根据是否被限流自动调整允许同时进行的请求数量。交互式调用（工具调用）优先于后台任务（清单刷新）
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterator, Mapping, Optional
+
+# 限流配置
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+# 每个提供商同时进行的请求数量上限（被限流时自动减半，之后逐步恢复）
+RATE_LIMIT_MAX_CONCURRENCY = int(os.getenv('RATE_LIMIT_MAX_CONCURRENCY', '8'))
+# 被限流但响应中没有 Retry-After 时的暂停时间（秒）
+RATE_LIMIT_DEFAULT_BACKOFF = float(os.getenv('RATE_LIMIT_DEFAULT_BACKOFF', '1'))
+
+# 各提供商的默认速率（每秒请求数）和突发容量，可用 <提供商>_RATE_LIMIT / <提供商>_RATE_BURST 覆盖
+DEFAULT_RATE_LIMITS = {
+    # DigitalOcean: 每小时5000次，每分钟250次
+    'digitalocean': (5000 / 3600, 250),
+    # Vultr: 每秒30次
+    'vultr': (30, 30),
+    # 阿里云: 按API和账号限流，取保守值
+    'alibaba': (20, 20),
+}
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+# 当前调用的优先级，后台任务通过 background_priority() 设置
+_priority = contextvars.ContextVar('request_priority', default=INTERACTIVE)
+
+# 等待并发名额或交互式调用让出时的轮询间隔（秒）
+_POLL_INTERVAL = 0.05
+
+
+@contextmanager
+def background_priority() -> Iterator[None]:
+    """在此上下文中发起的请求以后台优先级排队，让交互式调用先获得令牌"""
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    """获取当前调用的优先级"""
+    return _priority.get()
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    解析 Retry-After 头
+
+    Args:
+        value (str, optional): 秒数或HTTP日期
+
+    Returns:
+        Optional[float]: 需要等待的秒数，无法解析时返回None
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """令牌桶 + AIMD并发控制的限流器，可同时用于线程和事件循环"""
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: int,
+        max_concurrency: int = 8,
+        min_concurrency: int = 1
+    ):
+        """
+        Args:
+            name (str): 限流器名称（提供商名称）
+            rate (float): 每秒发放的令牌数量
+            burst (int): 令牌桶容量
+            max_concurrency (int): 同时进行的请求数量上限
+            min_concurrency (int): 被限流时并发数量的下限
+        """
+        self.name = name
+        self.rate = max(rate, 0.001)
+        self.burst = max(int(burst), 1)
+        self.max_concurrency = max(max_concurrency, 1)
+        self.min_concurrency = max(min(min_concurrency, self.max_concurrency), 1)
+
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._limit = float(self.max_concurrency)
+        self._active = 0
+        self._blocked_until = 0.0
+        self._interactive_waiting = 0
+        self._cond = threading.Condition()
+
+        self.acquired = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+        self.server_remaining: Optional[int] = None
+
+    def acquire(self, priority: Optional[str] = None) -> None:
+        """
+        阻塞直到获得请求令牌和并发名额
+
+        Args:
+            priority (str, optional): 'interactive' 或 'background'，默认为当前上下文的优先级
+        """
+        priority = priority or current_priority()
+        started = time.monotonic()
+        with self._cond:
+            self._enter_queue(priority)
+            try:
+                while True:
+                    wait = self._try_acquire(priority)
+                    if wait == 0:
+                        break
+                    self._cond.wait(wait)
+            finally:
+                self._leave_queue(priority)
+            self.wait_seconds += time.monotonic() - started
+
+    async def acquire_async(self, priority: Optional[str] = None) -> None:
+        """acquire 的异步版本，等待时不阻塞事件循环"""
+        priority = priority or current_priority()
+        started = time.monotonic()
+        with self._cond:
+            self._enter_queue(priority)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_acquire(priority)
+                if wait == 0:
+                    break
+                await asyncio.sleep(wait)
+        finally:
+            with self._cond:
+                self._leave_queue(priority)
+                self.wait_seconds += time.monotonic() - started
+
+    def release(self) -> None:
+        """归还并发名额"""
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority: Optional[str] = None) -> Iterator[None]:
+        """在获得令牌和并发名额后执行请求，结束后归还名额"""
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def slot_async(self, priority: Optional[str] = None):
+        """slot 的异步版本"""
+        await self.acquire_async(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def record_response(self, status_code: Optional[int], headers: Optional[Mapping] = None) -> None:
+        """
+        根据HTTP响应调整限流状态
+
+        429 响应按 Retry-After 暂停并将并发数量减半；其他响应逐步恢复并发数量。
+        RateLimit-Remaining 为0时暂停到 RateLimit-Reset，并使本地令牌不超过服务端剩余额度
+
+        Args:
+            status_code (int, optional): HTTP状态码
+            headers (Mapping, optional): 响应头
+        """
+        headers = {str(k).lower(): v for k, v in (headers or {}).items()}
+        if status_code == 429:
+            self.record_throttled(parse_retry_after(headers.get('retry-after')))
+            return
+
+        remaining = self._parse_int(headers.get('ratelimit-remaining') or headers.get('x-ratelimit-remaining'))
+        with self._cond:
+            if remaining is not None:
+                self.server_remaining = remaining
+                self._tokens = min(self._tokens, float(remaining))
+                if remaining <= 0:
+                    reset = self._reset_delay(headers.get('ratelimit-reset') or headers.get('x-ratelimit-reset'))
+                    self._block_for(reset if reset is not None else RATE_LIMIT_DEFAULT_BACKOFF)
+            if status_code is not None and status_code < 500:
+                self._limit = min(self._limit + 1 / self._limit, float(self.max_concurrency))
+
+    def record_success(self) -> None:
+        """记录一次未被限流的请求（没有响应头可用时）"""
+        self.record_response(200)
+
+    def record_throttled(self, retry_after: Optional[float] = None) -> None:
+        """
+        记录一次被限流的请求：暂停发放令牌，并发数量减半
+
+        Args:
+            retry_after (float, optional): 服务端要求的等待时间（秒）
+        """
+        with self._cond:
+            self.throttled += 1
+            self._limit = max(self._limit / 2, float(self.min_concurrency))
+            self._tokens = 0.0
+            self._block_for(retry_after if retry_after is not None else RATE_LIMIT_DEFAULT_BACKOFF)
+
+    def retry_after(self) -> float:
+        """距离恢复发放令牌还需等待的秒数"""
+        return max(self._blocked_until - time.monotonic(), 0.0)
+
+    def get_stats(self) -> Dict:
+        """获取限流器统计信息"""
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                'rate_per_second': round(self.rate, 3),
+                'burst': self.burst,
+                'tokens': round(self._tokens, 1),
+                'concurrency_limit': int(self._limit),
+                'max_concurrency': self.max_concurrency,
+                'active_requests': self._active,
+                'interactive_waiting': self._interactive_waiting,
+                'blocked_for_seconds': round(self.retry_after(), 1),
+                'server_remaining': self.server_remaining,
+                'acquired': self.acquired,
+                'throttled': self.throttled,
+                'total_wait_seconds': round(self.wait_seconds, 2)
+            }
+
+    def _try_acquire(self, priority: str) -> float:
+        """尝试获得令牌和并发名额（需持有锁），成功返回0，否则返回建议的等待时间"""
+        now = time.monotonic()
+        self._refill(now)
+        if priority == BACKGROUND and self._interactive_waiting:
+            return _POLL_INTERVAL
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if self._active >= int(self._limit):
+            return _POLL_INTERVAL
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+        self._tokens -= 1
+        self._active += 1
+        self.acquired += 1
+        return 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self._tokens + (now - self._updated) * self.rate, float(self.burst))
+        self._updated = now
+
+    def _block_for(self, seconds: float) -> None:
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def _enter_queue(self, priority: str) -> None:
+        if priority == INTERACTIVE:
+            self._interactive_waiting += 1
+
+    def _leave_queue(self, priority: str) -> None:
+        if priority == INTERACTIVE:
+            self._interactive_waiting -= 1
+            self._cond.notify_all()
+
+    @staticmethod
+    def _parse_int(value) -> Optional[int]:
+        try:
+            return int(value) if value is not None else None
+        except (TypeError, ValueError):
+            return None
+
+    @classmethod
+    def _reset_delay(cls, value) -> Optional[float]:
+        """RateLimit-Reset 可能是秒数或Unix时间戳（DigitalOcean）"""
+        reset = cls._parse_int(value)
+        if reset is None:
+            return None
+        if reset > 10 ** 9:
+            return max(reset - time.time(), 0.0)
+        return float(reset)
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str, credential: Optional[str]) -> Optional[RateLimiter]:
+    """
+    获取提供商和凭证对应的限流器（同一凭证共享一个限流器）
+
+    Args:
+        provider (str): 提供商名称
+        credential (str, optional): API令牌或AccessKey ID
+
+    Returns:
+        Optional[RateLimiter]: 限流器，未启用限流时返回None
+    """
+    if not RATE_LIMIT_ENABLED:
+        return None
+
+    # 不在键中保存凭证原文
+    digest = hashlib.sha256((credential or '').encode()).hexdigest()[:12]
+    key = f'{provider}:{digest}'
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            default_rate, default_burst = DEFAULT_RATE_LIMITS.get(provider, (10, 10))
+            limiter = RateLimiter(
+                provider,
+                rate=float(os.getenv(f'{provider.upper()}_RATE_LIMIT', str(default_rate))),
+                burst=int(os.getenv(f'{provider.upper()}_RATE_BURST', str(default_burst))),
+                max_concurrency=RATE_LIMIT_MAX_CONCURRENCY
+            )
+            _limiters[key] = limiter
+    return limiter
+
+
+@contextmanager
+def limited(limiter: Optional[RateLimiter]) -> Iterator[None]:
+    """限流器为None（未启用限流）时直接执行"""
+    if limiter is None:
+        yield
+    else:
+        with limiter.slot():
+            yield
+
+
+@asynccontextmanager
+async def limited_async(limiter: Optional[RateLimiter]):
+    """limited 的异步版本"""
+    if limiter is None:
+        yield
+    else:
+        async with limiter.slot_async():
+            yield
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+多区域并发查询工具模块
+在多个区域上并发执行同一个查询，单个区域失败不影响其他区域。
+查询在调用方提供的共享线程池（提供商的子任务线程池）中执行，区域数量不影响线程数量。
+
+每个区域有独立的超时时间：从该区域的查询开始执行时计时，一个慢区域不会占用其他区域的时间；
+线程池已满时，排队超过超时时间仍未开始的区域同样视为超时。
+已开始执行的查询无法中断，超时后其结果被丢弃（SDK客户端的连接/读取超时与区域超时相同，查询会随之结束）
+
+通过 run_blocking 执行时，调用方协程被取消后不再等待结果：尚未开始的区域查询被取消，并抛出 CancelledError
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, CancelledError, Executor, Future, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from utils.aio import get_cancel_event
+
+# 等待区域结果时检查调用方是否已取消的间隔（秒）
+CANCEL_POLL_INTERVAL = 0.1
+
+
+def _submit_regions(
+    regions: List[str],
+    fn: Callable[[str], Any],
+    executor: Executor
+) -> Tuple[Dict[Future, str], Dict[str, float], float]:
+    """提交所有区域的查询，返回 (Future到区域的映射, 各区域开始执行的时间, 提交时间)"""
+    started: Dict[str, float] = {}
+    cancel_event = get_cancel_event()
+
+    def run(region: str) -> Any:
+        # 调用方已取消时，排队中的区域查询不再执行
+        if cancel_event is not None and cancel_event.is_set():
+            raise CancelledError()
+        started[region] = time.monotonic()
+        return fn(region)
+
+    submitted = time.monotonic()
+    futures = {executor.submit(run, region): region for region in regions}
+    return futures, started, submitted
+
+
+def _iter_results(
+    futures: Dict[Future, str],
+    started: Dict[str, float],
+    submitted: float,
+    timeout: float
+) -> Iterator[Tuple[str, Optional[Future], str]]:
+    """
+    按完成顺序产出各区域的结果
+
+    Yields:
+        Tuple[str, Optional[Future], str]: (区域, 已完成的Future, 超时原因)，超时的区域Future为None
+    """
+    cancel_event = get_cancel_event()
+    pending = set(futures)
+    while pending:
+        if cancel_event is not None and cancel_event.is_set():
+            raise CancelledError()
+        now = time.monotonic()
+        next_deadline = None
+        for future in list(pending):
+            region = futures[future]
+            # 已开始的区域从开始执行时计时，排队中的区域从提交时计时
+            deadline = started.get(region, submitted) + timeout
+            if future.done():
+                continue
+            if deadline <= now:
+                pending.discard(future)
+                if future.cancel():
+                    yield region, None, f'等待空闲线程超时（{timeout:g}秒）'
+                else:
+                    yield region, None, f'查询超时（{timeout:g}秒）'
+            elif next_deadline is None or deadline < next_deadline:
+                next_deadline = deadline
+        if not pending:
+            return
+
+        wait_timeout = None if next_deadline is None else max(next_deadline - now, 0)
+        if cancel_event is not None:
+            wait_timeout = CANCEL_POLL_INTERVAL if wait_timeout is None else min(wait_timeout, CANCEL_POLL_INTERVAL)
+        done, pending = wait(pending, timeout=wait_timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield futures[future], future, ''
+
+
+def fan_out(
+    regions: List[str],
+    fn: Callable[[str], Any],
+    timeout: float,
+    executor: Executor
+) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    在所有区域上并发执行查询并收集全部结果
+
+    Args:
+        regions (List[str]): 区域列表
+        fn (Callable): 以区域为参数的查询函数
+        timeout (float): 每个区域的超时时间（秒），超时未完成的区域视为失败
+        executor (Executor): 执行查询的线程池，需要在提交方上下文中执行（例如 ProviderExecutor）
+
+    Returns:
+        Tuple[Dict[str, Any], Dict[str, str]]: (按完成顺序排列的各区域结果, 失败区域及原因)
+    """
+    results: Dict[str, Any] = {}
+    failed: Dict[str, str] = {}
+
+    futures, started, submitted = _submit_regions(regions, fn, executor)
+    try:
+        for region, future, timeout_reason in _iter_results(futures, started, submitted, timeout):
+            if future is None:
+                failed[region] = timeout_reason
+                continue
+            try:
+                results[region] = future.result()
+            except Exception as e:
+                failed[region] = str(e)
+    finally:
+        # 调用方取消时尚未开始的查询直接取消
+        for future in futures:
+            future.cancel()
+    return results, failed
+
+
+def first_hit(
+    regions: List[str],
+    fn: Callable[[str], Any],
+    timeout: float,
+    executor: Executor
+) -> Tuple[Optional[str], Any, Dict[str, str]]:
+    """
+    在所有区域上并发执行查询，任一区域返回非空结果时立即返回，不再等待其他区域
+
+    Args:
+        regions (List[str]): 区域列表
+        fn (Callable): 以区域为参数的查询函数，未找到时返回空值
+        timeout (float): 每个区域的超时时间（秒）
+        executor (Executor): 执行查询的线程池，需要在提交方上下文中执行（例如 ProviderExecutor）
+
+    Returns:
+        Tuple[Optional[str], Any, Dict[str, str]]: (命中的区域, 结果, 失败区域及原因)，
+            未命中时区域和结果为None
+    """
+    failed: Dict[str, str] = {}
+
+    futures, started, submitted = _submit_regions(regions, fn, executor)
+    try:
+        for region, future, timeout_reason in _iter_results(futures, started, submitted, timeout):
+            if future is None:
+                failed[region] = timeout_reason
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                failed[region] = str(e)
+                continue
+            if result:
+                return region, result, failed
+    finally:
+        # 已命中或调用方取消后不再等待其余区域，尚未开始的查询直接取消
+        for future in futures:
+            future.cancel()
+    return None, None, failed
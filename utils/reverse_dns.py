@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+反向DNS（PTR）查询模块
+使用非阻塞的异步解析器并发查询IP地址的PTR记录，每个查询有独立的超时时间
+"""
+
+import asyncio
+import os
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+# dnspython为可选依赖，未安装时退回到系统解析器（在线程池中执行，不阻塞事件循环）
+try:
+    import dns.asyncresolver
+    import dns.exception
+    DNS_AVAILABLE = True
+except ImportError:
+    DNS_AVAILABLE = False
+
+# dnspython 2.4及以上版本用 Do53Nameserver 为每个DNS服务器单独指定端口，旧版本使用 nameserver_ports
+try:
+    from dns.nameserver import Do53Nameserver
+except ImportError:
+    Do53Nameserver = None
+
+# PTR查询配置
+PTR_DETECTION_ENABLED = os.getenv('PTR_DETECTION_ENABLED', 'false').lower() == 'true'
+# 自定义DNS服务器，逗号分隔，可带端口，例如 "127.0.0.1:5353"（需要dnspython）
+PTR_NAMESERVERS = os.getenv('PTR_NAMESERVERS', '')
+PTR_TIMEOUT = float(os.getenv('PTR_TIMEOUT', '2'))
+PTR_CONCURRENCY = int(os.getenv('PTR_CONCURRENCY', '100'))
+
+
+def _build_resolver():
+    """创建异步解析器，配置了自定义DNS服务器时使用自定义服务器"""
+    if not PTR_NAMESERVERS:
+        return dns.asyncresolver.Resolver()
+
+    resolver = dns.asyncresolver.Resolver(configure=False)
+    nameservers = []
+    ports = {}
+    for entry in PTR_NAMESERVERS.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        # 形如 "127.0.0.1:5353" 的条目指定端口（IPv6地址需写成 "[::1]:5353"）
+        if entry.startswith('['):
+            host, _, port = entry[1:].partition(']:')
+        elif entry.count(':') == 1:
+            host, _, port = entry.partition(':')
+        else:
+            host, port = entry, ''
+        # 端口按DNS服务器分别设置，不影响列表中的其他服务器
+        port = int(port) if port else 53
+        if Do53Nameserver is not None:
+            nameservers.append(Do53Nameserver(host, port))
+        else:
+            nameservers.append(host)
+            ports[host] = port
+    resolver.nameservers = nameservers
+    if ports:
+        resolver.nameserver_ports = ports
+    return resolver
+
+
+async def resolve_ptr(ip_address: str, timeout: Optional[float] = None, resolver=None) -> Optional[str]:
+    """
+    查询单个IP地址的PTR记录
+
+    Args:
+        ip_address (str): IP地址
+        timeout (float, optional): 超时时间（秒），默认为 PTR_TIMEOUT
+        resolver (optional): dnspython异步解析器，默认新建
+
+    Returns:
+        Optional[str]: PTR主机名（小写，不含末尾的点），查询失败或超时返回None
+    """
+    timeout = PTR_TIMEOUT if timeout is None else timeout
+    try:
+        if DNS_AVAILABLE:
+            resolver = resolver or _build_resolver()
+            answer = await resolver.resolve_address(ip_address, lifetime=timeout)
+            return str(answer[0].target).rstrip('.').lower()
+
+        loop = asyncio.get_running_loop()
+        hostname, _ = await asyncio.wait_for(
+            loop.getnameinfo((ip_address, 0), socket.NI_NAMEREQD), timeout
+        )
+        return hostname.rstrip('.').lower()
+    except asyncio.TimeoutError:
+        return None
+    except (OSError, ValueError):
+        return None
+    except Exception as e:
+        if DNS_AVAILABLE and isinstance(e, dns.exception.DNSException):
+            return None
+        raise
+
+
+async def resolve_ptrs(
+    ip_addresses: List[str],
+    concurrency: Optional[int] = None,
+    timeout: Optional[float] = None
+) -> Dict[str, Optional[str]]:
+    """
+    并发查询多个IP地址的PTR记录
+
+    Args:
+        ip_addresses (List[str]): IP地址列表
+        concurrency (int, optional): 同时进行的查询数量上限，默认为 PTR_CONCURRENCY
+        timeout (float, optional): 每个查询的超时时间（秒），默认为 PTR_TIMEOUT
+
+    Returns:
+        Dict[str, Optional[str]]: IP地址到PTR主机名的映射
+    """
+    semaphore = asyncio.Semaphore(concurrency or PTR_CONCURRENCY)
+    resolver = _build_resolver() if DNS_AVAILABLE else None
+
+    async def resolve_one(ip_address: str) -> Optional[str]:
+        async with semaphore:
+            return await resolve_ptr(ip_address, timeout, resolver)
+
+    unique_ips = list(dict.fromkeys(ip_addresses))
+    hostnames = await asyncio.gather(*(resolve_one(ip_address) for ip_address in unique_ips))
+    return dict(zip(unique_ips, hostnames))
+
+
+def resolve_ptrs_sync(
+    ip_addresses: List[str],
+    concurrency: Optional[int] = None,
+    timeout: Optional[float] = None
+) -> Dict[str, Optional[str]]:
+    """
+    resolve_ptrs 的同步版本，可在已有事件循环的线程中调用（此时在独立线程中运行）
+
+    Args:
+        ip_addresses (List[str]): IP地址列表
+        concurrency (int, optional): 同时进行的查询数量上限
+        timeout (float, optional): 每个查询的超时时间（秒）
+
+    Returns:
+        Dict[str, Optional[str]]: IP地址到PTR主机名的映射
+    """
+    coroutine_args = (ip_addresses, concurrency, timeout)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(resolve_ptrs(*coroutine_args))
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(lambda: asyncio.run(resolve_ptrs(*coroutine_args))).result()